@@ -24,7 +24,7 @@ export const expensesAPI = {
 
   getCategoryTransactions: async (id: number): Promise<Transaction[]> => {
     const response = await api.get(`/categories/${id}/transactions/`);
-    return response.data;
+    return response.data.results || response.data;
   },
 
   // Accounts
@@ -53,7 +53,7 @@ export const expensesAPI = {
 
   getAccountTransactions: async (id: number): Promise<Transaction[]> => {
     const response = await api.get(`/accounts/${id}/transactions/`);
-    return response.data;
+    return response.data.results || response.data;
   },
 
   getAccountBalance: async (id: number): Promise<AccountBalance> => {
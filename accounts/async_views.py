@@ -0,0 +1,51 @@
+"""
+Async login, served under /api/async/auth/.
+
+Same request and response as /api/auth/login/, but the view runs on the
+event loop and the password check on the bounded hash pool
+(``accounts.hashers``), so a burst of logins queues for hashing threads
+instead of tying up the worker.
+"""
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from rest_framework import exceptions, status
+
+from expenses.async_views import json_response
+
+from .hashers import aauthenticate
+from .serializers import CredentialsSerializer
+from .views import login_payload
+
+logger = logging.getLogger(__name__)
+
+
+async def login(request):
+    """/api/auth/login/"""
+    if request.method != 'POST':
+        response = json_response(
+            {'detail': exceptions.MethodNotAllowed(request.method).detail},
+            status=status.HTTP_405_METHOD_NOT_ALLOWED,
+        )
+        response['Allow'] = 'POST'
+        return response
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return json_response({'detail': exceptions.ParseError().detail}, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = CredentialsSerializer(data=data)
+    if not serializer.is_valid():
+        logger.info('Login rejected', extra={'fields': sorted(serializer.errors)})
+        return json_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    user = await aauthenticate(serializer.validated_data['email'], serializer.validated_data['password'])
+    if user is None:
+        logger.info('Login rejected', extra={'fields': ['non_field_errors']})
+        return json_response({'non_field_errors': ['Invalid credentials']}, status=status.HTTP_400_BAD_REQUEST)
+    logger.info('Login succeeded', extra={'user_id': user.pk})
+    return json_response(await sync_to_async(login_payload)(user))
+
+
+# Token-authenticated API; no session cookie to protect
+login.csrf_exempt = True
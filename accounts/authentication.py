@@ -0,0 +1,145 @@
+"""
+JWT authentication without a User query on every request.
+
+``CachedJWTAuthentication`` keeps recently authenticated users in a
+size-bounded, short-TTL LRU in each worker, keyed by the token's user id.
+Every entry remembers the user's version, a timestamp kept in the Django
+cache and bumped after any save or delete of the user commits (and on
+logout). Reading the version is a cache lookup, not a query.
+
+The version only reaches other workers through a shared cache backend
+(Redis, Memcached, ...). With a per-process one, such as the default
+LocMemCache, a deactivation or password change in one worker would go
+unnoticed by the others, so users are then loaded from the database on
+every request, as simplejwt does. Writes that skip ``save()``, such as
+``User.objects.update()``, must call ``invalidate_user()`` themselves or
+wait out ``AUTH_USER_CACHE_TTL``.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def get_cache():
+    return caches[settings.AUTH_USER_CACHE_ALIAS]
+
+
+def cache_is_shared():
+    """Whether what one worker writes to the cache is seen by the others"""
+    return not isinstance(get_cache(), (LocMemCache, DummyCache))
+
+
+def version_key(user_id):
+    return f'auth:user-version:{user_id}'
+
+
+def user_version(user_id):
+    """Time of the user's last change, seeded on first use; None without a shared cache"""
+    if not cache_is_shared():
+        return None
+    cache = get_cache()
+    version = cache.get(version_key(user_id))
+    if version is None:
+        cache.add(version_key(user_id), time.time(), timeout=None)
+        version = cache.get(version_key(user_id), time.time())
+    return version
+
+
+async def auser_version(user_id):
+    if not cache_is_shared():
+        return None
+    cache = get_cache()
+    version = await cache.aget(version_key(user_id))
+    if version is None:
+        await cache.aadd(version_key(user_id), time.time(), timeout=None)
+        version = await cache.aget(version_key(user_id), time.time())
+    return version
+
+
+def invalidate_user(user_id):
+    """Stop every worker from serving its cached copy of the user"""
+    get_cache().set(version_key(user_id), time.time(), timeout=None)
+
+
+class UserCache:
+    """LRU of ``user_id -> (version, expiry, user)``, bounded by AUTH_USER_CACHE_SIZE"""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id, version):
+        """A private copy of the cached user, or None when missing, stale or expired"""
+        if version is None:
+            return None
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            cached_version, expires, user = entry
+            if cached_version != version or expires <= time.monotonic():
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+        return copy.copy(user)
+
+    def put(self, user_id, version, user):
+        if version is None or settings.AUTH_USER_CACHE_SIZE < 1:
+            return
+        entry = (version, time.monotonic() + settings.AUTH_USER_CACHE_TTL, copy.copy(user))
+        with self.lock:
+            self.entries[user_id] = entry
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > settings.AUTH_USER_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+users = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` serving users from the per-worker ``users`` cache when the cache is shared"""
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        version = user_version(user_id)
+        user = users.get(user_id, version)
+        if user is None:
+            user = super().get_user(validated_token)
+            users.put(user_id, version, user)
+            return user
+        self.check_user(user, validated_token)
+        return user
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+    def check_user(self, user, validated_token):
+        """The checks ``JWTAuthentication.get_user`` runs on a freshly loaded user"""
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
@@ -0,0 +1,127 @@
+"""
+In-process front for the refresh token blacklist.
+
+simplejwt checks ``BlacklistedToken`` with a query on every refresh, and
+with ``ROTATE_REFRESH_TOKENS`` every refresh is also an insert, so the
+tables and the lookups grow without bound. ``blacklisted`` keeps the ids
+(``jti``) of blacklisted tokens that have not expired yet in a set in each
+worker, so membership is answered without a query; expired tokens fail
+verification anyway and are dropped.
+
+Workers share a version in the Django cache that is bumped after every
+blacklisting commits. A worker seeing a new version reads only the rows
+added since its last sync, by primary key, and also resyncs at least every
+``TOKEN_BLACKLIST_SYNC_INTERVAL`` seconds. The set is warmed when a
+gunicorn worker starts, or on the first check.
+
+The version only reaches other workers through a shared cache backend.
+With a per-process one, a token another worker just blacklisted may be
+missing from the set, so ``is_blacklisted`` trusts the set only for the
+tokens it holds and asks ``BlacklistedToken`` about the rest.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .authentication import cache_is_shared, get_cache
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'auth:blacklist-version'
+
+# Rows below the highest id seen that are read again on every sync, for
+# blacklistings that commit out of id order
+SYNC_OVERLAP = 1000
+
+
+def current_version():
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time(), timeout=None)
+        version = cache.get(VERSION_KEY, time.time())
+    return version
+
+
+def bump_version():
+    get_cache().set(VERSION_KEY, time.time(), timeout=None)
+
+
+class Blacklist:
+    """Blacklisted jti -> expiry (epoch seconds), synced from ``BlacklistedToken``"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.expiries = {}
+        self.last_id = None
+        self.version = None
+        self.synced_at = 0.0
+
+    def __contains__(self, jti):
+        self.sync()
+        return jti in self.expiries
+
+    def __len__(self):
+        return len(self.expiries)
+
+    def warm(self):
+        """Load every live blacklisted token, dropping what was known"""
+        with self.lock:
+            self.expiries.clear()
+            self.last_id = None
+            self._sync(current_version())
+        logger.info('Token blacklist warmed', extra={'tokens': len(self.expiries)})
+
+    def sync(self):
+        version = current_version()
+        if version == self.version and time.monotonic() - self.synced_at < settings.TOKEN_BLACKLIST_SYNC_INTERVAL:
+            return
+        with self.lock:
+            if version != self.version or time.monotonic() - self.synced_at >= settings.TOKEN_BLACKLIST_SYNC_INTERVAL:
+                self._sync(version)
+
+    def _sync(self, version):
+        # The version is read before the rows, so a blacklisting that commits
+        # in between bumps it again and is picked up by the next check
+        now = timezone.now()
+        rows = BlacklistedToken.objects.filter(token__expires_at__gt=now)
+        if self.last_id is not None:
+            rows = rows.filter(pk__gt=self.last_id - SYNC_OVERLAP)
+        for pk, jti, expires_at in rows.values_list('pk', 'token__jti', 'token__expires_at').iterator():
+            self.expiries[jti] = expires_at.timestamp()
+            self.last_id = max(self.last_id or 0, pk)
+        if self.last_id is None:
+            self.last_id = 0
+
+        cutoff = now.timestamp()
+        for jti in [jti for jti, expiry in self.expiries.items() if expiry <= cutoff]:
+            del self.expiries[jti]
+        self.version = version
+        self.synced_at = time.monotonic()
+
+    def add(self, jti, expires_at):
+        """Record a token this worker just blacklisted and tell the others once it commits"""
+        with self.lock:
+            self.expiries[jti] = expires_at.timestamp()
+        transaction.on_commit(bump_version)
+
+    def clear(self):
+        with self.lock:
+            self.expiries.clear()
+            self.last_id = self.version = None
+            self.synced_at = 0.0
+
+
+blacklisted = Blacklist()
+
+
+def is_blacklisted(jti):
+    """Whether the token is blacklisted, asking the database on a miss unless the cache is shared"""
+    if jti in blacklisted:
+        return True
+    return not cache_is_shared() and BlacklistedToken.objects.filter(token__jti=jti).exists()
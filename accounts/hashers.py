@@ -0,0 +1,99 @@
+"""
+Password hasher profiles.
+
+``PASSWORD_HASHER_PROFILE`` (argon2, scrypt or pbkdf2) picks the hasher new
+passwords are stored with; settings lists the other profiles' hashers after
+it, so every stored hash still verifies. A successful login with a hash from
+another profile, or with other parameters than the configured ones, stores
+it again with the preferred hasher: ``must_update`` compares the stored
+parameters with the ``PASSWORD_*`` settings, which are read on every call so
+retuning needs no code change.
+
+The async login path runs hashing on ``hash_pool``, a thread pool bounded by
+``PASSWORD_HASH_THREADS`` per worker: argon2-cffi, hashlib's scrypt and
+PBKDF2 release the GIL, so hashes run in parallel on as many cores while a
+login burst queues instead of blocking the event loop.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth import hashers
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT_WORK_FACTOR
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_SCRYPT_BLOCK_SIZE
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_SCRYPT_PARALLELISM
+
+    @property
+    def maxmem(self):
+        # scrypt needs about 128 * r * N bytes; hashlib refuses over 32 MiB by default
+        return 256 * self.block_size * self.work_factor
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+_pool = None
+
+
+def hash_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_THREADS, thread_name_prefix='hasher')
+    return _pool
+
+
+async def run_hashing(func, *args):
+    """``func(*args)`` on the hash pool"""
+    return await asyncio.get_running_loop().run_in_executor(hash_pool(), functools.partial(func, *args))
+
+
+async def aauthenticate(email, password):
+    """``ModelBackend.authenticate`` through the async ORM, hashing on the hash pool"""
+    User = get_user_model()
+    try:
+        user = await User._default_manager.aget(**{User.USERNAME_FIELD: email})
+    except User.DoesNotExist:
+        # Hash anyway, like ModelBackend, so the response time doesn't tell
+        # which emails have an account
+        await run_hashing(hashers.make_password, password)
+        return None
+
+    upgrades = []
+    if not await run_hashing(hashers.check_password, password, user.password, upgrades.append):
+        return None
+    if not user.is_active:
+        return None
+    if upgrades:
+        user.password = await run_hashing(hashers.make_password, password)
+        await user.asave(update_fields=['password'])
+    return user
@@ -0,0 +1,69 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction as db_transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.authentication import CachedJWTAuthentication, cache_is_shared, users
+from expenses.management.seeding import throwaway_user
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Compare the per-request cost of JWTAuthentication and CachedJWTAuthentication'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000, help='Authenticated requests per class')
+        parser.add_argument('--user', help='Authenticate as this user (email) instead of a generated one')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be positive')
+        if not cache_is_shared():
+            self.stderr.write(self.style.WARNING(
+                'The cache is per-process, so CachedJWTAuthentication loads the user on every request; '
+                'point CACHE_BACKEND at a shared cache to measure the cached path'
+            ))
+
+        with db_transaction.atomic():
+            if options['user']:
+                user = User.objects.filter(email=options['user']).first()
+                if user is None:
+                    raise CommandError(f"No user with email {options['user']}")
+            else:
+                user = throwaway_user('bench-auth')
+            request = RequestFactory().get('/api/transactions/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+            users.clear()
+            results = [
+                ('JWTAuthentication', *self.run(JWTAuthentication(), request, options['requests'])),
+                ('CachedJWTAuthentication', *self.run(CachedJWTAuthentication(), request, options['requests'])),
+            ]
+            # Generated data is thrown away
+            db_transaction.set_rollback(not options['user'])
+
+        for name, elapsed, queries in results:
+            self.stdout.write(
+                f'{name}: {elapsed / options["requests"] * 1e6:,.1f} us/request, '
+                f'{queries / options["requests"]:.3f} queries/request'
+            )
+        saving = (results[0][1] - results[1][1]) / options['requests']
+        self.stdout.write(self.style.SUCCESS(
+            f'Cached: {saving * 1e6:,.1f} us and {(results[0][2] - results[1][2]) / options["requests"]:.3f} '
+            f'queries saved per request ({results[0][1] / results[1][1]:.1f}x)'
+        ))
+
+    def run(self, authentication, request, count):
+        started = time.perf_counter()
+        for _ in range(count):
+            authentication.authenticate(Request(request))
+        elapsed = time.perf_counter() - started
+        # Queries are counted separately so recording them doesn't skew the timing
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(count):
+                authentication.authenticate(Request(request))
+        return elapsed, len(queries.captured_queries)
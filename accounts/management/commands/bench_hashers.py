@@ -0,0 +1,47 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+PASSWORD = 'correct horse battery staple'
+
+
+class Command(BaseCommand):
+    help = (
+        'Time password verification with every hasher profile at the configured parameters, '
+        'to size PASSWORD_HASH_THREADS and the login capacity per core'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10, help='Verifications timed per profile')
+        parser.add_argument('--threads', type=int, default=0, help='Also time this many verifications in parallel on a pool of this size')
+        parser.add_argument('--profile', action='append', choices=sorted(settings.PASSWORD_HASHER_PROFILES), help='Profile to time (repeatable; default all)')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or options['threads'] < 0:
+            raise CommandError('--repeat must be positive and --threads not negative')
+
+        for profile in options['profile'] or sorted(settings.PASSWORD_HASHER_PROFILES):
+            hasher = import_string(settings.PASSWORD_HASHER_PROFILES[profile])()
+            encoded = hasher.encode(PASSWORD, hasher.salt())
+            start = time.perf_counter()
+            for _ in range(options['repeat']):
+                check_password(PASSWORD, encoded)
+            per_verify = (time.perf_counter() - start) / options['repeat']
+            marker = ' (preferred)' if profile == settings.PASSWORD_HASHER_PROFILE else ''
+            self.stdout.write(
+                f'{profile}{marker}: {per_verify * 1000:.1f} ms per verify, '
+                f'{1 / per_verify:.1f} logins/s per core'
+            )
+
+            if options['threads']:
+                with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                    start = time.perf_counter()
+                    list(pool.map(lambda _: check_password(PASSWORD, encoded), range(options['threads'] * options['repeat'])))
+                    elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f'  {options["threads"]} threads: {options["threads"] * options["repeat"] / elapsed:.1f} logins/s'
+                )
@@ -3,6 +3,9 @@ from .models import User
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as BaseTokenRefreshSerializer
+from tracker.uniqueness import UniqueViolationMixin
+from .tokens import RefreshToken
 class UserSerializers(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -10,7 +13,7 @@ class UserSerializers(serializers.ModelSerializer):
         fields=['id','username','email','first_name','last_name','created_at',]
         read_only_fields = ['id','created_at']
 
-class UserRegiSerializer(serializers.ModelSerializer):
+class UserRegiSerializer(UniqueViolationMixin, serializers.ModelSerializer):
     password= serializers.CharField(write_only=True,style={'input_type':'password'})
     password_confirm= serializers.CharField(write_only=True,style={'input_type':'password'})
     phone = serializers.CharField(required=False, allow_blank=True, max_length=15)
@@ -18,18 +21,12 @@ class UserRegiSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['username', 'email', 'first_name', 'last_name', 'phone', 'password', 'password_confirm']
+        # Email and username uniqueness is left to the database (see create)
+        extra_kwargs = {
+            'email': {'validators': []},
+            'username': {'validators': [User.username_validator]},
+        }
 
-
-    def validate_email(self,value):
-        if User.objects.filter(email=value).exists():
-            raise serializers.ValidationError("A user with this username already exists.")
-        return value
-    
-    def validate_username(self,value):
-        if User.objects.filter(username=value).exists():
-            raise serializers.ValidationError("A user with same username already exists.")
-        return value
-    
     def validate(self, attrs):
         password=attrs.get('password')
         password_confirm=attrs.get('password_confirm')
@@ -46,12 +43,15 @@ class UserRegiSerializer(serializers.ModelSerializer):
         password = validated_data.pop('password')
         user = User(**validated_data)
         user.set_password(password)
-        user.save()
+        with self.unique_violations():
+            user.save()
         return user
     
-class LoginSerializer(serializers.Serializer):
+class CredentialsSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True, style={'input_type': 'password'})
+
+class LoginSerializer(CredentialsSerializer):
     def validate(self, attrs):
         email = attrs.get('email')
         password = attrs.get('password')
@@ -91,4 +91,9 @@ class ChangePasswordSerializer(serializers.Serializer):
         user=self.context['request'].user
         user.set_password(self.validated_data['new_password'])
         user.save()
-        return user
\ No newline at end of file
+        return user
+
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    """Refresh with the blacklist answered in-process (see accounts.blacklist)"""
+    token_class = RefreshToken
@@ -1,3 +1,322 @@
-from django.test import TestCase
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import UserCache, user_version, users
+from .blacklist import Blacklist, blacklisted
+from .hashers import PBKDF2PasswordHasher
+from .models import User
+from .tokens import RefreshToken
+
+# A cache all workers see, which the in-process fast paths rely on
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'expense-tracker-tests'),
+    }
+}
+
+
+class RegistrationTests(TestCase):
+    def setUp(self):
+        User.objects.create_user(
+            username='alice', email='alice@example.com', password='pass12345',
+            first_name='Alice', last_name='Smith',
+        )
+        self.client = APIClient()
+
+    def register(self, **fields):
+        data = {
+            'username': 'bob', 'email': 'bob@example.com', 'first_name': 'Bob', 'last_name': 'Jones',
+            'password': 'N3w-pass-12345', 'password_confirm': 'N3w-pass-12345',
+        }
+        data.update(fields)
+        return self.client.post('/api/auth/register/', data, format='json')
+
+    def test_register(self):
+        response = self.register()
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['user']['email'], 'bob@example.com')
+
+    def test_taken_email_and_username(self):
+        response = self.register(email='alice@example.com')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], {'email': ['user with this email already exists.']})
+        response = self.register(username='alice')
+        self.assertEqual(response.json()['errors'], {'username': ['A user with that username already exists.']})
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_uniqueness_costs_no_lookups(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.register(email='alice@example.com')
+        self.assertFalse([query for query in ctx.captured_queries if query['sql'].startswith('SELECT')])
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        users.clear()
+        self.user = User.objects.create_user(
+            username='alice', email='alice@example.com', password='pass12345',
+            first_name='Alice', last_name='Smith',
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_steady_state_requests_skip_the_user_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/auth/profile/').status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.json()['email'], 'alice@example.com')
+
+    def test_profile_update_invalidates(self):
+        self.client.get('/api/auth/profile/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch('/api/auth/profile/', {'first_name': 'Alicia'})
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.json()['first_name'], 'Alicia')
+
+    def test_password_change_and_logout_invalidate(self):
+        self.client.get('/api/auth/profile/')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put('/api/auth/change-password/', {
+                'old_password': 'pass12345', 'new_password': 'N3w-pass-12345', 'new_password_confirm': 'N3w-pass-12345',
+            })
+        self.assertEqual(response.status_code, 200, response.content)
+        with self.assertNumQueries(1):
+            self.client.get('/api/auth/profile/')
+
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, 200)
+        with self.assertNumQueries(1):
+            self.client.get('/api/auth/profile/')
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get('/api/auth/profile/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 401)
+
+    def test_requests_get_their_own_copy(self):
+        self.client.get('/api/auth/profile/')
+        # Tokens carry the user id as a string
+        first = users.get(str(self.user.pk), user_version(self.user.pk))
+        first.first_name = 'Changed'
+        second = users.get(str(self.user.pk), user_version(self.user.pk))
+        self.assertEqual(second.first_name, 'Alice')
+
+
+class LocalCacheAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        users.clear()
+        self.user = User.objects.create_user(
+            username='alice', email='alice@example.com', password='pass12345',
+            first_name='Alice', last_name='Smith',
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_users_are_not_cached_per_process(self):
+        self.client.get('/api/auth/profile/')
+        with self.assertNumQueries(1):
+            self.client.get('/api/auth/profile/')
+        self.assertEqual(len(users), 0)
+
+    def test_changes_made_by_other_workers_apply_at_once(self):
+        self.client.get('/api/auth/profile/')
+        # Another worker's change: nothing in this process is told about it
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 401)
+
+
+class UserCacheTests(TestCase):
+    @override_settings(AUTH_USER_CACHE_SIZE=2)
+    def test_least_recently_used_entries_are_evicted(self):
+        lru = UserCache()
+        for user_id in (1, 2):
+            lru.put(user_id, 'v', User(pk=user_id))
+        lru.get(1, 'v')
+        lru.put(3, 'v', User(pk=3))
+        self.assertEqual(len(lru), 2)
+        self.assertIsNone(lru.get(2, 'v'))
+        self.assertEqual(lru.get(1, 'v').pk, 1)
+
+    @override_settings(AUTH_USER_CACHE_TTL=0)
+    def test_entries_expire(self):
+        lru = UserCache()
+        lru.put(1, 'v', User(pk=1))
+        self.assertIsNone(lru.get(1, 'v'))
+
+    def test_stale_versions_miss(self):
+        lru = UserCache()
+        lru.put(1, 'old', User(pk=1))
+        self.assertIsNone(lru.get(1, 'new'))
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class TokenBlacklistTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        blacklisted.clear()
+        self.user = User.objects.create_user(
+            username='alice', email='alice@example.com', password='pass12345',
+            first_name='Alice', last_name='Smith',
+        )
+        self.client = APIClient()
+
+    def refresh(self, token):
+        return self.client.post('/api/auth/token/refresh/', {'refresh': str(token)})
+
+    def test_refresh_checks_the_blacklist_in_process(self):
+        first = self.refresh(RefreshToken.for_user(self.user))
+        self.assertEqual(first.status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.refresh(first.json()['refresh'])
+        self.assertEqual(second.status_code, 200)
+        self.assertFalse([query for query in queries.captured_queries if 'blacklistedtoken' in query['sql']])
+
+    def test_logged_out_refresh_token_is_rejected(self):
+        token = RefreshToken.for_user(self.user)
+        self.assertEqual(self.refresh(token).status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token.access_token}')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/auth/logout/', {'refresh_token': str(token)})
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_other_workers_pick_up_blacklistings(self):
+        worker = Blacklist()
+        worker.warm()
+        token = RefreshToken.for_user(self.user)
+        self.assertNotIn(token['jti'], worker)
+        with self.captureOnCommitCallbacks(execute=True):
+            token.blacklist()
+        self.assertIn(token['jti'], worker)
+
+    @override_settings(TOKEN_BLACKLIST_SYNC_INTERVAL=0)
+    def test_periodic_sync_without_a_shared_cache(self):
+        worker = Blacklist()
+        worker.warm()
+        token = RefreshToken.for_user(self.user)
+        token.blacklist()  # the version bump never runs
+        self.assertIn(token['jti'], worker)
+
+    def test_prune_deletes_expired_tokens_in_batches(self):
+        now = timezone.now()
+        expired = [
+            OutstandingToken.objects.create(user=self.user, jti=f'old-{number}', token='', expires_at=now - timedelta(days=1))
+            for number in range(5)
+        ]
+        BlacklistedToken.objects.create(token=expired[0])
+        live = RefreshToken.for_user(self.user)
+        live.blacklist()
+        out = StringIO()
+        call_command('prune_tokens', batch_size=2, stdout=out)
+        self.assertIn('Deleted 5 expired outstanding tokens (1 of them blacklisted)', out.getvalue())
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), [live['jti']])
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+
+
+class LocalCacheBlacklistTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        blacklisted.clear()
+        self.user = User.objects.create_user(
+            username='alice', email='alice@example.com', password='pass12345',
+            first_name='Alice', last_name='Smith',
+        )
+        self.client = APIClient()
+
+    def refresh(self, token):
+        return self.client.post('/api/auth/token/refresh/', {'refresh': str(token)})
+
+    def test_tokens_blacklisted_by_other_workers_are_rejected_at_once(self):
+        token = RefreshToken.for_user(self.user)
+        blacklisted.warm()
+        # Another worker's blacklisting: this process's set never hears of it
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=token['jti']))
+        self.assertNotIn(token['jti'], blacklisted.expiries)
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_known_blacklisted_tokens_skip_the_query(self):
+        blacklisted.warm()
+        token = RefreshToken.for_user(self.user)
+        token.blacklist()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.refresh(token).status_code, 401)
+        self.assertFalse([query for query in queries.captured_queries if 'blacklistedtoken' in query['sql']])
+
+
+class PasswordHasherTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='alice', email='alice@example.com', password='pass12345',
+            first_name='Alice', last_name='Smith',
+        )
+        self.client = APIClient()
+
+    def login(self, url='/api/auth/login/', password='pass12345'):
+        return self.client.post(url, {'email': 'alice@example.com', 'password': password}, format='json')
+
+    def use_legacy_hash(self):
+        User.objects.filter(pk=self.user.pk).update(password=make_password('pass12345', hasher='pbkdf2_sha256'))
+
+    def stored_algorithm(self):
+        self.user.refresh_from_db()
+        return identify_hasher(self.user.password).algorithm
+
+    def test_preferred_profile_comes_first(self):
+        self.assertEqual(settings.PASSWORD_HASHERS[0], settings.PASSWORD_HASHER_PROFILES[settings.PASSWORD_HASHER_PROFILE])
+        self.assertCountEqual(settings.PASSWORD_HASHERS, settings.PASSWORD_HASHER_PROFILES.values())
+        self.assertEqual(self.stored_algorithm(), 'argon2')
+
+    def test_login_rehashes_legacy_passwords(self):
+        self.use_legacy_hash()
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(self.stored_algorithm(), 'argon2')
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_parameters_follow_settings(self):
+        encoded = make_password('pass12345', hasher='pbkdf2_sha256')
+        self.assertEqual(encoded.split('$')[1], '1000')
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertTrue(PBKDF2PasswordHasher().must_update(encoded))
+
+    def test_async_login_matches_sync_login(self):
+        sync = self.login().json()
+        response = self.login('/api/async/auth/login/')
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        self.assertEqual(body['user'], sync['user'])
+        self.assertEqual(body['message'], sync['message'])
+        self.assertEqual(set(body['tokens']), {'refresh', 'access'})
+
+    def test_async_login_rejects_bad_credentials(self):
+        self.assertEqual(self.login('/api/async/auth/login/', password='wrong').json(), {'non_field_errors': ['Invalid credentials']})
+        response = self.client.post('/api/async/auth/login/', {'email': 'nobody@example.com', 'password': 'x'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/api/async/auth/login/').status_code, 405)
+
+    def test_async_login_rehashes_legacy_passwords(self):
+        self.use_legacy_hash()
+        self.assertEqual(self.login('/api/async/auth/login/').status_code, 200)
+        self.assertEqual(self.stored_algorithm(), 'argon2')
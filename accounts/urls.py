@@ -1,7 +1,7 @@
 from django.urls import path
 
 from rest_framework_simplejwt.views import TokenRefreshView
-from . import views
+from . import views, async_views
 
 
 urlpatterns=[
@@ -13,3 +13,7 @@ urlpatterns=[
     path('change-password/', views.ChangePasswordView.as_view(), name='change_password'),
     
 ]
+
+async_urlpatterns=[
+    path('login/', async_views.login, name='async-login'),
+]
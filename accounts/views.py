@@ -1,65 +1,81 @@
+import logging
+
 from rest_framework import status, generics,permissions
 # Create your views here.
 from .models import User
 from rest_framework.decorators import api_view,permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny,IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from .serializers import (UserSerializers,LoginSerializer,UserRegiSerializer,ChangePasswordSerializer)
+from .authentication import invalidate_user
+from .tokens import RefreshToken
+
+logger = logging.getLogger(__name__)
+
+def tokens_for(user):
+    refresh = RefreshToken.for_user(user)
+    return {
+        'refresh': str(refresh),
+        'access': str(refresh.access_token),
+    }
+
+def login_payload(user):
+    """The login response body, shared with the async login"""
+    return {
+        'user': UserSerializers(user).data,
+        'tokens': tokens_for(user),
+        'message': 'Login successful!'
+    }
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
 
 def register(request):
-    print(f"Registration data received: {request.data}")
     serializer= UserRegiSerializer(data=request.data)
     if serializer.is_valid():
-        user = serializer.save()
-        refresh = RefreshToken.for_user(user)
-        return Response({
-            'user': UserSerializers(user).data,
-            'tokens':{
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-            },
-            'message': 'User registered successfully!'
-        },status=status.HTTP_201_CREATED)
-    print(f"Registration validation errors: {serializer.errors}")
+        try:
+            user = serializer.save()
+        except ValidationError as exc:
+            # Email or username taken, caught by the unique constraint
+            errors = exc.detail
+        else:
+            logger.info('User registered', extra={'user_id': user.pk})
+            return Response({
+                'user': UserSerializers(user).data,
+                'tokens': tokens_for(user),
+                'message': 'User registered successfully!'
+            },status=status.HTTP_201_CREATED)
+    else:
+        errors = serializer.errors
+    logger.info('Registration rejected', extra={'fields': sorted(errors)})
     return Response({
-        'errors': serializer.errors,
+        'errors': errors,
         'message': 'Registration failed. Please check the errors.'
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def login(request):
-    print(f"Login attempt - Data received: {request.data}")
     serializer = LoginSerializer(data=request.data,context={'request':request})
     if serializer.is_valid():
-       print(f"Login successful for user: {serializer.validated_data['user'].email}")
        user =serializer.validated_data['user']
-       refresh=RefreshToken.for_user(user)
-       return Response({
-           'user': UserSerializers(user).data,
-           'tokens': {
-               'refresh': str(refresh), 
-                'access': str(refresh.access_token),
-              },
-              'message': 'Login successful!'
-       })
-    print(f"Login validation errors: {serializer.errors}")
+       logger.info('Login succeeded', extra={'user_id': user.pk})
+       return Response(login_payload(user))
+    logger.info('Login rejected', extra={'fields': sorted(serializer.errors)})
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def logout(request):
+    invalidate_user(request.user.pk)
     try:
         refresh_token = request.data.get('refresh_token')
         if refresh_token:
             token= RefreshToken(refresh_token)
             token.blacklist()
-        return Response({'message': 'Logout successful!'}), 
+        return Response({'message': 'Logout successful!'})
     except Exception as e:
         return Response({'message': 'Logout successful!'},status=status.HTTP_200_OK)
 
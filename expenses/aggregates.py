@@ -0,0 +1,75 @@
+"""
+Conditional aggregation over transaction querysets.
+
+All per-type totals and counts are computed in a single ``aggregate()`` call
+using ``Sum(..., filter=Q(...))`` / ``Count(..., filter=Q(...))`` so callers
+never issue one query per metric. The ``a``-prefixed variants run the same
+query through the async ORM.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+
+from .models import TRANSACTION_TYPES
+
+TYPE_KEYS = [key for key, _ in TRANSACTION_TYPES]
+
+
+def totals_by_type(queryset, amount='amount', count=None):
+    """Return ``<type>_total``/``<type>_count`` for every type plus ``transaction_count``.
+
+    ``amount`` names the column to sum. Pass ``count`` to sum a stored count
+    column (as on ``DailyRollup``) instead of counting rows.
+    """
+    return _totals(queryset.order_by().aggregate(**_type_aggregates(amount, count)))
+
+
+async def atotals_by_type(queryset, amount='amount', count=None):
+    """``totals_by_type`` through the async ORM"""
+    return _totals(await queryset.order_by().aaggregate(**_type_aggregates(amount, count)))
+
+
+def _type_aggregates(amount, count):
+    def counter(**extra):
+        return Sum(count, **extra) if count else Count('pk', **extra)
+
+    # Aliases are prefixed so they can't clash with a column being summed
+    aggregates = {'agg_transaction_count': counter()}
+    for transaction_type in TYPE_KEYS:
+        only_type = Q(transaction_type=transaction_type)
+        aggregates[f'agg_{transaction_type}_total'] = Sum(amount, filter=only_type)
+        aggregates[f'agg_{transaction_type}_count'] = counter(filter=only_type)
+    return aggregates
+
+
+def _totals(result):
+    totals = {'transaction_count': result['agg_transaction_count'] or 0}
+    for transaction_type in TYPE_KEYS:
+        totals[f'{transaction_type}_total'] = result[f'agg_{transaction_type}_total'] or Decimal('0')
+        totals[f'{transaction_type}_count'] = result[f'agg_{transaction_type}_count'] or 0
+    return totals
+
+
+def rollup_totals(queryset):
+    """``totals_by_type`` over a ``DailyRollup`` queryset"""
+    return totals_by_type(queryset, amount='total', count='transaction_count')
+
+
+async def arollup_totals(queryset):
+    return await atotals_by_type(queryset, amount='total', count='transaction_count')
+
+
+def summary_payload(totals):
+    """Shape totals the way /transactions/summary/ has always returned them"""
+    income = totals['income_total']
+    # Include transfers as expenses (money leaving accounts)
+    outgoing = totals['expense_total'] + totals['transfer_total']
+    return {
+        'total_income': float(income),
+        'total_expenses': float(outgoing),
+        'net_amount': float(income - outgoing),
+        'transaction_count': totals['transaction_count'],
+        'income_count': totals['income_count'],
+        'expense_count': totals['expense_count'],
+        'transfer_count': totals['transfer_count'],
+    }
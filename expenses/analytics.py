@@ -0,0 +1,504 @@
+"""
+Metrics behind the ai_insights endpoint.
+
+Everything is gathered in three round trips however many metrics are added:
+one conditional aggregate over the daily rollups for every window/type
+total and count, one over raw expense rows for the amount-based metrics the
+rollups can't answer, and one grouped query for the top categories.
+``abuild_spending_data`` issues the same three through the async ORM, and
+``build_insights`` turns either result into the insight cards.
+``expenses.columnar`` computes the same metrics, and more, from a user's full
+history loaded as NumPy arrays.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+from .aggregates import TYPE_KEYS
+
+# Expenses at or above this amount count as "large" (fixed) spending
+LARGE_EXPENSE_THRESHOLD = 100
+
+
+def insight_windows(today):
+    """``(start, end)`` date bounds of the windows the insights compare"""
+    last_7_days = today - timedelta(days=7)
+    last_30_days = today - timedelta(days=30)
+    last_60_days = today - timedelta(days=60)
+    return {
+        'current': (last_30_days, None),
+        'previous': (last_60_days, last_30_days),
+        'week': (last_7_days, None),
+    }
+
+
+def in_window(bounds):
+    start, end = bounds
+    window = Q(date__gte=start)
+    if end is not None:
+        window &= Q(date__lt=end)
+    return window
+
+
+def window_totals(rollups, windows):
+    """Per-window, per-type totals and counts from one aggregate over rollups"""
+    queryset, aggregates = _window_totals_query(rollups, windows)
+    return _or_zero(queryset.aggregate(**aggregates), 0)
+
+
+def _window_totals_query(rollups, windows):
+    aggregates = {}
+    for window, bounds in windows.items():
+        for transaction_type in TYPE_KEYS:
+            only = in_window(bounds) & Q(transaction_type=transaction_type)
+            aggregates[f'{window}_{transaction_type}_total'] = Sum('total', filter=only)
+            aggregates[f'{window}_{transaction_type}_count'] = Sum('transaction_count', filter=only)
+
+    # Spending diversity. COUNT(DISTINCT) skips NULL, so uncategorized
+    # spending is counted separately as one more category.
+    spent = in_window(windows['current']) & Q(transaction_type='expense', transaction_count__gt=0)
+    aggregates['current_categories'] = Count('category', distinct=True, filter=spent)
+    aggregates['current_uncategorized'] = Count('pk', filter=spent & Q(category__isnull=True))
+
+    earliest = min(start for start, _ in windows.values())
+    return rollups.filter(date__gte=earliest).order_by(), aggregates
+
+
+def expense_shape(transactions, bounds):
+    """Largest expense and the large/small split, from raw rows in one query"""
+    queryset, aggregates = _expense_shape_query(transactions, bounds)
+    return _or_zero(queryset.aggregate(**aggregates), Decimal('0'))
+
+
+def _expense_shape_query(transactions, bounds):
+    large = Q(amount__gte=LARGE_EXPENSE_THRESHOLD)
+    return transactions.filter(in_window(bounds), transaction_type='expense').order_by(), {
+        'largest': Max('amount'),
+        'large': Sum('amount', filter=large),
+        'small': Sum('amount', filter=~large),
+    }
+
+
+def top_expense_categories(rollups, bounds, limit=5):
+    return list(_top_categories_query(rollups, bounds, limit))
+
+
+def _top_categories_query(rollups, bounds, limit=5):
+    return (
+        rollups.filter(in_window(bounds), transaction_type='expense')
+        .values('category__name')
+        .annotate(category_total=Sum('total'))
+        .order_by('-category_total')[:limit]
+    )
+
+
+def _or_zero(result, zero):
+    return {key: value or zero for key, value in result.items()}
+
+
+def build_spending_data(transactions, rollups, today):
+    """Assemble the ``spending_data`` payload the insight rules work from"""
+    windows = insight_windows(today)
+    return _spending_data(
+        window_totals(rollups, windows),
+        expense_shape(transactions, windows['current']),
+        top_expense_categories(rollups, windows['current']),
+    )
+
+
+async def abuild_spending_data(transactions, rollups, today):
+    """``build_spending_data`` through the async ORM, in the same three queries"""
+    windows = insight_windows(today)
+    queryset, aggregates = _window_totals_query(rollups, windows)
+    totals = _or_zero(await queryset.aaggregate(**aggregates), 0)
+    queryset, aggregates = _expense_shape_query(transactions, windows['current'])
+    shape = _or_zero(await queryset.aaggregate(**aggregates), Decimal('0'))
+    categories = [
+        item async for item in _top_categories_query(rollups, windows['current']).aiterator()
+    ]
+    return _spending_data(totals, shape, categories)
+
+
+def _spending_data(totals, shape, categories):
+    def total(window, transaction_type):
+        return Decimal(totals[f'{window}_{transaction_type}_total'])
+
+    current_income = total('current', 'income')
+    current_expenses = total('current', 'expense')
+    current_transfers = total('current', 'transfer')
+    previous_income = total('previous', 'income')
+    previous_expenses = total('previous', 'expense')
+    previous_transfers = total('previous', 'transfer')
+    expense_count = totals['current_expense_count']
+    avg_expense = current_expenses / expense_count if expense_count else Decimal('0')
+    unique_categories = totals['current_categories'] + (1 if totals['current_uncategorized'] else 0)
+
+    return {
+        'current_month': {
+            'income': float(current_income),
+            'expenses': float(current_expenses + current_transfers),
+            'balance': float(current_income - current_expenses - current_transfers)
+        },
+        'previous_month': {
+            'income': float(previous_income),
+            'expenses': float(previous_expenses + previous_transfers),
+            'balance': float(previous_income - previous_expenses - previous_transfers)
+        },
+        'top_categories': [
+            {'category': item['category__name'] or 'Uncategorized', 'amount': float(item['category_total'])}
+            for item in categories
+        ],
+        'analytics': {
+            'weekly_burn_rate': float(total('week', 'expense') + total('week', 'transfer')),
+            'avg_expense': float(avg_expense),
+            'expense_count': expense_count,
+            'income_count': totals['current_income_count'],
+            'unique_categories': unique_categories,
+            'largest_expense': float(shape['largest']),
+            'large_expenses': float(shape['large']),
+            'small_expenses': float(shape['small'])
+        }
+    }
+
+
+def build_insights(spending_data):
+    """The insight cards derived from ``build_spending_data`` output, most important first"""
+    insights = []
+
+    # Get the data
+    current_income = spending_data['current_month']['income']
+    current_expenses = spending_data['current_month']['expenses']
+    current_balance = spending_data['current_month']['balance']
+    previous_income = spending_data['previous_month']['income']
+    previous_expenses = spending_data['previous_month']['expenses']
+
+    income_change = current_income - previous_income
+    expense_change = current_expenses - previous_expenses
+
+    # Only show meaningful insights (skip if no previous data or first month)
+    has_previous_data = previous_expenses > 0 or previous_income > 0
+
+    # 1. Overall Financial Health - Always show this first
+    if current_balance > 0:
+        savings_rate = (current_balance / current_income * 100) if current_income > 0 else 0
+        if savings_rate >= 20:
+            insights.append({
+                'title': '🌟 Excellent Financial Health!',
+                'message': f"You're saving {savings_rate:.1f}% of your income (${current_balance:.2f} this month). That's above the recommended 20%! You're building wealth effectively."
+            })
+        elif savings_rate >= 10:
+            insights.append({
+                'title': '✅ Good Financial Health',
+                'message': f"You're saving {savings_rate:.1f}% of your income (${current_balance:.2f}). Try to increase this to 20% for optimal financial security. You're on the right track!"
+            })
+        else:
+            insights.append({
+                'title': '💡 Room for Improvement',
+                'message': f"You're saving {savings_rate:.1f}% of your income (${current_balance:.2f}). Financial experts recommend saving 20%. Look at your expenses to find savings opportunities."
+            })
+    else:
+        deficit = abs(current_balance)
+        if deficit > current_income * 0.5:
+            insights.append({
+                'title': '� Critical Budget Alert',
+                'message': f"You're ${deficit:.2f} over budget (spending {(current_expenses/current_income*100):.0f}% more than you earn). This is unsustainable. Prioritize only essential expenses immediately."
+            })
+        else:
+            insights.append({
+                'title': '⚠️ Budget Deficit',
+                'message': f"You're ${deficit:.2f} over budget this month. Review your non-essential expenses and try to cut back where possible to avoid debt."
+            })
+
+    # 2. Spending Trend (only if we have previous data)
+    if has_previous_data and abs(expense_change) > 100:  # Only if change is significant
+        if expense_change > 0:
+            change_percent = (expense_change / previous_expenses * 100) if previous_expenses > 0 else 0
+            if change_percent > 30:
+                insights.append({
+                    'title': '📈 Major Spending Increase',
+                    'message': f"Your expenses jumped by ${expense_change:.2f} ({change_percent:.0f}% increase). This is a significant change. Was this planned (like a big purchase) or unexpected?"
+                })
+            elif change_percent > 10:
+                insights.append({
+                    'title': '📊 Spending Up',
+                    'message': f"Your expenses increased by ${expense_change:.2f} ({change_percent:.0f}% increase). Review your top categories to see what drove this change."
+                })
+        else:
+            change_percent = (abs(expense_change) / previous_expenses * 100) if previous_expenses > 0 else 0
+            insights.append({
+                'title': '🎉 Great Job! Spending Down',
+                'message': f"You reduced expenses by ${abs(expense_change):.2f} ({change_percent:.0f}% decrease). Excellent discipline! Keep this momentum going."
+            })
+
+    # 3. Category Analysis - Make it actionable
+    if spending_data['top_categories']:
+        top_cat = spending_data['top_categories'][0]
+        category_percent = (top_cat['amount'] / current_expenses * 100) if current_expenses > 0 else 0
+
+        # Smart category advice based on typical spending patterns
+        category_name = (top_cat['category'] or '').lower()
+        if category_percent > 50:
+            insights.append({
+                'title': f'🔍 {top_cat["category"]} Dominates Budget',
+                'message': f"{top_cat['category']} is {category_percent:.0f}% of your spending (${top_cat['amount']:.2f}). This seems unusually high. Was this a one-time expense or recurring?"
+            })
+        elif 'food' in category_name or 'dining' in category_name or 'restaurant' in category_name:
+            insights.append({
+                'title': f'🍽️ {top_cat["category"]} Spending',
+                'message': f"You spent ${top_cat['amount']:.2f} on {top_cat['category']}. Meal prepping and cooking at home can save 40-60% on food costs."
+            })
+        elif 'transport' in category_name or 'gas' in category_name or 'car' in category_name:
+            insights.append({
+                'title': f'🚗 {top_cat["category"]} Costs',
+                'message': f"${top_cat['amount']:.2f} went to {top_cat['category']}. Consider carpooling, public transit, or route optimization to reduce costs."
+            })
+        elif 'entertainment' in category_name or 'shopping' in category_name:
+            insights.append({
+                'title': f'🎯 {top_cat["category"]} Spending',
+                'message': f"${top_cat['amount']:.2f} on {top_cat['category']}. These discretionary expenses offer the best opportunity for quick savings if needed."
+            })
+        else:
+            insights.append({
+                'title': f'📌 Top Category: {top_cat["category"]}',
+                'message': f"${top_cat['amount']:.2f} ({category_percent:.0f}% of expenses) went to {top_cat['category']}. Focus optimization efforts here for maximum impact."
+            })
+
+    # 4. Income insights (only if meaningful change)
+    if has_previous_data and abs(income_change) > 100:
+        if income_change > 0:
+            insights.append({
+                'title': '💰 Income Boost',
+                'message': f"Your income increased by ${income_change:.2f}! Consider the 50/30/20 rule: allocate 50% to needs, 30% to wants, and 20% to savings/debt."
+            })
+        elif income_change < 0:
+            insights.append({
+                'title': '📉 Income Dip',
+                'message': f"Income decreased by ${abs(income_change):.2f}. Focus on essential expenses only and consider ways to supplement income if this continues."
+            })
+
+    # 5. Actionable next step
+    if current_balance > current_expenses:
+        insights.append({
+            'title': '🎯 Action: Build Emergency Fund',
+            'message': f"You have strong savings (${current_balance:.2f})! Aim for 3-6 months of expenses (${current_expenses*3:.2f}-${current_expenses*6:.2f}) in an emergency fund."
+        })
+    elif current_balance > 0 and current_balance < current_expenses * 3:
+        insights.append({
+            'title': '🎯 Action: Increase Emergency Fund',
+            'message': f"Keep building that emergency fund! Target: ${current_expenses*3:.2f} (3 months expenses). You're {(current_balance/(current_expenses*3)*100):.0f}% there."
+        })
+    elif current_balance < 0:
+        insights.append({
+            'title': '🎯 Action: Stop the Bleeding',
+            'message': f"Priority: Cut non-essential spending immediately. Review subscriptions, dining out, and entertainment. Every dollar counts right now."
+        })
+
+    # 6. Weekly Spending Pattern (Burn Rate)
+    weekly_burn = spending_data['analytics']['weekly_burn_rate']
+    if weekly_burn > 0:
+        projected_monthly = weekly_burn * 4.33  # Average weeks per month
+        if projected_monthly > current_expenses * 1.2:
+            insights.append({
+                'title': '🔥 High Burn Rate Alert',
+                'message': f"Last 7 days: ${weekly_burn:.2f} spent. At this pace, you'll spend ${projected_monthly:.2f} this month (vs ${current_expenses:.2f} average). Slow down!"
+            })
+        elif projected_monthly < current_expenses * 0.8:
+            insights.append({
+                'title': '✨ Great Spending Control',
+                'message': f"Last 7 days: ${weekly_burn:.2f}. At this pace (${projected_monthly:.2f}/month), you're spending less than usual. Keep it up!"
+            })
+
+    # 7. Transaction Behavior Analysis
+    avg_expense = spending_data['analytics']['avg_expense']
+    expense_count = spending_data['analytics']['expense_count']
+    if expense_count > 0:
+        if avg_expense < 20:
+            insights.append({
+                'title': '💳 Small Purchase Pattern',
+                'message': f"You made {expense_count} transactions averaging ${avg_expense:.2f}. Many small purchases add up! Consider a daily spending limit."
+            })
+        elif avg_expense > 100:
+            insights.append({
+                'title': '💰 Large Purchase Pattern',
+                'message': f"Average transaction: ${avg_expense:.2f} across {expense_count} purchases. You tend to make fewer, larger purchases - ensure each one is necessary."
+            })
+
+        # Transaction frequency
+        daily_transactions = expense_count / 30
+        if daily_transactions > 3:
+            insights.append({
+                'title': '📊 Frequent Spender',
+                'message': f"You make {daily_transactions:.1f} transactions daily. Each swipe is a decision - try bundling purchases to reduce impulse spending."
+            })
+
+    # 8. Spending Diversity
+    unique_cats = spending_data['analytics']['unique_categories']
+    if unique_cats > 8:
+        insights.append({
+            'title': '🎨 Diverse Spending',
+            'message': f"You're spending across {unique_cats} categories. While varied, this makes budgeting harder. Focus on consolidating similar expenses."
+        })
+    elif unique_cats <= 3 and current_expenses > 0:
+        insights.append({
+            'title': '🎯 Focused Spending',
+            'message': f"Only {unique_cats} spending categories. This focus makes budgeting easier and helps identify cost-saving opportunities."
+        })
+
+    # 9. Large vs Small Expenses (Fixed vs Variable)
+    large_exp = spending_data['analytics']['large_expenses']
+    small_exp = spending_data['analytics']['small_expenses']
+    if large_exp > 0 and small_exp > 0:
+        large_percent = (large_exp / current_expenses * 100) if current_expenses > 0 else 0
+        if large_percent > 70:
+            insights.append({
+                'title': '🏠 Fixed Expense Heavy',
+                'message': f"{large_percent:.0f}% of spending is large transactions ($100+). These fixed costs limit flexibility. Look for ways to reduce big-ticket items."
+            })
+        elif large_percent < 30:
+            insights.append({
+                'title': '🔄 Variable Expense Heavy',
+                'message': f"{100-large_percent:.0f}% of spending is small transactions. These variable costs are easier to control - great opportunity for savings!"
+            })
+
+    # 10. Largest Expense Warning
+    largest = spending_data['analytics']['largest_expense']
+    if largest > current_expenses * 0.3 and largest > 0:
+        insights.append({
+            'title': '⚠️ Large Single Expense Detected',
+            'message': f"Your biggest expense was ${largest:.2f} ({(largest/current_expenses*100):.0f}% of total spending). Was this planned? Consider spreading large purchases across months."
+        })
+
+    # 11. Income Streams
+    income_count = spending_data['analytics']['income_count']
+    if income_count == 1 and current_income > 0:
+        insights.append({
+            'title': '💼 Single Income Stream',
+            'message': f"You have 1 income source. Consider building a side income or emergency fund to protect against job loss or income disruption."
+        })
+    elif income_count > 3:
+        insights.append({
+            'title': '🌟 Multiple Income Streams',
+            'message': f"Excellent! You have {income_count} income sources. This diversification provides financial security and resilience."
+        })
+
+    # 12. Savings Rate Benchmark
+    if current_income > 0:
+        savings_rate = (current_balance / current_income * 100)
+        if savings_rate >= 30:
+            insights.append({
+                'title': '🏆 Elite Saver',
+                'message': f"{savings_rate:.0f}% savings rate! You're in the top 10% of savers. You're on track for early financial independence and wealth building."
+            })
+        elif savings_rate < 0:
+            deficit_rate = abs(savings_rate)
+            insights.append({
+                'title': '🚨 Negative Savings Rate',
+                'message': f"You're spending {deficit_rate:.0f}% more than you earn. This can't continue. Make an immediate plan to cut expenses by at least ${abs(current_balance):.2f}."
+            })
+
+    # 13. Budget Allocation Recommendation (50/30/20 rule)
+    if current_income > 0:
+        needs_target = current_income * 0.5
+        wants_target = current_income * 0.3
+        savings_target = current_income * 0.2
+
+        insights.append({
+            'title': '📊 Ideal Budget Breakdown (50/30/20)',
+            'message': f"Based on ${current_income:.2f} income: Needs=${needs_target:.2f} (50%), Wants=${wants_target:.2f} (30%), Savings=${savings_target:.2f} (20%). Compare to your actual spending!"
+        })
+
+    # 14. Spending vs Previous Month Velocity
+    if has_previous_data and previous_expenses > 0:
+        velocity = ((current_expenses - previous_expenses) / previous_expenses * 100)
+        if abs(velocity) > 50:
+            insights.append({
+                'title': '⚡ Extreme Spending Velocity',
+                'message': f"Your spending {'increased' if velocity > 0 else 'decreased'} by {abs(velocity):.0f}% vs last month. This is unusual. Review what changed in your life or finances."
+            })
+
+    # 15. Cash Flow Projection
+    if current_income > 0 and current_expenses > 0:
+        monthly_surplus = current_balance
+        if monthly_surplus > 0:
+            months_to_1k = 1000 / monthly_surplus if monthly_surplus > 0 else float('inf')
+            if months_to_1k <= 3:
+                insights.append({
+                    'title': '💎 Quick Savings Goal',
+                    'message': f"At your current pace (${monthly_surplus:.2f}/month), you'll save $1,000 in {months_to_1k:.1f} months. Set this as your first milestone!"
+                })
+
+            # Project annual savings
+            annual_savings = monthly_surplus * 12
+            insights.append({
+                'title': '📅 Annual Projection',
+                'message': f"If you maintain this savings rate, you'll save ${annual_savings:.2f} this year. That's enough for emergencies, investments, or a major goal!"
+            })
+
+    # 16. Weekend vs Weekday spending (columnar engine only; see expenses.columnar)
+    history = spending_data.get('history')
+    if history:
+        pattern = history['weekly_pattern']
+        weekday_rate = pattern['weekday_per_day']
+        weekend_rate = pattern['weekend_per_day']
+        if weekend_rate > weekday_rate * 1.5 and weekend_rate > 0:
+            insights.append({
+                'title': '🗓️ Weekend Spending Spike',
+                'message': f"Over the last {pattern['days']} days you spent ${weekend_rate:.2f} per weekend day vs ${weekday_rate:.2f} per weekday. Planning weekend activities ahead can trim this."
+            })
+        elif weekday_rate > weekend_rate * 1.5 and weekday_rate > 0:
+            insights.append({
+                'title': '🏢 Weekday Spending Habit',
+                'message': f"Weekdays cost you ${weekday_rate:.2f} a day vs ${weekend_rate:.2f} on weekends. Commutes, lunches and coffee add up - look for a daily routine to trim."
+            })
+
+    # 17. Expense-to-Income Ratio
+    if current_income > 0:
+        expense_ratio = (current_expenses / current_income * 100)
+        if expense_ratio > 100:
+            insights.append({
+                'title': '📛 Unsustainable Spending',
+                'message': f"You're spending {expense_ratio:.0f}% of your income. Anything over 100% means you're going into debt. Immediate action required!"
+            })
+        elif expense_ratio > 80:
+            insights.append({
+                'title': '⚠️ High Expense Ratio',
+                'message': f"Spending {expense_ratio:.0f}% of income leaves little room for savings or emergencies. Aim for 70-80% to build financial cushion."
+            })
+        elif expense_ratio < 50:
+            insights.append({
+                'title': '🎉 Low Expense Ratio',
+                'message': f"Only {expense_ratio:.0f}% of income goes to expenses! This gives you incredible financial flexibility and wealth-building potential."
+            })
+
+    # 18. Top 3 Categories Insight
+    if len(spending_data['top_categories']) >= 3:
+        top_3_total = sum(cat['amount'] for cat in spending_data['top_categories'][:3])
+        top_3_percent = (top_3_total / current_expenses * 100) if current_expenses > 0 else 0
+        if top_3_percent > 60:
+            cat_names = ', '.join([cat['category'] for cat in spending_data['top_categories'][:3]])
+            insights.append({
+                'title': '🎯 Focus Your Optimization',
+                'message': f"Your top 3 categories ({cat_names}) are {top_3_percent:.0f}% of spending. Focus cost-cutting efforts here for maximum impact!"
+            })
+
+    # 19. Unusual expenses compared with the whole history
+    if history and history['outliers']['count']:
+        outliers = history['outliers']
+        insights.append({
+            'title': '🚩 Unusual Expenses',
+            'message': f"{outliers['count']} expense{'s' if outliers['count'] > 1 else ''} this month (${outliers['total']:.2f} total) {'were' if outliers['count'] > 1 else 'was'} well above your usual range (over ${outliers['threshold']:.2f}). Double-check they were expected."
+        })
+
+    return insights
+
+
+def insights_payload(spending_data):
+    """The ai_insights response body"""
+    return {
+        'insights': build_insights(spending_data),
+        'spending_data': spending_data,
+        'generated_at': timezone.now().isoformat(),
+        'source': 'calculation-based'
+    }
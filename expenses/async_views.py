@@ -0,0 +1,206 @@
+"""
+Async-native read endpoints, served under /api/async/.
+
+The read-heavy endpoints are mirrored here as plain Django ``async def``
+views so an ASGI server (uvicorn) runs them on its event loop instead of
+handing every request to a worker thread the way it must for sync DRF views.
+Responses are byte-for-byte those of the DRF endpoints: the same querysets,
+aggregates, paginator, representations and renderer are shared, only read
+through the async ORM (``aiterator``, ``aaggregate``, ``aget``).
+
+Each event loop (one per worker process) serves at most
+``ASYNC_READ_CONCURRENCY`` of these requests at once; the async ORM still
+takes a database connection per request, so the cap also bounds the
+connections a worker holds. Requests over the cap queue for up to
+``ASYNC_READ_QUEUE_TIMEOUT`` seconds and then get a 503.
+"""
+import asyncio
+import contextlib
+import functools
+import logging
+import traceback
+import weakref
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from accounts.authentication import CachedJWTAuthentication, auser_version, users
+
+from .aggregates import arollup_totals, summary_payload
+from .analytics import abuild_spending_data, insights_payload
+from .filters import filter_by_params
+from .models import Account, DailyRollup, Transaction
+from .pagination import TransactionCursorPagination
+from .renderers import FastJSONRenderer
+from .views import balance_payload, insights_unavailable, transaction_rows
+from . import caching as analytics_cache
+from . import columnar
+
+logger = logging.getLogger(__name__)
+
+renderer = FastJSONRenderer()
+
+# Concurrency limit of each running event loop
+_slots = weakref.WeakKeyDictionary()
+
+
+class ServerBusy(exceptions.APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many concurrent requests, retry shortly.')
+    default_code = 'server_busy'
+
+
+class AsyncJWTAuthentication(CachedJWTAuthentication):
+    """``CachedJWTAuthentication`` with the user looked up through the async ORM"""
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        version = await auser_version(user_id)
+        user = users.get(user_id, version)
+        if user is None:
+            try:
+                user = await self.user_model.objects.aget(**{jwt_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('User not found'), code='user_not_found')
+            self.check_user(user, validated_token)
+            users.put(user_id, version, user)
+            return user
+        self.check_user(user, validated_token)
+        return user
+
+
+authentication = AsyncJWTAuthentication()
+
+
+@contextlib.asynccontextmanager
+async def read_slot():
+    """Hold one of this event loop's ``ASYNC_READ_CONCURRENCY`` slots"""
+    loop = asyncio.get_running_loop()
+    semaphore = _slots.get(loop)
+    if semaphore is None:
+        semaphore = _slots[loop] = asyncio.Semaphore(settings.ASYNC_READ_CONCURRENCY)
+    try:
+        await asyncio.wait_for(semaphore.acquire(), settings.ASYNC_READ_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning('Async read queue full', extra={'limit': settings.ASYNC_READ_CONCURRENCY})
+        raise ServerBusy()
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    return HttpResponse(renderer.render(data), content_type=renderer.media_type, status=status)
+
+
+def error_response(exc):
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = json_response(data, status=exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        response['WWW-Authenticate'] = authentication.authenticate_header(None)
+    elif isinstance(exc, exceptions.MethodNotAllowed):
+        response['Allow'] = 'GET'
+    elif isinstance(exc, ServerBusy):
+        response['Retry-After'] = '1'
+    return response
+
+
+def async_read_view(view):
+    """GET-only, JWT-authenticated and concurrency-limited, like the DRF read endpoints"""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            if request.method != 'GET':
+                raise exceptions.MethodNotAllowed(request.method)
+            async with read_slot():
+                authenticated = await authentication.aauthenticate(request)
+                if authenticated is None:
+                    raise exceptions.NotAuthenticated()
+                request.user = authenticated[0]
+                return await view(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return error_response(exc)
+    return wrapper
+
+
+@async_read_view
+async def transaction_list(request):
+    """/api/transactions/"""
+    rows = transaction_rows.values(
+        filter_by_params(Transaction.objects.filter(user=request.user), request.GET)
+    )
+    paginator = TransactionCursorPagination()
+    page = await paginator.apaginate_queryset(rows, Request(request))
+    if page is None:
+        return json_response(transaction_rows.map([row async for row in rows.aiterator()]))
+    return json_response(paginator.get_paginated_response(transaction_rows.map(page)).data)
+
+
+@async_read_view
+async def transaction_summary(request):
+    """/api/transactions/summary/"""
+    rollups = filter_by_params(DailyRollup.objects.filter(user=request.user), request.GET)
+    return json_response(summary_payload(await arollup_totals(rollups)))
+
+
+@async_read_view
+async def account_balance(request, pk):
+    """/api/accounts/{id}/balance/"""
+    try:
+        account = await Account.objects.aget(user=request.user, pk=pk)
+    except Account.DoesNotExist:
+        raise exceptions.NotFound()
+    return json_response(balance_payload(account))
+
+
+@async_read_view
+async def ai_insights(request):
+    """/api/transactions/ai_insights/"""
+    error = insights_unavailable()
+    if error:
+        return json_response({'error': error}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    try:
+        entry = await analytics_cache.alookup('insights', request.user.pk, request.GET)
+        not_modified = get_conditional_response(request, etag=entry.etag, last_modified=entry.last_modified)
+        if not_modified is not None:
+            return analytics_cache.patch_response(not_modified, entry)
+        payload = await analytics_cache.aget(entry)
+        if payload is not None:
+            return analytics_cache.patch_response(json_response(payload), entry, hit=True)
+
+        transactions = filter_by_params(Transaction.objects.filter(user=request.user), request.GET)
+        if columnar.enabled():
+            spending_data = await columnar.abuild_spending_data(transactions, timezone.now().date())
+        else:
+            spending_data = await abuild_spending_data(
+                transactions,
+                filter_by_params(DailyRollup.objects.filter(user=request.user), request.GET),
+                timezone.now().date(),
+            )
+        payload = insights_payload(spending_data)
+        await analytics_cache.astore(entry, payload)
+        return analytics_cache.patch_response(json_response(payload), entry, hit=False)
+    except Exception as e:
+        logger.exception('AI insights failed', extra={'user_id': request.user.pk})
+        return json_response({
+            'error': f'Failed to generate insights: {str(e)}',
+            'details': traceback.format_exc()
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
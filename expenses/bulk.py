@@ -0,0 +1,144 @@
+"""
+Batched transaction writes behind /transactions/bulk/.
+
+A batch is validated item by item, then written with one ``bulk_create``,
+``bulk_update`` or ``DELETE`` inside a single atomic block. The per-row
+signal handlers are bypassed and the batch's ledger entries are folded, so
+each touched account balance and rollup bucket is updated exactly once.
+Nothing is written unless every item is valid.
+"""
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from . import ledger
+from .models import Account, Category, Transaction
+from .serializers import BulkTransactionSerializer
+
+
+class BulkError(Exception):
+    """Raised with the per-item errors of a rejected batch"""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def check_batch(items):
+    if not isinstance(items, list) or not items:
+        raise serializers.ValidationError({'detail': 'Expected a non-empty list of transactions.'})
+    if len(items) > settings.TRANSACTION_BULK_MAX_ITEMS:
+        raise serializers.ValidationError({
+            'detail': f'A batch may hold at most {settings.TRANSACTION_BULK_MAX_ITEMS} transactions.'
+        })
+
+
+def item_errors(errors):
+    """Keep only the failing items, tagged with their position in the batch"""
+    return [{'index': index, 'errors': error} for index, error in enumerate(errors) if error]
+
+
+def _pk(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def prefetch_context(items, context):
+    """Serializer context with every referenced account and category fetched once"""
+    def referenced(field):
+        values = (_pk(item.get(field)) for item in items if isinstance(item, dict))
+        return {value for value in values if value is not None}
+
+    return {
+        **context,
+        'accounts': Account.objects.in_bulk(referenced('account')),
+        'categories': Category.objects.in_bulk(referenced('category')),
+    }
+
+
+def create(user, items, context):
+    """Validate and insert a batch; returns the created transactions"""
+    check_batch(items)
+    serializer = BulkTransactionSerializer(data=items, many=True, context=prefetch_context(items, context))
+    if not serializer.is_valid():
+        raise BulkError(item_errors(serializer.errors))
+
+    transactions = [Transaction(user=user, **data) for data in serializer.validated_data]
+    with db_transaction.atomic():
+        Transaction.objects.bulk_create(transactions)
+        ledger.apply(ledger.entry_for(txn) for txn in transactions)
+    return transactions
+
+
+def update(user, items, context):
+    """Validate and apply a batch of partial updates, each identified by ``id``"""
+    check_batch(items)
+    context = prefetch_context(items, context)
+    ids = [_pk(item.get('id')) if isinstance(item, dict) else None for item in items]
+
+    with db_transaction.atomic():
+        stored = Transaction.objects.select_for_update().select_related('account', 'category').filter(
+            user=user, pk__in=[pk for pk in ids if pk is not None]
+        ).order_by('pk').in_bulk()
+
+        errors, pending = [], []
+        seen = set()
+        for item, pk in zip(items, ids):
+            if pk is None:
+                errors.append({'id': ['A valid transaction id is required.']})
+            elif pk in seen:
+                errors.append({'id': ['Transaction appears more than once in the batch.']})
+            elif pk not in stored:
+                errors.append({'id': ['Transaction not found.']})
+            else:
+                serializer = BulkTransactionSerializer(stored[pk], data=item, partial=True, context=context)
+                pending.append(serializer)
+                errors.append({} if serializer.is_valid() else serializer.errors)
+            seen.add(pk)
+        if any(errors):
+            raise BulkError(item_errors(errors))
+
+        batch = ledger.Batch()
+        fields = {'updated_at'}
+        now = timezone.now()
+        for serializer in pending:
+            instance = serializer.instance
+            batch.add([ledger.entry_for(instance, reverse=True)])
+            for field, value in serializer.validated_data.items():
+                setattr(instance, field, value)
+                fields.add(field)
+            instance.updated_at = now
+            batch.add([ledger.entry_for(instance)])
+
+        updated = [serializer.instance for serializer in pending]
+        Transaction.objects.bulk_update(updated, sorted(fields), batch_size=500)
+        batch.apply()
+    return updated
+
+
+def delete(user, ids):
+    """Delete a batch of transactions by id; returns how many were deleted"""
+    check_batch(ids)
+    pks = [_pk(pk) for pk in ids]
+
+    with db_transaction.atomic():
+        stored = Transaction.objects.select_for_update().filter(
+            user=user, pk__in=[pk for pk in pks if pk is not None]
+        ).only('pk', *ledger.SNAPSHOT_FIELDS).order_by('pk').in_bulk()
+
+        errors = [
+            {} if pk in stored else {'id': ['Transaction not found.']}
+            for pk in pks
+        ]
+        if any(errors):
+            raise BulkError(item_errors(errors))
+
+        with ledger.suspended():
+            Transaction.objects.filter(pk__in=stored).delete()
+        ledger.apply(ledger.entry_for(txn, reverse=True) for txn in stored.values())
+    return len(stored)
@@ -0,0 +1,115 @@
+"""
+Per-user caching of analytics responses.
+
+Entries are keyed by user, day, a digest of the query parameters and the
+user's data version. The version is the user's ``DataVersion`` row, created
+with the user, which every write to their transactions, categories or
+derived tables bumps in its own database transaction, so it is shared by all workers and by management
+commands, and stale entries are never read again and simply age out of the
+cache. Reading it costs one primary key lookup per request. The time of the
+last bump doubles as ``Last-Modified`` and the version feeds the ``ETag``,
+which lets clients revalidate with a 304 without any work on the server.
+The ``a``-prefixed helpers go through the async ORM and cache API for the
+async views.
+"""
+import hashlib
+import threading
+from collections import namedtuple
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.utils import timezone
+from django.utils.http import http_date
+
+from .models import DataVersion
+
+CacheEntry = namedtuple('CacheEntry', ['key', 'etag', 'last_modified'])
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def get_cache():
+    return caches[settings.ANALYTICS_CACHE_ALIAS]
+
+
+def data_version(user_id):
+    """``(version, changed_at)`` of the user's data"""
+    return DataVersion.objects.filter(user_id=user_id).values_list('version', 'changed_at').first() or (0, None)
+
+
+async def adata_version(user_id):
+    return await DataVersion.objects.filter(user_id=user_id).values_list('version', 'changed_at').afirst() or (0, None)
+
+
+def invalidate(user_id):
+    """Make every cached analytics response of the user stale, once the current transaction commits"""
+    DataVersion.objects.filter(user_id=user_id).update(version=F('version') + 1, changed_at=timezone.now())
+
+
+def invalidate_all():
+    """``invalidate`` for every user, e.g. after rebuilding derived tables wholesale"""
+    DataVersion.objects.update(version=F('version') + 1, changed_at=timezone.now())
+
+
+def lookup(namespace, user_id, params):
+    """Work out the cache key and validators for a request, without reading the entry"""
+    return _entry(namespace, user_id, params, data_version(user_id))
+
+
+async def alookup(namespace, user_id, params):
+    return _entry(namespace, user_id, params, await adata_version(user_id))
+
+
+def _entry(namespace, user_id, params, version):
+    number, changed_at = version
+    query = urlencode(sorted((key, value) for key, values in params.lists() for value in values))
+    digest = hashlib.md5(query.encode()).hexdigest()
+    key = f'analytics:{namespace}:{user_id}:{timezone.now().date().isoformat()}:{digest}:{number}'
+    etag = '"%s"' % hashlib.md5(key.encode()).hexdigest()
+    return CacheEntry(key=key, etag=etag, last_modified=int(changed_at.timestamp()) if changed_at else 0)
+
+
+def get(entry):
+    return _count(get_cache().get(entry.key))
+
+
+async def aget(entry):
+    return _count(await get_cache().aget(entry.key))
+
+
+def _count(payload):
+    with _stats_lock:
+        _stats['hits' if payload is not None else 'misses'] += 1
+    return payload
+
+
+def store(entry, payload):
+    get_cache().set(entry.key, payload, timeout=settings.ANALYTICS_CACHE_TIMEOUT)
+
+
+async def astore(entry, payload):
+    await get_cache().aset(entry.key, payload, timeout=settings.ANALYTICS_CACHE_TIMEOUT)
+
+
+def patch_response(response, entry, hit=None):
+    response['ETag'] = entry.etag
+    response['Last-Modified'] = http_date(entry.last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    if hit is not None:
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+    return response
+
+
+def stats():
+    """Hit/miss counters of this process since it started"""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / lookups if lookups else 0.0,
+    }
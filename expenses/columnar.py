@@ -0,0 +1,254 @@
+"""
+Columnar insights engine.
+
+Instead of aggregating each window in SQL, a user's whole history is read
+once as compact NumPy columns (day, amount in cents, type, category) and
+every ai_insights metric is computed from them with vectorized operations.
+That covers the 30/60/7-day windows the SQL engine reports, fed through the
+same ``_spending_data`` assembly so the insight rules see identical numbers,
+plus metrics over the full history that would each cost another query:
+rolling burn rates, month-over-month totals, the weekday/weekend split and
+expense percentiles and outliers.
+
+NumPy is optional: without it ``enabled()`` is false and ai_insights keeps
+using ``analytics.build_spending_data``.
+"""
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import BigIntegerField, CharField, F
+from django.db.models.functions import Cast, Round
+
+from .aggregates import TYPE_KEYS
+from .analytics import LARGE_EXPENSE_THRESHOLD, _spending_data, insight_windows
+from .models import Category
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+TYPE_CODES = {key: code for code, key in enumerate(TYPE_KEYS)}
+INCOME, EXPENSE, TRANSFER = (TYPE_CODES[key] for key in ('income', 'expense', 'transfer'))
+
+# Days are stored as days since 1970-01-01, which was a Thursday
+EPOCH = date(1970, 1, 1).toordinal()
+WEEKDAY_OFFSET = 3
+
+# Span of the weekday/weekend comparison, months of month-over-month history,
+# and the expenses needed before outliers are flagged
+PATTERN_DAYS = 90
+HISTORY_MONTHS = 12
+OUTLIER_MIN_EXPENSES = 20
+
+Columns = namedtuple('Columns', ['days', 'cents', 'types', 'categories'])
+
+
+def enabled():
+    return np is not None and settings.INSIGHTS_ENGINE == 'columnar'
+
+
+def to_day(value):
+    return value.toordinal() - EPOCH
+
+
+def from_rows(rows):
+    """``Columns`` from ``(date, cents, transaction_type, category_id)`` rows; dates may be ISO strings"""
+    if not rows:
+        empty = np.zeros(0, np.int64)
+        return Columns(empty.astype(np.int32), empty, empty.astype(np.int8), empty)
+    dates, cents, types, categories = zip(*rows)
+    return Columns(
+        days=np.array(dates, dtype='datetime64[D]').astype(np.int32),
+        cents=np.array(cents, np.int64),
+        types=np.fromiter((TYPE_CODES[key] for key in types), np.int8, len(types)),
+        categories=np.fromiter((-1 if pk is None else pk for pk in categories), np.int64, len(categories)),
+    )
+
+
+def history_query(transactions):
+    # Dates as ISO text and amounts as integer cents: neither needs a per-row
+    # converter, which would otherwise cost more than all the metrics together
+    return transactions.order_by().values_list(
+        Cast('date', CharField()),
+        Cast(Round(F('amount') * 100), BigIntegerField()),
+        'transaction_type',
+        'category',
+    )
+
+
+def load(transactions):
+    """The columns of ``transactions`` in one query"""
+    return from_rows(list(history_query(transactions)))
+
+
+async def aload(transactions):
+    # values_list() can't go through aiterator() on Django 4.2: the query
+    # would run on the event loop
+    return await sync_to_async(load)(transactions)
+
+
+def build_spending_data(transactions, today):
+    """``analytics.build_spending_data`` plus ``history``, in two queries"""
+    columns = load(transactions)
+    totals, shape, top = window_metrics(columns, today)
+    return _assemble(totals, shape, top, category_names(top), history_metrics(columns, today))
+
+
+async def abuild_spending_data(transactions, today):
+    columns = await aload(transactions)
+    totals, shape, top = window_metrics(columns, today)
+    names = await sync_to_async(category_names)(top)
+    return _assemble(totals, shape, top, names, history_metrics(columns, today))
+
+
+def category_names(top):
+    ids = [pk for pk, _ in top if pk is not None]
+    return dict(Category.objects.filter(pk__in=ids).values_list('pk', 'name'))
+
+
+def _assemble(totals, shape, top, names, history):
+    categories = [
+        {'category__name': names.get(pk) if pk is not None else None, 'category_total': total}
+        for pk, total in top
+    ]
+    data = _spending_data(totals, shape, categories)
+    data['history'] = history
+    return data
+
+
+def _decimal(cents):
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def window_metrics(columns, today, limit=5):
+    """The window totals, expense shape and top categories ``analytics`` computes in SQL"""
+    days, cents, types, categories = columns
+    windows = insight_windows(today)
+
+    def in_window(window):
+        start, end = windows[window]
+        mask = days >= to_day(start)
+        if end is not None:
+            mask &= days < to_day(end)
+        return mask
+
+    totals = {}
+    for window in windows:
+        mask = in_window(window)
+        for transaction_type, code in TYPE_CODES.items():
+            selected = mask & (types == code)
+            totals[f'{window}_{transaction_type}_total'] = _decimal(cents[selected].sum())
+            totals[f'{window}_{transaction_type}_count'] = int(selected.sum())
+
+    expenses = in_window('current') & (types == EXPENSE)
+    spent_categories = categories[expenses]
+    totals['current_categories'] = int(np.unique(spent_categories[spent_categories >= 0]).size)
+    totals['current_uncategorized'] = int((spent_categories < 0).sum())
+
+    amounts = cents[expenses]
+    large = amounts >= LARGE_EXPENSE_THRESHOLD * 100
+    shape = {
+        'largest': _decimal(amounts.max()) if amounts.size else Decimal('0'),
+        'large': _decimal(amounts[large].sum()),
+        'small': _decimal(amounts[~large].sum()),
+    }
+
+    keys, positions = np.unique(spent_categories, return_inverse=True)
+    sums = np.zeros(keys.size, np.int64)
+    np.add.at(sums, positions, amounts)
+    order = np.argsort(-sums, kind='stable')[:limit]
+    top = [(None if keys[i] < 0 else int(keys[i]), _decimal(sums[i])) for i in order]
+    return totals, shape, top
+
+
+def history_metrics(columns, today):
+    """Burn rates, monthly totals, weekday split and outliers over the whole history"""
+    days, cents, types, _ = columns
+    today_day = to_day(today)
+    past = days <= today_day
+    spending = past & ((types == EXPENSE) | (types == TRANSFER))
+
+    # Daily spend from the first spending day through today, and its running
+    # sum, so any trailing window is one subtraction
+    first = int(days[spending].min()) if spending.any() else today_day
+    daily = np.bincount(
+        days[spending] - first, weights=cents[spending], minlength=today_day - first + 1
+    )
+    running = np.concatenate(([0.0], np.cumsum(daily)))
+
+    def trailing(span):
+        return float(running[-1] - running[max(running.size - 1 - span, 0)]) / 100
+
+    rolling_30 = running[30:] - running[:-30]
+    burn_rates = {
+        'last_7_days': trailing(7),
+        'last_30_days': trailing(30),
+        'last_90_days': trailing(90),
+        'typical_30_days': float(np.median(rolling_30)) / 100 if rolling_30.size else trailing(30),
+    }
+
+    # Calendar months, the current one last
+    months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    this_month = int(np.datetime64(today, 'M').astype(np.int64))
+    first_month = this_month - HISTORY_MONTHS
+    in_range = past & (months >= first_month)
+    income = np.bincount(
+        months[in_range & (types == INCOME)] - first_month,
+        weights=cents[in_range & (types == INCOME)], minlength=HISTORY_MONTHS + 1,
+    ) / 100
+    spent = np.bincount(
+        months[in_range & spending] - first_month,
+        weights=cents[in_range & spending], minlength=HISTORY_MONTHS + 1,
+    ) / 100
+    monthly = [
+        {
+            'month': str(np.datetime64(first_month + offset, 'M')),
+            'income': float(income[offset]),
+            'expenses': float(spent[offset]),
+            'expense_change': float(spent[offset] - spent[offset - 1]),
+        }
+        for offset in range(1, HISTORY_MONTHS + 1)
+    ]
+
+    # Spend per weekday and per weekend day over the last PATTERN_DAYS
+    recent = spending & (days > today_day - PATTERN_DAYS)
+    weekend = (days[recent] + WEEKDAY_OFFSET) % 7 >= 5
+    calendar = np.arange(today_day - PATTERN_DAYS + 1, today_day + 1)
+    weekend_days = int(((calendar + WEEKDAY_OFFSET) % 7 >= 5).sum())
+    weekend_total = float(cents[recent][weekend].sum()) / 100
+    weekday_total = float(cents[recent][~weekend].sum()) / 100
+    weekly_pattern = {
+        'days': PATTERN_DAYS,
+        'weekday_per_day': weekday_total / (PATTERN_DAYS - weekend_days),
+        'weekend_per_day': weekend_total / weekend_days,
+        'weekend_share': weekend_total / (weekend_total + weekday_total) if weekend_total + weekday_total else 0.0,
+    }
+
+    # Expense amount distribution, and current-window expenses far above it
+    expenses = past & (types == EXPENSE)
+    amounts = cents[expenses]
+    if amounts.size:
+        p25, p50, p75, p90, p99 = np.percentile(amounts, [25, 50, 75, 90, 99]) / 100
+        percentiles = {'p50': float(p50), 'p90': float(p90), 'p99': float(p99)}
+    else:
+        percentiles = {'p50': 0.0, 'p90': 0.0, 'p99': 0.0}
+    outliers = {'threshold': None, 'count': 0, 'total': 0.0}
+    if amounts.size >= OUTLIER_MIN_EXPENSES:
+        threshold = float(p75 + 1.5 * (p75 - p25))
+        current_start, _ = insight_windows(today)['current']
+        unusual = cents[expenses & (days >= to_day(current_start))] / 100
+        unusual = unusual[unusual > threshold]
+        outliers = {'threshold': threshold, 'count': int(unusual.size), 'total': float(unusual.sum())}
+
+    return {
+        'first_date': str(np.datetime64(first, 'D')) if spending.any() else None,
+        'burn_rates': burn_rates,
+        'monthly': monthly,
+        'weekly_pattern': weekly_pattern,
+        'expense_percentiles': percentiles,
+        'outliers': outliers,
+    }
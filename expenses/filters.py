@@ -0,0 +1,34 @@
+"""
+Query-string filters shared by the transaction views.
+
+Transactions and their daily rollups expose the same filterable columns, so
+the same ``?category=&transaction_type=&account=&start_date=&end_date=``
+parameters narrow both.
+"""
+
+
+def filter_by_params(queryset, params):
+    # Filter by category if provided
+    category_id = params.get('category', None)
+    if category_id:
+        queryset = queryset.filter(category_id=category_id)
+
+    # Filter by transaction type if provided
+    transaction_type = params.get('transaction_type', None)
+    if transaction_type:
+        queryset = queryset.filter(transaction_type=transaction_type)
+
+    # Filter by account if provided
+    account_id = params.get('account', None)
+    if account_id:
+        queryset = queryset.filter(account_id=account_id)
+
+    # Filter by date range if provided
+    start_date = params.get('start_date', None)
+    end_date = params.get('end_date', None)
+    if start_date:
+        queryset = queryset.filter(date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(date__lte=end_date)
+
+    return queryset
@@ -0,0 +1,197 @@
+"""
+Streaming readers for bank statement files.
+
+Each reader takes a text stream and yields ``StatementRow`` tuples one at a
+time, so a file of any size is read in constant memory. A row the reader
+can't parse is yielded as an ``ImportRowError`` carrying its line or record
+number, so the caller decides whether to skip it or abort.
+"""
+import csv
+import re
+from collections import namedtuple
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from .models import TRANSACTION_TYPES
+
+StatementRow = namedtuple('StatementRow', [
+    'line', 'date', 'amount', 'transaction_type', 'description', 'notes', 'category', 'account',
+])
+
+# Transaction fields a CSV column can be mapped to
+CSV_FIELDS = ('date', 'amount', 'transaction_type', 'description', 'notes', 'category', 'account')
+
+DEFAULT_CSV_COLUMNS = {field: field for field in CSV_FIELDS}
+
+TYPE_KEYS = {key for key, _ in TRANSACTION_TYPES}
+
+
+class ImportRowError(ValueError):
+    def __init__(self, line, message):
+        super().__init__(f'line {line}: {message}')
+        self.line = line
+
+
+def parse_columns(spec):
+    """Parse ``field=Header,field=Header`` into a column map over the defaults"""
+    columns = dict(DEFAULT_CSV_COLUMNS)
+    for pair in filter(None, (part.strip() for part in (spec or '').split(','))):
+        field, sep, header = pair.partition('=')
+        field = field.strip()
+        if not sep or field not in CSV_FIELDS:
+            raise ValueError(f'Invalid column mapping "{pair}"; expected one of {", ".join(CSV_FIELDS)}=<header>')
+        columns[field] = header.strip()
+    return columns
+
+
+def parse_amount(value):
+    """Signed Decimal from a statement amount such as ``-1,234.50``, ``$12`` or ``(12.00)``"""
+    text = (value or '').strip()
+    negative = text.startswith('(') and text.endswith(')')
+    text = re.sub(r'[^\d.+-]', '', text)
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f'invalid amount "{value}"')
+    return -amount if negative else amount
+
+
+def parse_date(value, date_format):
+    try:
+        return datetime.strptime(value.strip(), date_format).date()
+    except (AttributeError, ValueError):
+        raise ValueError(f'invalid date "{value}" (expected {date_format})')
+
+
+def make_row(line, when, amount, transaction_type='', description='', notes='', category='', account=''):
+    """Normalize a parsed row: positive amount, type from the sign when not given"""
+    transaction_type = (transaction_type or '').strip().lower()
+    if transaction_type and transaction_type not in TYPE_KEYS:
+        raise ImportRowError(line, f'unknown transaction type "{transaction_type}"')
+    if not transaction_type:
+        transaction_type = 'expense' if amount < 0 else 'income'
+    amount = abs(amount).quantize(Decimal('0.01'))
+    if not amount:
+        raise ImportRowError(line, 'amount must be greater than zero')
+    description = (description or '').strip()[:255] or '(no description)'
+    return StatementRow(
+        line=line, date=when, amount=amount, transaction_type=transaction_type,
+        description=description, notes=(notes or '').strip(),
+        category=(category or '').strip()[:100], account=(account or '').strip()[:100],
+    )
+
+
+def read_csv(stream, columns=None, date_format='%Y-%m-%d', delimiter=','):
+    columns = columns or DEFAULT_CSV_COLUMNS
+    reader = csv.DictReader(stream, delimiter=delimiter)
+    # Headers are matched case-insensitively; unmapped optional fields stay blank
+    headers = {name.strip().lower(): name for name in reader.fieldnames or []}
+    columns = {field: headers.get(header.lower()) for field, header in columns.items()}
+    for required in ('date', 'amount'):
+        if columns[required] is None:
+            raise ValueError(f'CSV has no column for {required}; map one with --columns')
+
+    for record in reader:
+        line = reader.line_num
+        values = {field: record.get(header) if header else '' for field, header in columns.items()}
+        try:
+            when = parse_date(values.pop('date'), date_format)
+            amount = parse_amount(values.pop('amount'))
+            yield make_row(line, when, amount, **values)
+        except ImportRowError as e:
+            yield e
+        except ValueError as e:
+            yield ImportRowError(line, e)
+
+
+_OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+def _ofx_tokens(stream, chunk_size=65536):
+    """Yield ``(closing, tag, text)`` for every OFX tag, reading in chunks"""
+    buffer = ''
+    while True:
+        chunk = stream.read(chunk_size)
+        buffer += chunk
+        # Hold back a trailing, possibly incomplete tag until more is read
+        cut = len(buffer) if not chunk else buffer.rfind('<')
+        for match in _OFX_TAG.finditer(buffer, 0, max(cut, 0)):
+            yield match.group(1) == '/', match.group(2).upper(), match.group(3).strip()
+        if not chunk:
+            return
+        buffer = buffer[max(cut, 0):]
+
+
+def read_ofx(stream):
+    """Read ``<STMTTRN>`` records from OFX 1.x (SGML) or 2.x (XML) statements"""
+    record, number = None, 0
+    for closing, tag, text in _ofx_tokens(stream):
+        if tag == 'STMTTRN':
+            if not closing:
+                record = {}
+                continue
+            number += 1
+            try:
+                posted = record['DTPOSTED']
+                when = date(int(posted[:4]), int(posted[4:6]), int(posted[6:8]))
+                amount = parse_amount(record['TRNAMT'])
+                yield make_row(number, when, amount, description=record.get('NAME', ''), notes=record.get('MEMO', ''))
+            except ImportRowError as e:
+                yield e
+            except (KeyError, ValueError) as e:
+                yield ImportRowError(number, f'invalid OFX transaction ({e})')
+            record = None
+        elif record is not None and not closing:
+            record[tag] = text
+
+
+def read_qif(stream, date_format='%m/%d/%Y'):
+    """Read records of a QIF bank/cash/credit card export"""
+    record, line = {}, 0
+    for line, raw in enumerate(stream, start=1):
+        text = raw.rstrip('\r\n')
+        if not text or text.startswith('!'):
+            continue
+        code, value = text[0], text[1:].strip()
+        if code != '^':
+            record.setdefault(code, value)
+            continue
+        if record:
+            yield _qif_row(line, record, date_format)
+        record = {}
+    if record:
+        yield _qif_row(line, record, date_format)
+
+
+def _qif_row(line, record, date_format):
+    try:
+        return _parse_qif_record(line, record, date_format)
+    except ImportRowError as e:
+        return e
+
+
+def _parse_qif_record(line, record, date_format):
+    try:
+        # Quicken writes the year after an apostrophe past 1999: 1/31'25
+        raw_date = record['D'].replace("'", '/').replace(' ', '')
+        try:
+            when = parse_date(raw_date, date_format)
+        except ValueError:
+            when = parse_date(raw_date, date_format.replace('%Y', '%y'))
+        amount = parse_amount(record.get('T') or record['U'])
+    except (KeyError, ValueError) as e:
+        raise ImportRowError(line, f'invalid QIF record ({e})')
+    category = record.get('L', '')
+    if category.startswith('['):
+        # [Account] is a transfer to another account, not a category
+        category = ''
+    return make_row(line, when, amount, description=record.get('P', ''), notes=record.get('M', ''),
+                    category=category.split(':')[0])
+
+
+READERS = {
+    'csv': read_csv,
+    'ofx': read_ofx,
+    'qfx': read_ofx,
+    'qif': read_qif,
+}
@@ -0,0 +1,536 @@
+"""
+Incremental bookkeeping for the Transaction write path.
+
+Every transaction write is turned into signed ledger entries and only the
+difference is applied to what is derived from transactions:
+
+* the stored account balance, and the transaction count and per-type totals
+  of the account and category, with ``F()`` updates
+* the ``DailyRollup`` bucket of (user, account, category, type, date)
+* the running balance of the transaction and of the rows after it in the
+  same account
+
+so a write costs O(1) no matter how long the account's history is (backdated
+writes also shift the running balances of the rows after them). The same
+transaction bumps the user's data version, which invalidates their cached
+analytics in every worker once it commits.
+"""
+import logging
+from collections import Counter, defaultdict, namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db import transaction as db_transaction
+from django.db.models import Case, Count, DecimalField, F, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from . import caching
+from .models import Account, Category, DailyRollup, Transaction
+
+logger = logging.getLogger(__name__)
+
+# Same sign convention as Account.calculate_balance: transfers are money
+# leaving the account.
+BALANCE_SIGNS = {
+    'income': 1,
+    'expense': -1,
+    'transfer': -1,
+}
+
+# Stored per-type total each transaction type adds to (see LedgerCounters)
+TYPE_TOTALS = {
+    'income': 'total_income',
+    'expense': 'total_expense',
+    'transfer': 'total_transfer',
+}
+
+COUNTER_FIELDS = ('transaction_count',) + tuple(TYPE_TOTALS.values())
+
+BUCKET_FIELDS = ('user_id', 'account_id', 'category_id', 'transaction_type', 'date')
+
+# ``position`` is the (date, created_at, id) key of the transaction in its
+# account's statement order
+Entry = namedtuple('Entry', BUCKET_FIELDS + ('amount', 'count', 'position'), defaults=(None,))
+
+# Columns of a stored transaction needed to reverse its entry
+SNAPSHOT_FIELDS = BUCKET_FIELDS + ('amount', 'created_at')
+
+STATEMENT_ORDER = ('date', 'created_at', 'id')
+
+# Accounts with more entries than this in one batch get their running
+# balances recomputed in one forward walk instead of per-entry updates.
+RUNNING_WALK_THRESHOLD = 2
+
+
+def signed_amount(transaction_type, amount):
+    """Return the effect an amount of the given type has on a balance"""
+    return BALANCE_SIGNS.get(transaction_type, 0) * Decimal(amount)
+
+
+def signed_amount_expression():
+    """SQL counterpart of ``signed_amount`` for use in annotations and aggregates"""
+    output = DecimalField(max_digits=14, decimal_places=2)
+    return Case(
+        *[When(transaction_type=transaction_type, then=F('amount') * sign)
+          for transaction_type, sign in BALANCE_SIGNS.items()],
+        default=Value(0),
+        output_field=output,
+    )
+
+
+def balances_for(account_ids):
+    """Recomputed ``{account_id: balance}`` for the given accounts in one grouped query"""
+    rows = Transaction.objects.filter(account_id__in=account_ids).order_by().values('account_id').annotate(
+        signed_total=Coalesce(Sum(signed_amount_expression()), Value(Decimal('0')),
+                              output_field=DecimalField(max_digits=14, decimal_places=2)),
+    )
+    balances = dict.fromkeys(account_ids, Decimal('0.00'))
+    for row in rows:
+        balances[row['account_id']] = Decimal(row['signed_total']).quantize(Decimal('0.01'))
+    return balances
+
+
+def entry_for(transaction, reverse=False):
+    """Build the ledger entry for a transaction, or the entry undoing it"""
+    amount = Decimal(transaction.amount)
+    when = Transaction._meta.get_field('date').to_python(transaction.date)
+    position = None
+    if transaction.pk is not None and transaction.created_at is not None:
+        position = (when, transaction.created_at, transaction.pk)
+    return Entry(
+        user_id=transaction.user_id,
+        account_id=transaction.account_id,
+        category_id=transaction.category_id,
+        transaction_type=transaction.transaction_type,
+        date=when,
+        amount=-amount if reverse else amount,
+        count=-1 if reverse else 1,
+        position=position,
+    )
+
+
+class Batch:
+    """Accumulates ledger entries and applies them in one pass.
+
+    Entries are folded as they are added, so memory is bounded by the number
+    of accounts and rollup buckets touched, not by the number of entries.
+    """
+
+    def __init__(self):
+        self.balances = defaultdict(Decimal)
+        # Per model and row: deltas of the LedgerCounters fields
+        self.counters = {Account: defaultdict(Counter), Category: defaultdict(Counter)}
+        self.rollups = defaultdict(lambda: [Decimal('0'), 0])
+        self.user_ids = set()
+        # Per account: the (position, signed amount, inserted) changes to
+        # running balances, or only the earliest position once it is walked
+        self.running = defaultdict(list)
+        self.earliest = {}
+        self.walk = set()
+
+    def add(self, entries):
+        for entry in entries:
+            signed = signed_amount(entry.transaction_type, entry.amount)
+            self.balances[entry.account_id] += signed
+            self.count(self.counters[Account][entry.account_id], entry)
+            if entry.category_id is not None:
+                self.count(self.counters[Category][entry.category_id], entry)
+            delta = self.rollups[entry[:len(BUCKET_FIELDS)]]
+            delta[0] += entry.amount
+            delta[1] += entry.count
+            self.user_ids.add(entry.user_id)
+            if entry.position is not None:
+                self.add_running(entry.account_id, entry.position, signed, entry.count > 0)
+        return self
+
+    def count(self, counters, entry):
+        counters['transaction_count'] += entry.count
+        total = TYPE_TOTALS.get(entry.transaction_type)
+        if total:
+            counters[total] += entry.amount
+
+    def add_running(self, account_id, position, signed, inserted):
+        earliest = self.earliest.get(account_id)
+        self.earliest[account_id] = position if earliest is None else min(earliest, position)
+        if account_id in self.walk:
+            return
+        changes = self.running[account_id]
+        changes.append((position, signed, inserted))
+        if len(changes) > RUNNING_WALK_THRESHOLD:
+            del self.running[account_id]
+            self.walk.add(account_id)
+
+    def apply(self):
+        """Write the folded deltas: one update per touched account and category.
+
+        Each row gets a single ``UPDATE ... SET balance = balance + delta, ...``
+        for its balance and counters, which is atomic in the database and
+        therefore safe under concurrent writers. Rows are updated in key order,
+        accounts before categories, so two writers touching the same rows
+        cannot deadlock.
+        """
+        with db_transaction.atomic(savepoint=False):
+            locked = set()
+            for account_id in sorted(self.balances):
+                changes = self.counter_changes(Account, account_id)
+                delta = self.balances[account_id]
+                if delta:
+                    changes['balance'] = F('balance') + delta
+                if changes:
+                    Account.objects.filter(pk=account_id).update(**changes)
+                    locked.add(account_id)
+            for category_id in sorted(self.counters[Category]):
+                changes = self.counter_changes(Category, category_id)
+                if changes:
+                    Category.objects.filter(pk=category_id).update(**changes)
+            apply_rollups(self.rollups)
+            # Running balance maintenance is serialized per account by the
+            # account row lock. The updates above hold it, except where the
+            # deltas folded to zero (e.g. a date-only move) and nothing was
+            # written; lock those explicitly.
+            unlocked = sorted((set(self.running) | self.walk) - locked)
+            if unlocked:
+                list(Account.objects.select_for_update().filter(pk__in=unlocked).order_by('pk').values_list('pk', flat=True))
+            for account_id in sorted(self.running):
+                apply_running_balances(account_id, self.running[account_id])
+            for account_id in sorted(self.walk):
+                rebuild_running_balances(account_id, after=self.earliest[account_id])
+            for user_id in sorted(self.user_ids):
+                caching.invalidate(user_id)
+
+        if getattr(settings, 'VERIFY_INCREMENTAL_BALANCES', False):
+            for account_id in self.balances:
+                verify_balance(account_id)
+
+    def counter_changes(self, model, pk):
+        return {
+            field: F(field) + delta
+            for field, delta in self.counters[model][pk].items() if delta
+        }
+
+
+def apply(entries):
+    """Apply ledger entries to the stored balances and rollups"""
+    Batch().add(entries).apply()
+
+
+_suspended = ContextVar('ledger_suspended', default=False)
+
+
+@contextmanager
+def suspended():
+    """Silence the per-row signal handlers while a caller applies a ``Batch`` itself"""
+    token = _suspended.set(True)
+    try:
+        yield
+    finally:
+        _suspended.reset(token)
+
+
+def is_suspended():
+    return _suspended.get()
+
+
+# Above this many buckets, rollups are read and written in bulk instead of
+# with one UPDATE per bucket.
+BULK_ROLLUP_THRESHOLD = 20
+
+
+def apply_rollups(deltas):
+    deltas = {bucket: delta for bucket, delta in deltas.items() if delta[0] or delta[1]}
+    if len(deltas) > BULK_ROLLUP_THRESHOLD:
+        deltas = _apply_rollups_in_bulk(deltas)
+    for bucket in sorted(deltas, key=_bucket_sort_key):
+        amount, count = deltas[bucket]
+        lookup = dict(zip(BUCKET_FIELDS, bucket))
+        updated = DailyRollup.objects.filter(**lookup).update(
+            total=F('total') + amount,
+            transaction_count=F('transaction_count') + count,
+        )
+        # A missing bucket is only created for new rows. Reversals against a
+        # missing bucket come from cascades that already deleted it.
+        if updated or count <= 0:
+            continue
+        try:
+            with db_transaction.atomic():
+                DailyRollup.objects.create(total=amount, transaction_count=count, **lookup)
+        except IntegrityError:
+            # Lost the race to create the bucket; add to the winner's row instead
+            DailyRollup.objects.filter(**lookup).update(
+                total=F('total') + amount,
+                transaction_count=F('transaction_count') + count,
+            )
+
+
+def merge_category_rollups(category, batch_size=500):
+    """Fold a category's rollup buckets into the uncategorized ones, before it is deleted.
+
+    Deleting the category sets the category of its buckets to NULL; a bucket
+    whose day already has an uncategorized bucket is added to that one and
+    removed instead, so every day keeps a single uncategorized bucket.
+    """
+    buckets = list(DailyRollup.objects.select_for_update().filter(category=category).order_by('pk'))
+    if buckets:
+        dates = [bucket.date for bucket in buckets]
+        uncategorized = {
+            (rollup.account_id, rollup.transaction_type, rollup.date): rollup
+            for rollup in DailyRollup.objects.select_for_update().filter(
+                user_id=category.user_id,
+                category__isnull=True,
+                account_id__in={bucket.account_id for bucket in buckets},
+                date__range=(min(dates), max(dates)),
+            ).order_by('pk')
+        }
+        merged, absorbed = [], []
+        for bucket in buckets:
+            target = uncategorized.get((bucket.account_id, bucket.transaction_type, bucket.date))
+            if target is None:
+                continue
+            target.total += bucket.total
+            target.transaction_count += bucket.transaction_count
+            merged.append(target)
+            absorbed.append(bucket.pk)
+        DailyRollup.objects.bulk_update(merged, ['total', 'transaction_count'], batch_size=batch_size)
+        for start in range(0, len(absorbed), batch_size):
+            DailyRollup.objects.filter(pk__in=absorbed[start:start + batch_size]).delete()
+    # Category names and breakdowns are part of the cached analytics
+    caching.invalidate(category.user_id)
+
+
+def after_position(position):
+    """Rows strictly after ``position`` in statement order"""
+    row_date, created_at, pk = position
+    return (
+        Q(date__gt=row_date)
+        | Q(date=row_date, created_at__gt=created_at)
+        | Q(date=row_date, created_at=created_at, pk__gt=pk)
+    )
+
+
+def before_position(position):
+    """Rows strictly before ``position`` in statement order"""
+    row_date, created_at, pk = position
+    return (
+        Q(date__lt=row_date)
+        | Q(date=row_date, created_at__lt=created_at)
+        | Q(date=row_date, created_at=created_at, pk__lt=pk)
+    )
+
+
+def apply_running_balances(account_id, changes):
+    """Shift the running balances after each change and place inserted rows.
+
+    Reversals go first, so a moved row is placed against a history that no
+    longer contains its old position.
+    """
+    rows = Transaction.objects.filter(account_id=account_id)
+    for position, signed, inserted in sorted(changes, key=lambda change: change[2]):
+        pk = position[2]
+        if signed:
+            rows.filter(after_position(position)).exclude(pk=pk).update(
+                running_balance=F('running_balance') + signed,
+            )
+        if inserted:
+            previous = rows.filter(before_position(position)).exclude(pk=pk).order_by(
+                *(f'-{field}' for field in STATEMENT_ORDER)
+            ).values('running_balance')[:1]
+            rows.filter(pk=pk).update(
+                running_balance=Coalesce(Subquery(previous), Value(Decimal('0'))) + signed,
+            )
+
+
+def rebuild_running_balances(account_id, after=None, batch_size=1000):
+    """Recompute the running balances of an account in one forward walk.
+
+    With ``after`` only rows at or after that position are walked, starting
+    from the running balance of the row before it. Returns the number of rows
+    rewritten.
+    """
+    rows = Transaction.objects.filter(account_id=account_id)
+    running = Decimal('0')
+    if after is not None:
+        previous = rows.filter(before_position(after)).order_by(
+            *(f'-{field}' for field in STATEMENT_ORDER)
+        ).values_list('running_balance', flat=True).first()
+        running = previous or Decimal('0')
+        rows = rows.exclude(before_position(after))
+
+    written, changed = 0, []
+    walk = rows.order_by(*STATEMENT_ORDER).values_list('pk', 'transaction_type', 'amount', 'running_balance')
+    for pk, transaction_type, amount, stored in walk.iterator(chunk_size=batch_size):
+        running += signed_amount(transaction_type, amount)
+        if stored != running:
+            changed.append(Transaction(pk=pk, running_balance=running))
+        if len(changed) >= batch_size:
+            Transaction.objects.bulk_update(changed, ['running_balance'])
+            written += len(changed)
+            changed = []
+    Transaction.objects.bulk_update(changed, ['running_balance'])
+    return written + len(changed)
+
+
+def verify_running_balances(account_id):
+    """Return ``(rows with a wrong running balance, closing running balance)``"""
+    running, wrong = Decimal('0'), 0
+    walk = Transaction.objects.filter(account_id=account_id).order_by(*STATEMENT_ORDER).values_list(
+        'transaction_type', 'amount', 'running_balance',
+    )
+    for transaction_type, amount, stored in walk.iterator(chunk_size=1000):
+        running += signed_amount(transaction_type, amount)
+        if stored != running:
+            wrong += 1
+    return wrong, running
+
+
+def _apply_rollups_in_bulk(deltas):
+    """Update existing buckets with one locking read and ``bulk_update``.
+
+    Missing buckets are inserted with ``bulk_create``; if a concurrent writer
+    created one first, they are handed back to the per-bucket path.
+    """
+    dates = [bucket[-1] for bucket in deltas]
+    existing = DailyRollup.objects.select_for_update().filter(
+        user_id__in={bucket[0] for bucket in deltas},
+        account_id__in={bucket[1] for bucket in deltas},
+        date__range=(min(dates), max(dates)),
+    ).order_by('pk')
+
+    changed = []
+    for rollup in existing:
+        delta = deltas.get(tuple(getattr(rollup, field) for field in BUCKET_FIELDS))
+        if delta is None:
+            continue
+        rollup.total += delta[0]
+        rollup.transaction_count += delta[1]
+        delta[:] = [Decimal('0'), 0]
+        changed.append(rollup)
+    DailyRollup.objects.bulk_update(changed, ['total', 'transaction_count'], batch_size=500)
+
+    missing = {bucket: delta for bucket, delta in deltas.items() if delta[1] > 0}
+    try:
+        with db_transaction.atomic():
+            DailyRollup.objects.bulk_create([
+                DailyRollup(total=amount, transaction_count=count, **dict(zip(BUCKET_FIELDS, bucket)))
+                for bucket, (amount, count) in missing.items()
+            ], batch_size=500)
+    except IntegrityError:
+        return missing
+    return {}
+
+
+def _bucket_sort_key(bucket):
+    return tuple((value is None, value) for value in bucket)
+
+
+def rebuild_rollups(user=None, batch_size=1000):
+    """Recreate the rollup buckets of one user, or everyone, from scratch.
+
+    Buckets are grouped in the database, so memory is bounded by the batch
+    size. Returns the number of buckets written.
+    """
+    transactions = Transaction.objects.all()
+    rollups = DailyRollup.objects.all()
+    if user is not None:
+        transactions = transactions.filter(user=user)
+        rollups = rollups.filter(user=user)
+
+    rows = transactions.order_by().values(*BUCKET_FIELDS).annotate(
+        bucket_total=Sum('amount'),
+        bucket_count=Count('pk'),
+    )
+    written = 0
+    with db_transaction.atomic():
+        if user is not None:
+            caching.invalidate(user.pk)
+        else:
+            caching.invalidate_all()
+        rollups.delete()
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(DailyRollup(
+                total=row.pop('bucket_total'),
+                transaction_count=row.pop('bucket_count'),
+                **row,
+            ))
+            if len(batch) >= batch_size:
+                DailyRollup.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        DailyRollup.objects.bulk_create(batch)
+        written += len(batch)
+    return written
+
+
+def rebuild_counters(user=None, repair=True, batch_size=1000):
+    """Recount the stored counters of accounts and categories from their transactions.
+
+    Counts come from one grouped query per model, so memory is bounded by
+    the number of accounts and categories. Returns ``{model: drifted rows}``;
+    with ``repair`` the drifted rows are rewritten, under row locks so ledger
+    writes wait for them.
+    """
+    drifted = {}
+    for model, column in ((Account, 'account_id'), (Category, 'category_id')):
+        transactions = Transaction.objects.filter(**{f'{column}__isnull': False})
+        owners = model.objects.order_by('pk')
+        if user is not None:
+            transactions = transactions.filter(user=user)
+            owners = owners.filter(user=user)
+
+        with db_transaction.atomic():
+            if repair:
+                owners = owners.select_for_update()
+            expected = {
+                row.pop(column): row
+                for row in transactions.order_by().values(column).annotate(**_counter_aggregates())
+            }
+            changed = []
+            for owner in owners.only('pk', 'user_id', *COUNTER_FIELDS).iterator(chunk_size=batch_size):
+                counts = expected.get(owner.pk, {})
+                values = {field: counts.get(field) or 0 for field in COUNTER_FIELDS}
+                if any(getattr(owner, field) != value for field, value in values.items()):
+                    logger.error('Counter drift on %s %s: stored %s, recounted %s', model._meta.model_name,
+                                 owner.pk, {field: getattr(owner, field) for field in COUNTER_FIELDS}, values)
+                    for field, value in values.items():
+                        setattr(owner, field, value)
+                    changed.append(owner)
+            if repair:
+                model.objects.bulk_update(changed, COUNTER_FIELDS, batch_size=batch_size)
+                for user_id in sorted({owner.user_id for owner in changed}):
+                    caching.invalidate(user_id)
+        drifted[model] = len(changed)
+    return drifted
+
+
+def _counter_aggregates():
+    aggregates = {'transaction_count': Count('pk')}
+    for transaction_type, field in TYPE_TOTALS.items():
+        aggregates[field] = Sum('amount', filter=Q(transaction_type=transaction_type))
+    return aggregates
+
+
+def verify_balance(account_id, repair=True):
+    """Compare the stored balance with a full recompute.
+
+    Returns the drift (stored minus recomputed). When ``repair`` is set a
+    drifted balance is overwritten with the recomputed value.
+    """
+    account = Account.objects.filter(pk=account_id).first()
+    if account is None:
+        return Decimal('0')
+
+    expected = Decimal(str(account.calculate_balance())).quantize(Decimal('0.01'))
+    drift = account.balance - expected
+    if drift:
+        logger.error(
+            'Balance drift on account %s: stored %s, recomputed %s',
+            account_id, account.balance, expected,
+        )
+        if repair:
+            with db_transaction.atomic():
+                Account.objects.filter(pk=account_id).update(balance=expected)
+                caching.invalidate(account.user_id)
+    return drift
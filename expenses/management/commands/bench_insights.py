@@ -0,0 +1,63 @@
+import random
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+from expenses import columnar
+from expenses.analytics import build_spending_data
+from expenses.management.seeding import seed_user, throwaway_user
+from expenses.management.timing import best
+from expenses.models import DailyRollup, Transaction
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Time the columnar insights engine against the SQL one on a multi-year history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years', type=int, default=10, help='Years of generated history')
+        parser.add_argument('--per-day', type=int, default=3, help='Generated transactions per day, on average')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per step; the best one is reported')
+        parser.add_argument('--user', help='Benchmark the history of this user instead of a generated one')
+
+    def handle(self, *args, **options):
+        if columnar.np is None:
+            raise CommandError('NumPy is not installed')
+        if min(options['years'], options['per_day'], options['repeat']) < 1:
+            raise CommandError('--years, --per-day and --repeat must be positive')
+
+        with db_transaction.atomic():
+            if options['user']:
+                user = User.objects.filter(email=options['user']).first()
+                if user is None:
+                    raise CommandError(f"No user with email {options['user']}")
+            else:
+                user = throwaway_user('bench-insights')
+                seed_user(
+                    user, random.Random(0), accounts=1, categories=12,
+                    transactions=options['years'] * 365 * options['per_day'], years=options['years'],
+                )
+            transactions = Transaction.objects.filter(user=user)
+            rollups = DailyRollup.objects.filter(user=user)
+            today = date.today()
+
+            columns, load_time = best(lambda: columnar.load(transactions), options['repeat'])
+            _, compute_time = best(
+                lambda: (columnar.window_metrics(columns, today), columnar.history_metrics(columns, today)),
+                options['repeat'],
+            )
+            _, columnar_time = best(lambda: columnar.build_spending_data(transactions, today), options['repeat'])
+            _, sql_time = best(lambda: build_spending_data(transactions, rollups, today), options['repeat'])
+            # Generated data is thrown away
+            db_transaction.set_rollback(not options['user'])
+
+        self.stdout.write(f'Transactions: {len(columns.days):,} ({columns.days.nbytes + columns.cents.nbytes + columns.types.nbytes + columns.categories.nbytes:,} bytes as columns)')
+        self.stdout.write(f'Load columns (1 query): {load_time * 1000:.1f} ms')
+        self.stdout.write(f'Vectorized metrics: {compute_time * 1000:.1f} ms')
+        self.stdout.write(f'Columnar engine, end to end: {columnar_time * 1000:.1f} ms (window metrics + full history)')
+        self.stdout.write(f'SQL engine, end to end: {sql_time * 1000:.1f} ms (window metrics only)')
+        if compute_time < 0.05:
+            self.stdout.write(self.style.SUCCESS('Metrics computed within the 50 ms budget'))
+        else:
+            self.stdout.write(self.style.WARNING('Metrics took longer than the 50 ms budget'))
@@ -0,0 +1,58 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+from rest_framework.renderers import JSONRenderer
+from expenses.management.seeding import seed_user, throwaway_user
+from expenses.management.timing import best
+from expenses.models import Transaction
+from expenses.renderers import FastJSONRenderer
+from expenses.serializers import TransactionSerializer
+from expenses.views import transaction_rows
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Compare rows/sec of the serializer and values() fast path for transaction lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Rows per list response')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per path; the best one is reported')
+        parser.add_argument('--user', help='Benchmark the transactions of this user instead of generated ones')
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1 or options['repeat'] < 1:
+            raise CommandError('--rows and --repeat must be positive')
+
+        with db_transaction.atomic():
+            if options['user']:
+                user = User.objects.filter(email=options['user']).first()
+                if user is None:
+                    raise CommandError(f"No user with email {options['user']}")
+            else:
+                user = throwaway_user('bench-serializers')
+                seed_user(user, random.Random(0), accounts=1, categories=5, transactions=options['rows'], years=1)
+            queryset = Transaction.objects.filter(user=user).order_by('-date', '-created_at', '-id')[:options['rows']]
+
+            def serializer_path():
+                data = TransactionSerializer(queryset.select_related('account', 'category'), many=True).data
+                return JSONRenderer().render(data)
+
+            def fast_path():
+                return FastJSONRenderer().render(transaction_rows.map(transaction_rows.values(queryset)))
+
+            before, before_time = best(serializer_path, options['repeat'])
+            after, after_time = best(fast_path, options['repeat'])
+            # Generated data is thrown away
+            db_transaction.set_rollback(not options['user'])
+
+        rows = queryset.count() if options['user'] else options['rows']
+        self.stdout.write(f'Rows per response: {rows}')
+        self.stdout.write(f'Serializer + JSONRenderer: {rows / before_time:,.0f} rows/sec ({before_time * 1000:.1f} ms)')
+        self.stdout.write(f'values() + FastJSONRenderer: {rows / after_time:,.0f} rows/sec ({after_time * 1000:.1f} ms)')
+        if before != after:
+            raise CommandError('Fast path output differs from the serializer output')
+        self.stdout.write(
+            self.style.SUCCESS(f'Identical output, {before_time / after_time:.1f}x faster')
+        )
@@ -0,0 +1,177 @@
+import json
+import os
+import statistics
+import time
+from datetime import date
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from expenses import caching
+from expenses.models import Transaction
+from expenses.views import insights_unavailable
+
+User = get_user_model()
+
+SCENARIOS = ['list', 'summary', 'balance', 'ai_insights', 'create', 'login']
+
+
+def rss_bytes():
+    """Resident set size of this process; the peak where /proc is missing"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the API in-process against the configured database (SQLite or PostgreSQL): '
+        'p50/p95/p99 latency, queries per request and RSS for each scenario. With --baseline, '
+        'exit with an error when a scenario regressed beyond --threshold'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default='bench-1@example.com', help='User to benchmark as (see seed_data)')
+        parser.add_argument('--password', default='bench-pass-12345', help="The user's password, for the login scenario")
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='Scenario to run (repeatable; default all)')
+        parser.add_argument('--iterations', type=int, default=100, help='Measured requests per scenario')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests before each scenario')
+        parser.add_argument('--output', help='Write the report to this JSON file')
+        parser.add_argument('--baseline', help='Compare with a report written by --output')
+        parser.add_argument('--threshold', type=float, default=0.25, help='Allowed p95 slowdown against the baseline, as a fraction')
+        parser.add_argument('--min-delta', type=float, default=1.0, help='p95 slowdowns below this many ms never count as regressions')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1 or options['warmup'] < 0 or options['threshold'] < 0:
+            raise CommandError('--iterations must be positive, --warmup and --threshold not negative')
+        user = User.objects.filter(email=options['user']).first()
+        if user is None:
+            raise CommandError(f"No user with email {options['user']}; create one with seed_data")
+        account = user.accounts.order_by('pk').first()
+        if account is None:
+            raise CommandError(f"{options['user']} has no accounts")
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Can't read baseline {options['baseline']}: {e}")
+
+        host = 'localhost' if '*' in settings.ALLOWED_HOSTS else settings.ALLOWED_HOSTS[0].lstrip('.')
+        client = APIClient(HTTP_HOST=host)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        anonymous = APIClient(HTTP_HOST=host)
+        created = []
+
+        def create():
+            response = client.post('/api/transactions/', {
+                'account': account.pk, 'transaction_type': 'expense', 'amount': '12.34',
+                'description': 'Benchmark', 'date': date.today().isoformat(),
+            }, format='json')
+            if response.status_code == 201:
+                created.append(response.json()['id'])
+            return response
+
+        requests = {
+            'list': (lambda: client.get('/api/transactions/'), 200),
+            'summary': (lambda: client.get('/api/transactions/summary/'), 200),
+            'balance': (lambda: client.get(f'/api/accounts/{account.pk}/balance/'), 200),
+            'ai_insights': (lambda: client.get('/api/transactions/ai_insights/'), 200),
+            'create': (create, 201),
+            'login': (lambda: anonymous.post('/api/auth/login/', {
+                'email': options['user'], 'password': options['password'],
+            }, format='json'), 200),
+        }
+        # ai_insights is cached per data version; drop the entry so every request computes
+        prepare = {'ai_insights': lambda: caching.invalidate(user.pk)}
+
+        report = {
+            'database': connection.vendor,
+            'transactions': Transaction.objects.filter(user=user).count(),
+            'iterations': options['iterations'],
+            'scenarios': {},
+        }
+        try:
+            for name in options['scenario'] or SCENARIOS:
+                if name == 'ai_insights' and insights_unavailable():
+                    self.stderr.write(self.style.WARNING(f'Skipping ai_insights: {insights_unavailable()}'))
+                    continue
+                request, expected = requests[name]
+                report['scenarios'][name] = self.run(
+                    name, request, expected, prepare.get(name), options['warmup'], options['iterations'],
+                )
+        finally:
+            # Deleted one by one, so the ledger signals undo their balance changes
+            for transaction in Transaction.objects.filter(pk__in=created):
+                transaction.delete()
+
+        self.stdout.write(
+            f"{report['database']}, {report['transactions']:,} transactions, "
+            f"{options['iterations']} requests per scenario"
+        )
+        self.stdout.write(f"{'scenario':<12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'RSS MiB':>8}")
+        for name, stats in report['scenarios'].items():
+            self.stdout.write(
+                f"{name:<12} {stats['p50']:>8.1f} {stats['p95']:>8.1f} {stats['p99']:>8.1f} "
+                f"{stats['queries']:>8.1f} {stats['rss'] / 2 ** 20:>8.1f}"
+            )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+        if baseline is not None:
+            self.compare(report, baseline, options['threshold'], options['min_delta'])
+
+    def run(self, name, request, expected, prepare, warmup, iterations):
+        latencies, queries = [], []
+        for number in range(warmup + iterations):
+            if prepare:
+                prepare()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = request()
+                elapsed = time.perf_counter() - started
+            if response.status_code != expected:
+                raise CommandError(f'{name} answered {response.status_code}: {response.content[:200]!r}')
+            if number >= warmup:
+                latencies.append(elapsed * 1000)
+                queries.append(len(captured.captured_queries))
+        if len(latencies) >= 2:
+            percentiles = statistics.quantiles(latencies, n=100, method='inclusive')
+            p50, p95, p99 = percentiles[49], percentiles[94], percentiles[98]
+        else:
+            p50 = p95 = p99 = latencies[0]
+        return {
+            'p50': p50, 'p95': p95, 'p99': p99,
+            'queries': statistics.mean(queries),
+            'rss': rss_bytes(),
+        }
+
+    def compare(self, report, baseline, threshold, min_delta):
+        """Fail on a p95 slowdown beyond the threshold, or on any extra query"""
+        if baseline.get('database') != report['database']:
+            self.stderr.write(self.style.WARNING(
+                f"Baseline was recorded on {baseline.get('database')}, this run is on {report['database']}"
+            ))
+        regressions = []
+        for name, stats in report['scenarios'].items():
+            before = baseline.get('scenarios', {}).get(name)
+            if before is None:
+                continue
+            slower = stats['p95'] - before['p95']
+            if slower > min_delta and stats['p95'] > before['p95'] * (1 + threshold):
+                regressions.append(f"{name}: p95 {before['p95']:.1f} -> {stats['p95']:.1f} ms")
+            if stats['queries'] > before['queries']:
+                regressions.append(f"{name}: {before['queries']:.1f} -> {stats['queries']:.1f} queries per request")
+        if regressions:
+            raise CommandError('Regressions against the baseline:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS(f'No regressions against the baseline (threshold {threshold:.0%})'))
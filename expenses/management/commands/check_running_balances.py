@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+from expenses import ledger
+from expenses.models import Account
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Check stored per-transaction running balances against a full recompute'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only check the accounts of the user with this email')
+        parser.add_argument('--repair', action='store_true', help='Rewrite the running balances of inconsistent accounts')
+
+    def handle(self, *args, **options):
+        accounts = Account.objects.order_by('pk')
+        if options['user']:
+            user = User.objects.filter(email=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user with email {options['user']}")
+            accounts = accounts.filter(user=user)
+
+        checked = inconsistent = drifted = 0
+        for account_id, name, balance in accounts.values_list('pk', 'name', 'balance').iterator():
+            checked += 1
+            wrong, closing = ledger.verify_running_balances(account_id)
+            if not wrong and closing == balance:
+                continue
+            inconsistent += 1
+            drifted += closing != balance
+            self.stdout.write(
+                f'{name} (#{account_id}): {wrong} wrong running balances, '
+                f'closing {closing} vs stored balance {balance}'
+            )
+            if options['repair'] and wrong:
+                with db_transaction.atomic():
+                    # Lock the account so ledger writes wait for the rewrite
+                    Account.objects.select_for_update().filter(pk=account_id).first()
+                    ledger.rebuild_running_balances(account_id)
+
+        if inconsistent and not options['repair']:
+            raise CommandError(f'{inconsistent} of {checked} accounts are inconsistent; rerun with --repair')
+        if drifted:
+            self.stdout.write(self.style.WARNING(
+                f'{drifted} stored account balances differ from their closing running balance; '
+                'run recalculate_balances'
+            ))
+        self.stdout.write(
+            self.style.SUCCESS(f'Checked {checked} accounts, {inconsistent} inconsistent')
+        )
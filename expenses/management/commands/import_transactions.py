@@ -0,0 +1,132 @@
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+from expenses import importers, ledger
+from expenses.models import ACCOUNT_TYPES, Account, Category, Transaction
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Import transactions for a user from a CSV, OFX or QIF bank statement'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Statement file to import')
+        parser.add_argument('--user', required=True, help='Email of the user the transactions belong to')
+        parser.add_argument('--format', choices=sorted(importers.READERS), help='File format (default: from the file extension)')
+        parser.add_argument('--account', help='Account name for rows without an account column (created if missing)')
+        parser.add_argument('--account-type', default='checking', choices=[key for key, _ in ACCOUNT_TYPES],
+                            help='Type of accounts created by the import')
+        parser.add_argument('--columns', help='CSV column map, e.g. "date=Posted,amount=Amount,description=Payee"')
+        parser.add_argument('--delimiter', default=',', help='CSV delimiter')
+        parser.add_argument('--date-format', help='strptime format of CSV/QIF dates (default %%Y-%%m-%%d for CSV, %%m/%%d/%%Y for QIF)')
+        parser.add_argument('--encoding', default='utf-8-sig', help='File encoding')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Transactions inserted per query')
+        parser.add_argument('--skip-invalid', action='store_true', help='Skip rows that fail to parse instead of aborting')
+
+    def handle(self, *args, **options):
+        self.user = User.objects.filter(email=options['user']).first()
+        if self.user is None:
+            raise CommandError(f"No user with email {options['user']}")
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if file_format not in importers.READERS:
+            raise CommandError(f'Unknown statement format "{file_format}"; pass --format')
+
+        self.account_type = options['account_type']
+        self.default_account = options['account']
+        # name -> pk lookup caches; every name costs at most one query
+        self.accounts = self.lookup(Account)
+        self.categories = self.lookup(Category)
+
+        started = self.reported = time.monotonic()
+        imported = skipped = 0
+        batch = ledger.Batch()
+        chunk = []
+        try:
+            with open(path, newline='', encoding=options['encoding']) as stream, db_transaction.atomic():
+                for row in self.rows(stream, file_format, options):
+                    if isinstance(row, importers.ImportRowError):
+                        if not options['skip_invalid']:
+                            raise CommandError(f'{row}; nothing was imported (use --skip-invalid to skip bad rows)')
+                        skipped += 1
+                        self.stderr.write(f'Skipped {row}')
+                        continue
+                    chunk.append(self.build(row))
+                    if len(chunk) >= options['chunk_size']:
+                        imported += self.flush(chunk, batch)
+                        chunk = []
+                        self.report(imported, started)
+                imported += self.flush(chunk, batch)
+                # Balances and rollups are fixed once, for the whole file
+                batch.apply()
+        except OSError as e:
+            raise CommandError(f'Cannot read {path}: {e}')
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        elapsed = time.monotonic() - started
+        rate = imported / elapsed if elapsed else imported
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully imported {imported} transactions ({skipped} skipped) '
+                f'in {elapsed:.1f}s, {rate:.0f} rows/sec'
+            )
+        )
+
+    def rows(self, stream, file_format, options):
+        kwargs = {}
+        if file_format == 'csv':
+            kwargs = {
+                'columns': importers.parse_columns(options['columns']),
+                'delimiter': options['delimiter'],
+                'date_format': options['date_format'] or '%Y-%m-%d',
+            }
+        elif file_format == 'qif':
+            kwargs = {'date_format': options['date_format'] or '%m/%d/%Y'}
+        return importers.READERS[file_format](stream, **kwargs)
+
+    def lookup(self, model):
+        cache = {}
+        for pk, name in model.objects.filter(user=self.user).order_by('pk').values_list('pk', 'name'):
+            cache.setdefault(name.lower(), pk)
+        return cache
+
+    def resolve(self, cache, model, name, **defaults):
+        pk = cache.get(name.lower())
+        if pk is None:
+            pk = cache[name.lower()] = model.objects.create(user=self.user, name=name, **defaults).pk
+        return pk
+
+    def build(self, row):
+        account_name = row.account or self.default_account
+        if not account_name:
+            raise CommandError(f'line {row.line}: no account; pass --account or map an account column')
+        return Transaction(
+            user=self.user,
+            account_id=self.resolve(self.accounts, Account, account_name, account_type=self.account_type),
+            category_id=self.resolve(self.categories, Category, row.category) if row.category else None,
+            transaction_type=row.transaction_type,
+            amount=row.amount,
+            description=row.description,
+            notes=row.notes,
+            date=row.date,
+        )
+
+    def flush(self, chunk, batch):
+        if not chunk:
+            return 0
+        Transaction.objects.bulk_create(chunk)
+        batch.add(ledger.entry_for(txn) for txn in chunk)
+        return len(chunk)
+
+    def report(self, imported, started, every=5):
+        now = time.monotonic()
+        if now - self.reported >= every:
+            self.reported = now
+            self.stdout.write(f'{imported} rows imported, {imported / (now - started):.0f} rows/sec')
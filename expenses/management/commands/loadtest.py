@@ -0,0 +1,115 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure requests/sec and latency of running servers, e.g. the WSGI '
+        'runserver against uvicorn serving the /api/async/ endpoints'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='URLs to load, one after the other; the first is the baseline')
+        parser.add_argument('--user', help='Authenticate as this user (email), minting a fresh access token')
+        parser.add_argument('--token', help='Access token to send instead of --user')
+        parser.add_argument('--concurrency', type=int, default=32, help='Simultaneous keep-alive connections')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds to load each URL')
+        parser.add_argument('--warmup', type=float, default=1, help='Seconds of unmeasured load before each run')
+        parser.add_argument('--timeout', type=float, default=10, help='Per-request timeout in seconds')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['duration'] <= 0:
+            raise CommandError('--concurrency and --duration must be positive')
+        headers = {'Accept': 'application/json'}
+        token = options['token']
+        if options['user']:
+            user = User.objects.filter(email=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user with email {options['user']}")
+            token = str(AccessToken.for_user(user))
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+
+        results = []
+        for url in options['urls']:
+            if urlsplit(url).scheme not in ('http', 'https'):
+                raise CommandError(f'Not an http(s) URL: {url}')
+            if options['warmup'] > 0:
+                self.run(url, headers, options['concurrency'], options['warmup'], options['timeout'])
+            results.append((url, self.run(url, headers, options['concurrency'], options['duration'], options['timeout'])))
+
+        baseline = results[0][1]['rps']
+        width = max(len(url) for url, _ in results)
+        self.stdout.write(f"{'URL':<{width}} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for url, stats in results:
+            line = (
+                f"{url:<{width}} {stats['rps']:>9,.0f} {stats['p50']:>8.1f} {stats['p95']:>8.1f} "
+                f"{stats['p99']:>8.1f} {stats['errors']:>7}"
+            )
+            if url != results[0][0] and baseline:
+                line += f"  {stats['rps'] / baseline:.2f}x"
+            self.stdout.write(line)
+        if any(stats['errors'] for _, stats in results):
+            self.stderr.write(self.style.WARNING('Some requests failed or answered non-200; see the errors column'))
+
+    def run(self, url, headers, concurrency, duration, timeout):
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            runs = list(pool.map(lambda _: self.client(url, headers, deadline, timeout), range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for run_latencies, _ in runs for latency in run_latencies)
+        errors = sum(run_errors for _, run_errors in runs)
+        if len(latencies) >= 2:
+            percentiles = statistics.quantiles(latencies, n=100, method='inclusive')
+            p50, p95, p99 = percentiles[49], percentiles[94], percentiles[98]
+        else:
+            p50 = p95 = p99 = latencies[0] if latencies else 0.0
+        return {
+            'rps': len(latencies) / elapsed,
+            'p50': p50 * 1000,
+            'p95': p95 * 1000,
+            'p99': p99 * 1000,
+            'errors': errors,
+        }
+
+    def client(self, url, headers, deadline, timeout):
+        """One keep-alive connection issuing GETs until the deadline"""
+        parts = urlsplit(url)
+        connection_class = HTTPSConnection if parts.scheme == 'https' else HTTPConnection
+        target = parts.path + (f'?{parts.query}' if parts.query else '')
+        connection = None
+        latencies, errors = [], 0
+        while time.perf_counter() < deadline:
+            if connection is None:
+                connection = connection_class(parts.netloc, timeout=timeout)
+            started = time.perf_counter()
+            try:
+                connection.request('GET', target, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, HTTPException):
+                errors += 1
+                connection.close()
+                connection = None
+                continue
+            if response.status == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+            if response.will_close:
+                connection.close()
+                connection = None
+        if connection is not None:
+            connection.close()
+        return latencies, errors
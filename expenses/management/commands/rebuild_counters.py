@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from expenses import ledger
+from expenses.models import Account, Category
+
+User = get_user_model()
+
+LABELS = {Account: 'Accounts', Category: 'Categories'}
+
+class Command(BaseCommand):
+    help = 'Recount the stored transaction counters and per-type totals of accounts and categories'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild the accounts and categories of the user with this email')
+        parser.add_argument('--check', action='store_true',
+                            help="Only report drifted counters (exit with an error if any), don't rewrite them")
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows read and written per round trip')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            user = User.objects.filter(email=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user with email {options['user']}")
+
+        # Each drifted row is also logged by the ledger with its stored and recounted values
+        drifted = ledger.rebuild_counters(user, repair=not options['check'], batch_size=options['batch_size'])
+
+        for model, count in drifted.items():
+            self.stdout.write(f'{LABELS[model]}: {count} with drifted counters')
+        total = sum(drifted.values())
+        if options['check']:
+            if total:
+                raise CommandError(f'{total} rows have drifted counters; rerun without --check to repair')
+            self.stdout.write(self.style.SUCCESS('All counters match'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Rewrote {total} rows'))
@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from expenses import ledger
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily transaction rollups from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild the rollups of the user with this email')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Buckets inserted per query')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            user = User.objects.filter(email=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user with email {options['user']}")
+
+        written = ledger.rebuild_rollups(user=user, batch_size=options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rebuilt {written} daily rollup buckets')
+        )
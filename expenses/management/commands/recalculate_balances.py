@@ -1,26 +1,125 @@
-from django.core.management.base import BaseCommand
-from expenses.models import Account
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db import transaction as db_transaction
+from django.db.models.functions import Mod
+from django.utils import timezone
+from expenses import caching, ledger
+from expenses.models import Account, Transaction
+
+User = get_user_model()
 
 class Command(BaseCommand):
     help = 'Recalculate all account balances based on transactions'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only recalculate the accounts of the user with this email')
+        parser.add_argument('--since', help='Only accounts with transactions written on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without writing anything')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Accounts recalculated per grouped query')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes (PostgreSQL only)')
+
     def handle(self, *args, **options):
-        accounts = Account.objects.all()
-        updated_count = 0
-        
-        for account in accounts:
-            old_balance = account.balance
-            account.balance = account.calculate_balance()
-            account.save(update_fields=['balance'])
-            
-            if old_balance != account.balance:
-                updated_count += 1
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f'Updated {account.name}: ${old_balance} → ${account.balance}'
-                    )
-                )
-        
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--batch-size and --workers must be positive')
+
+        filters = {}
+        if options['user']:
+            user = User.objects.filter(email=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user with email {options['user']}")
+            filters['user_id'] = user.pk
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d')
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format')
+            filters['since'] = timezone.make_aware(since)
+
+        workers = options['workers']
+        if workers > 1 and connection.vendor != 'postgresql':
+            self.stderr.write(self.style.WARNING(
+                f'--workers needs PostgreSQL; running in one process on {connection.vendor}'
+            ))
+            workers = 1
+
+        started = time.monotonic()
+        job = (filters, options['batch_size'], options['dry_run'])
+        if workers == 1:
+            results = [recalculate_shard(job, 0, 1)]
+        else:
+            # Forked workers must not share the parent's database connection
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                results = list(pool.map(recalculate_shard, [job] * workers, range(workers), [workers] * workers))
+        elapsed = time.monotonic() - started
+
+        checked = sum(result['checked'] for result in results)
+        drifted = [drift for result in results for drift in result['drifted']]
+        for pk, name, old, new in sorted(drifted):
+            verb = 'Would update' if options['dry_run'] else 'Updated'
+            self.stdout.write(f'{verb} {name} (#{pk}): ${old} → ${new}')
+
+        total_drift = sum(abs(new - old) for _, _, old, new in drifted)
+        rate = checked / elapsed if elapsed else checked
         self.stdout.write(
-            self.style.SUCCESS(f'Successfully updated {updated_count} account balances')
+            f'Checked {checked} accounts in {elapsed:.1f}s ({rate:.0f} accounts/sec); '
+            f'{len(drifted)} drifted by ${total_drift} in total'
         )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run: no balances were written'))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f'Successfully updated {len(drifted)} account balances')
+            )
+
+
+def recalculate_shard(job, shard, shards):
+    """Recalculate every account whose ``pk % shards == shard``.
+
+    Accounts are walked in primary key order, ``batch_size`` at a time. Each
+    batch locks its account rows, recomputes their balances with one grouped
+    query and writes the drifted ones back with ``bulk_update``, so a
+    concurrent transaction write can't land between the read and the write.
+    """
+    filters, batch_size, dry_run = job
+    if shards > 1:
+        connections.close_all()
+
+    accounts = Account.objects.order_by('pk')
+    if 'user_id' in filters:
+        accounts = accounts.filter(user_id=filters['user_id'])
+    if 'since' in filters:
+        recent = Transaction.objects.filter(updated_at__gte=filters['since']).values('account_id')
+        accounts = accounts.filter(pk__in=recent)
+
+    checked, drifted, last_pk = 0, [], 0
+    while True:
+        with db_transaction.atomic():
+            batch = accounts.filter(pk__gt=last_pk)
+            if shards > 1:
+                batch = batch.annotate(shard=Mod('pk', shards)).filter(shard=shard)
+            batch = list(batch.select_for_update().values_list('pk', 'name', 'balance', 'user_id')[:batch_size])
+            if not batch:
+                break
+            balances = ledger.balances_for([pk for pk, _, _, _ in batch])
+            changed, users = [], set()
+            for pk, name, old, user_id in batch:
+                if old != balances[pk]:
+                    drifted.append((pk, name, old, balances[pk]))
+                    changed.append(Account(pk=pk, balance=balances[pk]))
+                    users.add(user_id)
+            if changed and not dry_run:
+                Account.objects.bulk_update(changed, ['balance'])
+                for user_id in sorted(users):
+                    caching.invalidate(user_id)
+        checked += len(batch)
+        last_pk = batch[-1][0]
+
+    return {'checked': checked, 'drifted': drifted}
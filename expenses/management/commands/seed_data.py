@@ -0,0 +1,59 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+from expenses.management.seeding import seed_user
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate users with accounts, categories and transactions spread over past years: '
+        'a monthly salary, log-normally distributed expenses weighted towards popular '
+        'categories and weekends, and occasional transfers. Every user logs in with --password'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Users to create')
+        parser.add_argument('--accounts', type=int, default=3, help='Accounts per user')
+        parser.add_argument('--categories', type=int, default=12, help='Categories per user')
+        parser.add_argument('--transactions', type=int, default=2000, help='Transactions per user')
+        parser.add_argument('--years', type=int, default=3, help='Years of history, ending today')
+        parser.add_argument('--prefix', default='bench', help='Users are <prefix>-<n>@example.com')
+        parser.add_argument('--password', default='bench-pass-12345', help='Password of every generated user')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed generates the same data')
+        parser.add_argument('--reset', action='store_true', help='Delete users with the same prefix first')
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['accounts'], options['categories'], options['transactions'], options['years']) < 1:
+            raise CommandError('--users, --accounts, --categories, --transactions and --years must be positive')
+
+        existing = User.objects.filter(email__startswith=f"{options['prefix']}-", email__endswith='@example.com')
+        if options['reset']:
+            existing.delete()
+        elif existing.exists():
+            raise CommandError(f"Users with prefix {options['prefix']!r} exist; pass --reset to replace them")
+
+        started = time.monotonic()
+        # One hash for everyone: hashing is deliberately slow
+        password = make_password(options['password'])
+        for number in range(1, options['users'] + 1):
+            rng = random.Random(f"{options['seed']}-{number}")
+            with db_transaction.atomic():
+                user = User.objects.create(
+                    username=f"{options['prefix']}-{number}", email=f"{options['prefix']}-{number}@example.com",
+                    first_name='Bench', last_name=f'User {number}', password=password,
+                )
+                seed_user(
+                    user, rng, accounts=options['accounts'], categories=options['categories'],
+                    transactions=options['transactions'], years=options['years'],
+                )
+        total = options['users'] * options['transactions']
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {options['users']} users and {total:,} transactions in {time.monotonic() - started:.1f}s "
+            f"(log in as {options['prefix']}-1@example.com / {options['password']})"
+        ))
@@ -0,0 +1,82 @@
+"""
+Generated data for ``seed_data`` and the benchmark commands.
+
+``seed_user`` gives a user accounts, categories and a history of
+transactions: a monthly salary, log-normally distributed expenses weighted
+towards popular categories and weekends, and occasional transfers. The
+same ``rng`` seed always generates the same data.
+"""
+import math
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from expenses import ledger
+from expenses.models import ACCOUNT_TYPES, Account, Category, Transaction
+
+User = get_user_model()
+
+# (name, median amount, lognormal sigma) of the expense categories, most frequent first
+CATEGORIES = [
+    ('Groceries', 45, 0.6), ('Dining', 25, 0.7), ('Transport', 15, 0.8), ('Shopping', 60, 1.0),
+    ('Utilities', 90, 0.4), ('Entertainment', 30, 0.8), ('Health', 70, 0.9), ('Subscriptions', 12, 0.5),
+    ('Travel', 300, 1.1), ('Gifts', 50, 0.9), ('Education', 120, 0.8), ('Rent', 1500, 0.1),
+]
+
+# Relative number of expenses per weekday, Monday first
+WEEKDAY_WEIGHTS = [0.9, 0.9, 1.0, 1.0, 1.3, 1.6, 1.3]
+
+
+def throwaway_user(name):
+    """A user for a benchmark to seed in a transaction it rolls back; it can't log in"""
+    return User.objects.create_user(username=name, email=f'{name}@example.invalid', password=None)
+
+
+def seed_user(user, rng, accounts=3, categories=12, transactions=2000, years=3):
+    """Generate ``user``'s accounts, categories and transactions, with the ledger up to date"""
+    account_types = [value for value, _ in ACCOUNT_TYPES]
+    accounts = Account.objects.bulk_create([
+        Account(user=user, name=f'Account {number}', account_type=account_types[number % len(account_types)])
+        for number in range(accounts)
+    ])
+    profiles = [CATEGORIES[number % len(CATEGORIES)] for number in range(categories)]
+    categories = Category.objects.bulk_create([
+        Category(user=user, name=name if number < len(CATEGORIES) else f'{name} {number // len(CATEGORIES) + 1}')
+        for number, (name, _, _) in enumerate(profiles)
+    ])
+    # Zipf-like popularity: the n-th category is picked about 1/n as often as the first
+    category_weights = [1 / (number + 1) for number in range(len(categories))]
+
+    today = date.today()
+    first = today - timedelta(days=365 * years)
+    days = [first + timedelta(days=offset) for offset in range((today - first).days + 1)]
+    day_weights = [WEEKDAY_WEIGHTS[day.weekday()] for day in days]
+    salary = Decimal(rng.randrange(2500, 9000))
+    paydays = [day for day in days if day.day == 1][:transactions]
+
+    rows = [
+        Transaction(
+            user=user, account=accounts[0], category=None, transaction_type='income',
+            amount=salary, description='Salary', date=day,
+        )
+        for day in paydays
+    ]
+    for day in rng.choices(days, weights=day_weights, k=transactions - len(rows)):
+        account = accounts[0] if len(accounts) == 1 or rng.random() < 0.7 else rng.choice(accounts[1:])
+        if rng.random() < 0.05:
+            rows.append(Transaction(
+                user=user, account=account, category=None, transaction_type='transfer',
+                amount=Decimal(rng.randrange(50, 1000)), description='Transfer', date=day,
+            ))
+            continue
+        index = rng.choices(range(len(categories)), weights=category_weights)[0]
+        name, median, sigma = profiles[index]
+        amount = Decimal(str(round(rng.lognormvariate(math.log(median), sigma), 2))) or Decimal('0.01')
+        rows.append(Transaction(
+            user=user, account=account, category=categories[index], transaction_type='expense',
+            amount=amount, description=name, date=day,
+        ))
+    rows.sort(key=lambda row: row.date)
+    Transaction.objects.bulk_create(rows, batch_size=1000)
+    # bulk_create skips the ledger signals; fold the rows into one ledger pass, like bulk writes
+    ledger.apply(ledger.entry_for(row) for row in rows)
@@ -0,0 +1,11 @@
+import time
+
+
+def best(run, repeat):
+    """``run``'s output and its fastest time in seconds over ``repeat`` runs"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = run()
+        timings.append(time.perf_counter() - started)
+    return output, min(timings)
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expenses", "0002_category_color_alter_account_account_type_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(fields=["user", "-date", "-created_at", "-id"], name="txn_user_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(fields=["account", "-date", "-created_at", "-id"], name="txn_account_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(fields=["account", "transaction_type"], name="txn_account_type_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(fields=["user", "transaction_type", "date"], name="txn_user_type_date_idx"),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:09
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+SIGNS = {"income": 1, "expense": -1, "transfer": -1}
+
+
+def backfill_running_balances(apps, schema_editor):
+    Transaction = apps.get_model("expenses", "Transaction")
+    rows = Transaction.objects.order_by(
+        "account_id", "date", "created_at", "id"
+    ).values_list("pk", "account_id", "transaction_type", "amount")
+    batch, account_id, running = [], None, Decimal("0")
+    for pk, row_account_id, transaction_type, amount in rows.iterator(chunk_size=1000):
+        if row_account_id != account_id:
+            account_id, running = row_account_id, Decimal("0")
+        running += SIGNS.get(transaction_type, 0) * amount
+        batch.append(Transaction(pk=pk, running_balance=running))
+        if len(batch) >= 1000:
+            Transaction.objects.bulk_update(batch, ["running_balance"])
+            batch = []
+    Transaction.objects.bulk_update(batch, ["running_balance"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expenses", "0004_dailyrollup"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transaction",
+            name="running_balance",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=14
+            ),
+        ),
+        migrations.RunPython(backfill_running_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:29
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+COUNTERS = ("transaction_count", "total_income", "total_expense", "total_transfer")
+
+
+def backfill_counters(apps, schema_editor):
+    Transaction = apps.get_model("expenses", "Transaction")
+    for model_name, column in (("Account", "account_id"), ("Category", "category_id")):
+        model = apps.get_model("expenses", model_name)
+        rows = (
+            Transaction.objects.filter(**{f"{column}__isnull": False})
+            .order_by()
+            .values(column)
+            .annotate(
+                counted=Count("pk"),
+                income=Sum("amount", filter=Q(transaction_type="income")),
+                expense=Sum("amount", filter=Q(transaction_type="expense")),
+                transfer=Sum("amount", filter=Q(transaction_type="transfer")),
+            )
+        )
+        batch = []
+        for row in rows.iterator(chunk_size=1000):
+            batch.append(
+                model(
+                    pk=row[column],
+                    transaction_count=row["counted"],
+                    total_income=row["income"] or 0,
+                    total_expense=row["expense"] or 0,
+                    total_transfer=row["transfer"] or 0,
+                )
+            )
+            if len(batch) >= 1000:
+                model.objects.bulk_update(batch, COUNTERS)
+                batch = []
+        model.objects.bulk_update(batch, COUNTERS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expenses", "0005_transaction_running_balance"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="account",
+            name="total_expense",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=14
+            ),
+        ),
+        migrations.AddField(
+            model_name="account",
+            name="total_income",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=14
+            ),
+        ),
+        migrations.AddField(
+            model_name="account",
+            name="total_transfer",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=14
+            ),
+        ),
+        migrations.AddField(
+            model_name="account",
+            name="transaction_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="total_expense",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=14
+            ),
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="total_income",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=14
+            ),
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="total_transfer",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=14
+            ),
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="transaction_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
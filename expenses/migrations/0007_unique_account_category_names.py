@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:52
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def rename_duplicates(apps, schema_editor):
+    """Keep the oldest of each user's same-named accounts/categories and number the others"""
+    for model_name in ("Account", "Category"):
+        model = apps.get_model("expenses", model_name)
+        duplicates = (
+            model.objects.order_by()
+            .values("user_id", "name")
+            .annotate(copies=Count("pk"))
+            .filter(copies__gt=1)
+        )
+        for duplicate in duplicates:
+            taken = set(model.objects.filter(user_id=duplicate["user_id"]).values_list("name", flat=True))
+            rows = model.objects.filter(user_id=duplicate["user_id"], name=duplicate["name"]).order_by("pk")
+            for row in rows[1:]:
+                number = 2
+                while True:
+                    suffix = f" ({number})"
+                    name = duplicate["name"][: 100 - len(suffix)] + suffix
+                    if name not in taken:
+                        break
+                    number += 1
+                taken.add(name)
+                model.objects.filter(pk=row.pk).update(name=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expenses", "0006_account_category_counters"),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="account",
+            constraint=models.UniqueConstraint(
+                fields=("user", "name"), name="account_user_name_unique"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="category",
+            constraint=models.UniqueConstraint(
+                fields=("user", "name"), name="category_user_name_unique"
+            ),
+        ),
+    ]
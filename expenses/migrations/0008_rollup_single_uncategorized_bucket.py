@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:01
+
+from django.db import migrations, models
+import django.db.models.functions.comparison
+from django.db.models import Count, Sum
+
+
+def merge_uncategorized_buckets(apps, schema_editor):
+    """Fold duplicate uncategorized buckets of a day into the oldest one"""
+    DailyRollup = apps.get_model("expenses", "DailyRollup")
+    key = ("user_id", "account_id", "transaction_type", "date")
+    duplicates = (
+        DailyRollup.objects.filter(category__isnull=True)
+        .order_by()
+        .values(*key)
+        .annotate(copies=Count("pk"), summed=Sum("total"), counted=Sum("transaction_count"))
+        .filter(copies__gt=1)
+    )
+    for duplicate in list(duplicates):
+        rows = DailyRollup.objects.filter(category__isnull=True, **{field: duplicate[field] for field in key})
+        keep = rows.order_by("pk").values_list("pk", flat=True).first()
+        rows.filter(pk=keep).update(total=duplicate["summed"], transaction_count=duplicate["counted"])
+        rows.exclude(pk=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expenses", "0007_unique_account_category_names"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_uncategorized_buckets, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name="dailyrollup",
+            name="rollup_bucket_unique",
+        ),
+        migrations.AddConstraint(
+            model_name="dailyrollup",
+            constraint=models.UniqueConstraint(
+                models.F("user"),
+                models.F("account"),
+                django.db.models.functions.comparison.Coalesce("category", 0),
+                models.F("transaction_type"),
+                models.F("date"),
+                name="rollup_bucket_unique",
+            ),
+        ),
+    ]
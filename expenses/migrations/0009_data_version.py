@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def seed_versions(apps, schema_editor):
+    """A version for every existing user; new users get theirs from a post_save signal"""
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    DataVersion = apps.get_model("expenses", "DataVersion")
+    now = timezone.now()
+    DataVersion.objects.bulk_create(
+        [DataVersion(user_id=pk, changed_at=now) for pk in User.objects.values_list("pk", flat=True)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+        ("expenses", "0008_rollup_single_uncategorized_bucket"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DataVersion",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="data_version",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("version", models.BigIntegerField(default=0)),
+                ("changed_at", models.DateTimeField()),
+            ],
+        ),
+        migrations.RunPython(seed_versions, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 
 from django.contrib.auth import get_user_model
 
@@ -19,7 +20,30 @@ ACCOUNT_TYPES = [
     ('other', 'Other'),
 ]
 
-class Category(models.Model):
+class LedgerCounters(models.Model):
+    """Per-owner transaction counters, maintained incrementally by expenses.ledger"""
+    transaction_count = models.IntegerField(default=0, editable=False)
+    total_income = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    total_expense = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    total_transfer = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+
+    # A plain save() of a loaded row must not write back a stale in-memory
+    # copy of the fields the ledger maintains.
+    LEDGER_FIELDS = ('transaction_count', 'total_income', 'total_expense', 'total_transfer')
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and self.pk and not args and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.LEDGER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+
+class Category(LedgerCounters):
     name=models.CharField(max_length=100)
     description= models.TextField(blank=True)
     color=models.CharField(max_length=7, default='#007bff')  # Hex color code
@@ -27,10 +51,13 @@ class Category(models.Model):
     created_at=models.DateTimeField(auto_now_add=True)
     updated_at=models.DateTimeField(auto_now=True)
 
-    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='category_user_name_unique'),
+        ]
 
 
-class Account(models.Model):
+class Account(LedgerCounters):
     name= models.CharField(max_length=100)
     account_type=models.CharField(max_length=20, choices=ACCOUNT_TYPES)
     balance= models.DecimalField(max_digits=12,decimal_places=2,default=0.00)
@@ -52,10 +79,12 @@ class Account(models.Model):
         transfers_out = self.transactions.filter(transaction_type='transfer').aggregate(Sum('amount'))['amount__sum'] or 0
         return float(income - expenses - transfers_out)
     
-    def save(self, *args, **kwargs):
-        if self.pk:
-            self.balance = self.calculate_balance()
-        super().save(*args, **kwargs)
+    LEDGER_FIELDS = ('balance',) + LedgerCounters.LEDGER_FIELDS
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='account_user_name_unique'),
+        ]
 
 class Transaction(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transactions')
@@ -66,6 +95,50 @@ class Transaction(models.Model):
     description = models.CharField(max_length=255)
     notes = models.TextField(blank=True)
     date = models.DateField()
+    # Account balance after this transaction in (date, created_at, id) order,
+    # maintained incrementally by expenses.ledger
+    running_balance = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Transaction lists: filtered by user, keyset-ordered (expenses.pagination)
+            models.Index(fields=['user', '-date', '-created_at', '-id'], name='txn_user_date_idx'),
+            # Nested /accounts/{id}/transactions/ lists, same ordering
+            models.Index(fields=['account', '-date', '-created_at', '-id'], name='txn_account_date_idx'),
+            # Account.calculate_balance and per-type account totals
+            models.Index(fields=['account', 'transaction_type'], name='txn_account_type_idx'),
+            # Summary/insight windows: user + type + date range
+            models.Index(fields=['user', 'transaction_type', 'date'], name='txn_user_type_date_idx'),
+        ]
+
+class DailyRollup(models.Model):
+    """Per-day totals of transactions, maintained incrementally by expenses.ledger"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_rollups')
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='daily_rollups')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='daily_rollups')
+    transaction_type = models.CharField(max_length=20, choices=TRANSACTION_TYPES)
+    date = models.DateField()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    transaction_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # NULLs never collide in a plain unique constraint; coalesced, there
+            # is at most one uncategorized bucket per day as well
+            models.UniqueConstraint(
+                'user', 'account', Coalesce('category', 0), 'transaction_type', 'date',
+                name='rollup_bucket_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'date'], name='rollup_user_date_idx'),
+        ]
+
+
+class DataVersion(models.Model):
+    """Per-user version of the data analytics are computed from, bumped by expenses.caching.invalidate"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='data_version')
+    version = models.BigIntegerField(default=0)
+    changed_at = models.DateTimeField()
@@ -0,0 +1,109 @@
+"""
+Keyset pagination for transaction lists.
+
+DRF's ``CursorPagination`` only keys on the first ordering field and walks an
+offset through rows that tie on it. Transactions tie on ``date`` constantly, so
+this paginator keys on the full ``(date, created_at, id)`` tuple instead: every
+page, however deep, is a single indexed range scan of ``page_size + 1`` rows.
+"""
+from datetime import date
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+KEYSET_FIELDS = ('date', 'created_at', 'id')
+
+
+class TransactionCursorPagination(CursorPagination):
+    ordering = tuple(f'-{field}' for field in KEYSET_FIELDS)
+    page_size = settings.TRANSACTION_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.TRANSACTION_MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` reading the page through the async ORM"""
+        queryset = self.page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page([row async for row in queryset.aiterator()])
+
+    def page_queryset(self, queryset, request):
+        """The ``page_size + 1`` rows to fetch, or None when pagination is off"""
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        self.reverse = bool(self.cursor and self.cursor.reverse)
+
+        if self.reverse:
+            queryset = queryset.order_by(*KEYSET_FIELDS)
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if self.cursor and self.cursor.position:
+            queryset = queryset.filter(self.keyset_filter(self.cursor.position, self.reverse))
+
+        # Fetch one extra row to learn whether another page exists
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, rows):
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        position = self.encode_position(self.page[-1])
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        position = self.encode_position(self.page[0])
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def encode_position(self, row):
+        if isinstance(row, dict):
+            values = [row[field] for field in KEYSET_FIELDS]
+        else:
+            values = [getattr(row, field) for field in KEYSET_FIELDS]
+        return '|'.join(value.isoformat() if hasattr(value, 'isoformat') else str(value) for value in values)
+
+    def keyset_filter(self, position, reverse):
+        """Rows strictly after ``position`` in the (reversed) page order"""
+        try:
+            raw_date, raw_created_at, raw_id = position.split('|')
+            row_date = date.fromisoformat(raw_date)
+            created_at = parse_datetime(raw_created_at)
+            row_id = int(raw_id)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+
+        op = 'gt' if reverse else 'lt'
+        # The leading bound on date alone keeps this a range scan of the index
+        return Q(**{f'date__{op}e': row_date}) & (
+            Q(**{f'date__{op}': row_date})
+            | Q(date=row_date, **{f'created_at__{op}': created_at})
+            | Q(date=row_date, created_at=created_at, **{f'id__{op}': row_id})
+        )
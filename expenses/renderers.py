@@ -0,0 +1,102 @@
+"""
+Renderers for API responses and transaction exports.
+
+``FastJSONRenderer`` is the default JSON renderer: it produces the same bytes
+as DRF's ``JSONRenderer`` through orjson when that is installed.
+
+The export renderers can, besides the usual ``render()``, ``stream()`` an
+iterable of row dicts chunk by chunk, which is what /transactions/export/
+hands to a ``StreamingHttpResponse`` so memory stays flat whatever the row
+count.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """``JSONRenderer`` output, encoded with orjson when it is available.
+
+    Types orjson doesn't encode the way DRF does (datetimes, decimals, lazy
+    strings, ...) go through DRF's encoder, and anything orjson rejects falls
+    back to the stock renderer. Floats are the one difference: values of
+    1e16 and above or below 1e-4 are spelled ``1e16`` rather than ``1e+16``
+    (same number), and non-finite floats render as null instead of raising.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.default = self.encoder_class().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact or not self.strict \
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same escaping as JSONRenderer, so the output stays a JavaScript subset
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+        return ret
+
+
+# Spreadsheet apps evaluate cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class _Line:
+    """File-like object handing back whatever csv.writer writes"""
+
+    def write(self, value):
+        return value
+
+
+class StreamingRenderer(BaseRenderer):
+    charset = 'utf-8'
+
+    def stream(self, rows, fields):
+        raise NotImplementedError
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict):
+            data = [data]
+        fields = list(data[0]) if data else []
+        return ''.join(self.stream(data, fields)).encode(self.charset)
+
+
+class CSVRenderer(StreamingRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows, fields):
+        writer = csv.writer(_Line())
+        yield writer.writerow(fields)
+        for row in rows:
+            yield writer.writerow([self.cell(row.get(field)) for field in fields])
+
+    def cell(self, value):
+        if value is None:
+            return ''
+        if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+            return "'" + value
+        return value
+
+
+class NDJSONRenderer(StreamingRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def stream(self, rows, fields):
+        for row in rows:
+            yield json.dumps({field: row.get(field) for field in fields}, cls=DjangoJSONEncoder) + '\n'
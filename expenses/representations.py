@@ -0,0 +1,121 @@
+"""
+Fast read path for transaction lists.
+
+``ValuesMapper`` inspects a read serializer once and compiles its fields into
+a flat plan of ``.values()`` columns and converters. List endpoints then turn
+``values()`` rows straight into the dicts the serializer would have built,
+without model instances or DRF's per-field ``get_attribute`` machinery.
+Serializers themselves stay on the write paths.
+
+The output matches the serializer's key for key: a dotted source such as
+``category.name`` is left out when the relation is null, exactly like the
+read-only serializer field it mirrors.
+"""
+from decimal import Decimal
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import fields, relations
+from rest_framework.settings import api_settings
+
+
+def _decimal(field):
+    if not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING) or field.localize \
+            or field.decimal_places is None:
+        return field.to_representation
+    exponent = Decimal('.1') ** field.decimal_places
+
+    def convert(value):
+        if not isinstance(value, Decimal):
+            return field.to_representation(value)
+        return '{:f}'.format(value.quantize(exponent, rounding=field.rounding))
+    return convert
+
+
+def _datetime(field):
+    if getattr(field, 'format', api_settings.DATETIME_FORMAT) != fields.ISO_8601:
+        return field.to_representation
+
+    def convert(value):
+        value = field.enforce_timezone(value).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def _date(field):
+    if getattr(field, 'format', api_settings.DATE_FORMAT) != fields.ISO_8601:
+        return field.to_representation
+    return lambda value: value.isoformat()
+
+
+class ValuesMapper:
+    """Maps ``values()`` rows to the representation of ``serializer_class``"""
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._plan = None
+
+    @property
+    def plan(self):
+        # Compiled lazily: serializer fields need the app registry
+        if self._plan is None:
+            self._plan = self.compile()
+        return self._plan
+
+    @property
+    def columns(self):
+        return self.plan[0]
+
+    def compile(self):
+        model = self.serializer_class.Meta.model
+        columns, steps = [], []
+
+        def column(name):
+            if name not in columns:
+                columns.append(name)
+            return name
+
+        for key, field in self.serializer_class().fields.items():
+            if field.write_only:
+                continue
+            source, guard, convert = field.source, None, None
+            if '.' in source:
+                relation, _, attribute = source.partition('.')
+                guard = column(relation)
+                source = f'{relation}__{attribute}'
+            elif source.startswith('get_') and source.endswith('_display'):
+                choices = dict(model._meta.get_field(source[4:-8]).flatchoices)
+                source = source[4:-8]
+                convert = lambda value, choices=choices: str(choices.get(value, value))
+
+            if isinstance(field, (fields.SerializerMethodField, fields.HiddenField)) or source == '*' \
+                    or hasattr(field, 'child') or hasattr(field, 'fields') \
+                    or (isinstance(field, relations.RelatedField) and not isinstance(field, relations.PrimaryKeyRelatedField)):
+                raise ImproperlyConfigured(
+                    f'{self.serializer_class.__name__}.{key} can not be mapped from values() rows'
+                )
+            if isinstance(field, fields.DecimalField):
+                convert = _decimal(field)
+            elif isinstance(field, fields.DateTimeField):
+                convert = _datetime(field)
+            elif isinstance(field, fields.DateField):
+                convert = _date(field)
+            steps.append((key, column(source), convert, guard))
+        return columns, steps
+
+    def values(self, queryset):
+        return queryset.values(*self.columns)
+
+    def map(self, rows):
+        steps = self.plan[1]
+        mapped = []
+        for row in rows:
+            item = {}
+            for key, source, convert, guard in steps:
+                if guard is not None and row[guard] is None:
+                    continue
+                value = row[source]
+                item[key] = convert(value) if convert is not None and value is not None else value
+            mapped.append(item)
+        return mapped
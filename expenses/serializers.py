@@ -1,37 +1,20 @@
 from rest_framework import serializers
+from tracker.uniqueness import UniqueViolationMixin
 from .models import Category, Account, Transaction
 
-class CategorySerializer(serializers.ModelSerializer):
-   transaction_count = serializers.SerializerMethodField()
-   total_spent = serializers.SerializerMethodField()
+class CategorySerializer(UniqueViolationMixin, serializers.ModelSerializer):
+   # Stored counters maintained by expenses.ledger
+   total_spent = serializers.FloatField(source='total_expense', read_only=True)
 
    class Meta:
        model = Category
        fields = ['id', 'name', 'description', 'color', 'transaction_count', 'total_spent', 'created_at', 'updated_at']
        read_only_fields = ['created_at', 'updated_at']
 
-   def get_transaction_count(self, obj):
-       return obj.transactions.count()
+   # Enforced by the (user, name) constraint
+   unique_messages = {'name': "You already have a category with this name."}
 
-   def get_total_spent(self, obj):
-       from django.db.models import Sum
-       total = obj.transactions.filter(transaction_type='expense').aggregate(Sum('amount'))['amount__sum']
-       return float(total) if total else 0.0
-
-   def validate_name(self, value):
-       user = self.context['request'].user
-       qs = Category.objects.filter(user=user, name=value)
-
-       if self.instance:
-           qs = qs.exclude(pk=self.instance.pk)
-
-       if qs.exists():
-           raise serializers.ValidationError("You already have a category with this name.")
-
-       return value
-
-class AccountSerializer(serializers.ModelSerializer):
-   transaction_count = serializers.SerializerMethodField()
+class AccountSerializer(UniqueViolationMixin, serializers.ModelSerializer):
    account_type_display = serializers.CharField(source='get_account_type_display', read_only=True)
 
    class Meta:
@@ -42,20 +25,8 @@ class AccountSerializer(serializers.ModelSerializer):
        ]
        read_only_fields = ['balance', 'created_at', 'updated_at']
 
-   def get_transaction_count(self, obj):
-       return obj.transactions.count()
-
-   def validate_name(self, value):
-       user = self.context['request'].user
-       qs = Account.objects.filter(user=user, name=value)
-
-       if self.instance:
-           qs = qs.exclude(pk=self.instance.pk)
-
-       if qs.exists():
-           raise serializers.ValidationError("You already have an account with this name.")
-
-       return value
+   # Enforced by the (user, name) constraint
+   unique_messages = {'name': "You already have an account with this name."}
 
 class TransactionSerializer(serializers.ModelSerializer):
    account_name = serializers.CharField(source='account.name', read_only=True)
@@ -78,11 +49,48 @@ class TransactionSerializer(serializers.ModelSerializer):
        return value
 
    def validate_account(self, value):
-       if value.user != self.context['request'].user:
+       if value.user_id != self.context['request'].user.pk:
            raise serializers.ValidationError("You can only create transactions for your own accounts.")
        return value
 
    def validate_category(self, value):
-       if value and value.user != self.context['request'].user:
+       if value and value.user_id != self.context['request'].user.pk:
            raise serializers.ValidationError("You can only use your own categories.")
        return value
+
+class StatementLineSerializer(TransactionSerializer):
+   running_balance = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+
+   class Meta(TransactionSerializer.Meta):
+       fields = TransactionSerializer.Meta.fields + ['running_balance']
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+   """Resolves primary keys from a ``{pk: instance}`` map in the serializer context.
+
+   Falls back to a query per value when the map isn't provided.
+   """
+
+   def __init__(self, context_key, **kwargs):
+       self.context_key = context_key
+       super().__init__(**kwargs)
+
+   def to_internal_value(self, data):
+       instances = self.context.get(self.context_key)
+       if instances is None:
+           return super().to_internal_value(data)
+       if isinstance(data, bool):
+           self.fail('incorrect_type', data_type=type(data).__name__)
+       try:
+           pk = int(data)
+       except (TypeError, ValueError):
+           self.fail('incorrect_type', data_type=type(data).__name__)
+       if pk not in instances:
+           self.fail('does_not_exist', pk_value=data)
+       return instances[pk]
+
+class BulkTransactionSerializer(TransactionSerializer):
+   """TransactionSerializer for batches: accounts and categories are looked up once per batch"""
+   account = PrefetchedPrimaryKeyRelatedField('accounts', queryset=Account.objects.all())
+   category = PrefetchedPrimaryKeyRelatedField(
+       'categories', queryset=Category.objects.all(), allow_null=True, required=False
+   )
@@ -1,17 +1,64 @@
-from django.db.models.signals import post_save, post_delete
+from django.conf import settings
+from django.db import connection
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
-from .models import Transaction, Account
+from .models import Category, DataVersion, Transaction
+from . import ledger
+
+@receiver(pre_save, sender=Transaction)
+def remember_stored_transaction(sender, instance, **kwargs):
+    """Snapshot the stored row so post_save only applies the difference"""
+    instance._ledger_previous = None
+    if ledger.is_suspended() or instance._state.adding or instance.pk is None:
+        return
+    previous = sender.objects.filter(pk=instance.pk).only(*ledger.SNAPSHOT_FIELDS)
+    if connection.in_atomic_block:
+        # Lock the row so a concurrent update can't apply the same old state twice
+        previous = previous.select_for_update()
+    instance._ledger_previous = previous.first()
 
 @receiver(post_save, sender=Transaction)
 def update_account_balance_on_transaction_save(sender, instance, **kwargs):
-    """Update account balance when transaction is saved"""
-    account = instance.account
-    account.balance = account.calculate_balance()
-    account.save(update_fields=['balance'])
+    """Apply the balance change of a created or updated transaction"""
+    if ledger.is_suspended():
+        return
+    entries = [ledger.entry_for(instance)]
+    previous = getattr(instance, '_ledger_previous', None)
+    if previous is not None:
+        entries.append(ledger.entry_for(previous, reverse=True))
+    instance._ledger_previous = None
+    ledger.apply(entries)
+
+@receiver(pre_delete, sender=Transaction)
+def remember_deleted_transaction(sender, instance, **kwargs):
+    """Snapshot the stored row so post_delete reverses it, not a stale instance"""
+    instance._ledger_previous = None
+    if ledger.is_suspended() or instance.pk is None:
+        return
+    # Deletes run in an atomic block; the lock keeps a concurrent update or
+    # delete of the row from being reversed along with this one
+    instance._ledger_previous = (
+        sender.objects.filter(pk=instance.pk).only(*ledger.SNAPSHOT_FIELDS).select_for_update().first()
+    )
 
 @receiver(post_delete, sender=Transaction)
 def update_account_balance_on_transaction_delete(sender, instance, **kwargs):
-    """Update account balance when transaction is deleted"""
-    account = instance.account
-    account.balance = account.calculate_balance()
-    account.save(update_fields=['balance'])
+    """Reverse the balance change of a deleted transaction"""
+    if ledger.is_suspended():
+        return
+    previous = getattr(instance, '_ledger_previous', None)
+    instance._ledger_previous = None
+    # No stored row: it was already deleted, and its change already reversed
+    if previous is not None:
+        ledger.apply([ledger.entry_for(previous, reverse=True)])
+
+@receiver(pre_delete, sender=Category)
+def merge_rollups_of_deleted_category(sender, instance, **kwargs):
+    """Keep one uncategorized rollup bucket per day when SET_NULL uncategorizes this one's"""
+    ledger.merge_category_rollups(instance)
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def create_data_version(sender, instance, created, **kwargs):
+    """Every user gets the row expenses.caching bumps on their writes"""
+    if created:
+        DataVersion.objects.create(user=instance, changed_at=instance.date_joined)
@@ -1,3 +1,1363 @@
-from django.test import TestCase
+import json
+import os
+import sys
+import tempfile
+import types
+from io import StringIO
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+
+from .models import Account, Category, DailyRollup, Transaction
+from . import caching, columnar, ledger
+from .aggregates import rollup_totals
+from .analytics import build_insights, build_spending_data
+from .pagination import TransactionCursorPagination
+
+User = get_user_model()
+
+
+class LedgerTestMixin:
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='alice', email='alice@example.com', password='pass12345',
+            first_name='Alice', last_name='Smith',
+        )
+        self.account = Account.objects.create(user=self.user, name='Checking', account_type='checking')
+        self.category = Category.objects.create(user=self.user, name='Food')
+
+    def add(self, amount, transaction_type='expense', account=None, **kwargs):
+        kwargs.setdefault('date', date(2025, 1, 15))
+        kwargs.setdefault('description', 'test')
+        return Transaction.objects.create(
+            user=self.user, account=account or self.account, category=kwargs.pop('category', self.category),
+            transaction_type=transaction_type, amount=Decimal(amount), **kwargs,
+        )
+
+    def assertBalance(self, account, expected):
+        account.refresh_from_db()
+        self.assertEqual(account.balance, Decimal(expected))
+        self.assertEqual(account.balance, Decimal(str(account.calculate_balance())).quantize(Decimal('0.01')))
+
+
+class IncrementalBalanceTests(LedgerTestMixin, TestCase):
+    def test_create_applies_signed_amount(self):
+        self.add('100.00', 'income')
+        self.add('30.50', 'expense')
+        self.add('10.00', 'transfer')
+        self.assertBalance(self.account, '59.50')
+
+    def test_update_applies_difference(self):
+        txn = self.add('40.00', 'expense')
+        txn.amount = Decimal('25.00')
+        txn.save()
+        self.assertBalance(self.account, '-25.00')
+
+        txn.transaction_type = 'income'
+        txn.save()
+        self.assertBalance(self.account, '25.00')
+
+    def test_moving_between_accounts(self):
+        savings = Account.objects.create(user=self.user, name='Savings', account_type='savings')
+        txn = self.add('70.00', 'income')
+        txn.account = savings
+        txn.save()
+        self.assertBalance(self.account, '0.00')
+        self.assertBalance(savings, '70.00')
+
+    def test_delete_reverses_amount(self):
+        self.add('100.00', 'income')
+        txn = self.add('60.00', 'expense')
+        txn.delete()
+        self.assertBalance(self.account, '100.00')
+
+    def test_write_does_not_aggregate_history(self):
+        for _ in range(5):
+            self.add('1.00', 'expense')
+        # INSERT + account, category, rollup, running balance and data version
+        # UPDATEs, regardless of history size
+        with self.assertNumQueries(7):
+            self.add('1.00', 'expense')
+
+    def test_account_save_does_not_overwrite_balance(self):
+        stale = Account.objects.get(pk=self.account.pk)
+        self.add('15.00', 'income')
+        stale.name = 'Everyday'
+        stale.save()
+        self.assertBalance(self.account, '15.00')
+
+    @override_settings(VERIFY_INCREMENTAL_BALANCES=True)
+    def test_verification_repairs_drift(self):
+        self.add('10.00', 'income')
+        Account.objects.filter(pk=self.account.pk).update(balance=Decimal('999.00'))
+        with self.assertLogs('expenses.ledger', level='ERROR'):
+            self.add('5.00', 'income')
+        self.assertBalance(self.account, '15.00')
+
+    def test_verify_balance_reports_drift_without_repair(self):
+        self.add('10.00', 'income')
+        Account.objects.filter(pk=self.account.pk).update(balance=Decimal('12.00'))
+        with self.assertLogs('expenses.ledger', level='ERROR'):
+            drift = ledger.verify_balance(self.account.pk, repair=False)
+        self.assertEqual(drift, Decimal('2.00'))
+
+
+class APITestMixin(LedgerTestMixin):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class SummaryTests(APITestMixin, TestCase):
+    def test_summary_is_a_single_query(self):
+        self.add('100.00', 'income')
+        self.add('30.00', 'expense')
+        self.add('20.00', 'transfer')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/transactions/summary/')
+        self.assertEqual(response.json(), {
+            'total_income': 100.0,
+            'total_expenses': 50.0,
+            'net_amount': 50.0,
+            'transaction_count': 3,
+            'income_count': 1,
+            'expense_count': 1,
+            'transfer_count': 1,
+        })
+
+    def test_summary_honours_filters(self):
+        other = Category.objects.create(user=self.user, name='Rent')
+        self.add('30.00', 'expense', date=date(2025, 1, 1))
+        self.add('40.00', 'expense', date=date(2025, 2, 1))
+        self.add('500.00', 'expense', category=other, date=date(2025, 2, 1))
+
+        response = self.client.get('/api/transactions/summary/', {
+            'category': self.category.pk, 'start_date': '2025-01-15',
+        })
+        self.assertEqual(response.json()['total_expenses'], 40.0)
+        self.assertEqual(response.json()['expense_count'], 1)
+
+    def test_empty_summary(self):
+        response = self.client.get('/api/transactions/summary/', {'transaction_type': 'income'})
+        self.assertEqual(response.json()['net_amount'], 0.0)
+        self.assertEqual(response.json()['transaction_count'], 0)
+
+
+class QueryCountRegressionTests(APITestMixin, TestCase):
+    """List endpoints must cost the same number of queries whatever the row count"""
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def grow(self, rows):
+        # Names are unique per user
+        start = Account.objects.count()
+        for i in range(start, start + rows):
+            account = Account.objects.create(user=self.user, name=f'Account {i}', account_type='cash')
+            category = Category.objects.create(user=self.user, name=f'Category {i}')
+            self.add('5.00', 'expense', account=account, category=category)
+            self.add('7.00', 'income', account=account, category=None)
+
+    def assertConstantQueries(self, url):
+        self.grow(1)
+        baseline = self.count_queries(url)
+        self.grow(10)
+        self.assertEqual(self.count_queries(url), baseline)
+
+    def test_category_list(self):
+        self.assertConstantQueries('/api/categories/')
+
+    def test_account_list(self):
+        self.assertConstantQueries('/api/accounts/')
+
+    def test_transaction_list(self):
+        self.assertConstantQueries('/api/transactions/')
+
+    def test_nested_transactions(self):
+        urls = [
+            f'/api/accounts/{self.account.pk}/transactions/',
+            f'/api/categories/{self.category.pk}/transactions/',
+        ]
+        self.add('1.00')
+        baseline = [self.count_queries(url) for url in urls]
+        for i in range(10):
+            account = Account.objects.create(user=self.user, name=f'Account {i}', account_type='cash')
+            self.add('1.00', account=account)
+            self.add('2.00', category=Category.objects.create(user=self.user, name=f'Category {i}'))
+        self.assertEqual([self.count_queries(url) for url in urls], baseline)
+
+    def test_annotated_values_match_fallback(self):
+        self.add('12.50', 'expense')
+        self.add('99.00', 'income')
+        category = self.client.get(f'/api/categories/{self.category.pk}/').json()
+        self.assertEqual(category['transaction_count'], 2)
+        self.assertEqual(category['total_spent'], 12.5)
+        account = self.client.get('/api/accounts/').json()[0]
+        self.assertEqual(account['transaction_count'], 2)
+
+        created = self.client.post('/api/categories/', {'name': 'Travel'}).json()
+        self.assertEqual(created['transaction_count'], 0)
+        self.assertEqual(created['total_spent'], 0.0)
+
+
+class UniqueNameTests(APITestMixin, TestCase):
+    """Duplicate names are caught by the (user, name) constraints, not a lookup per write"""
+
+    def test_duplicate_category_name(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/categories/', {'name': 'Food'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'name': ['You already have a category with this name.']})
+        self.assertFalse([query for query in ctx.captured_queries if query['sql'].startswith('SELECT')])
+
+    def test_duplicate_account_name_on_rename(self):
+        other = Account.objects.create(user=self.user, name='Savings', account_type='savings')
+        response = self.client.patch(f'/api/accounts/{other.pk}/', {'name': 'Checking'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'name': ['You already have an account with this name.']})
+        self.assertEqual(self.client.patch(f'/api/accounts/{other.pk}/', {'name': 'Savings'}).status_code, 200)
+
+    def test_names_are_unique_per_user(self):
+        bob = User.objects.create_user(
+            username='bob', email='bob@example.com', password='pass12345', first_name='Bob', last_name='Jones',
+        )
+        self.client.force_authenticate(bob)
+        self.assertEqual(self.client.post('/api/categories/', {'name': 'Food'}).status_code, 201)
+
+
+class KeysetPaginationTests(APITestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # Plenty of ties on date so pages have to split inside a day
+        for day in (3, 3, 3, 2, 2, 1, 1, 1):
+            self.add('1.00', date=date(2025, 1, day))
+        self.expected = list(
+            Transaction.objects.order_by('-date', '-created_at', '-id').values_list('id', flat=True)
+        )
+
+    def walk(self, url, key='next'):
+        ids, pages = [], 0
+        while url:
+            body = self.client.get(url).json()
+            ids.extend(row['id'] for row in body['results'])
+            url, pages = body[key], pages + 1
+        return ids, pages, body
+
+    def test_forward_walk_visits_every_row_once(self):
+        ids, pages, last = self.walk('/api/transactions/?page_size=3')
+        self.assertEqual(ids, self.expected)
+        self.assertEqual(pages, 3)
+        self.assertIsNotNone(last['previous'])
+
+    def test_backward_walk(self):
+        body = self.client.get('/api/transactions/?page_size=3').json()
+        body = self.client.get(body['next']).json()
+        body = self.client.get(body['next']).json()
+        self.assertEqual([row['id'] for row in body['results']], self.expected[6:])
+
+        previous = self.client.get(body['previous']).json()
+        self.assertEqual([row['id'] for row in previous['results']], self.expected[3:6])
+        first = self.client.get(previous['previous']).json()
+        self.assertEqual([row['id'] for row in first['results']], self.expected[:3])
+        self.assertIsNone(first['previous'])
+
+    def test_deep_pages_use_no_offset(self):
+        body = self.client.get('/api/transactions/?page_size=2').json()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(body['next'])
+        sql = ctx.captured_queries[-1]['sql']
+        self.assertIn('LIMIT 3', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_page_size_is_capped(self):
+        with mock.patch.object(TransactionCursorPagination, 'max_page_size', 2):
+            body = self.client.get('/api/transactions/?page_size=100000').json()
+        self.assertEqual(len(body['results']), 2)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/transactions/?cursor=cD1nYXJiYWdl')
+        self.assertEqual(response.status_code, 404)
+
+    def test_nested_actions_are_paginated(self):
+        body = self.client.get(f'/api/accounts/{self.account.pk}/transactions/?page_size=5').json()
+        self.assertEqual([row['id'] for row in body['results']], self.expected[:5])
+        self.assertIsNotNone(body['next'])
+
+
+class IndexUsageTests(LedgerTestMixin, TestCase):
+    """EXPLAIN the hot query shapes and check the planner picks the composite indexes"""
+
+    def setUp(self):
+        super().setUp()
+        for day in range(1, 29):
+            self.add('3.00', 'expense', date=date(2025, 2, day))
+            self.add('9.00', 'income', date=date(2025, 2, day))
+
+    def assertUsesIndex(self, queryset, index_name):
+        if connection.vendor == 'postgresql':
+            # Tiny test tables always favour a sequential scan; take it off the table
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        elif connection.vendor != 'sqlite':
+            self.skipTest(f'no EXPLAIN expectations for {connection.vendor}')
+        self.assertIn(index_name, queryset.explain())
+
+    def test_transaction_list(self):
+        queryset = Transaction.objects.filter(user=self.user).order_by('-date', '-created_at', '-id')[:51]
+        self.assertUsesIndex(queryset, 'txn_user_date_idx')
+
+    def test_account_transaction_list(self):
+        queryset = Transaction.objects.filter(account=self.account).order_by('-date', '-created_at', '-id')[:51]
+        self.assertUsesIndex(queryset, 'txn_account_date_idx')
+
+    def test_account_balance_by_type(self):
+        queryset = Transaction.objects.filter(account=self.account, transaction_type='income').values('amount')
+        self.assertUsesIndex(queryset, 'txn_account_type_idx')
+
+    def test_analytics_window(self):
+        queryset = Transaction.objects.filter(
+            user=self.user, transaction_type='expense', date__gte=date(2025, 2, 10),
+        ).values('amount')
+        self.assertUsesIndex(queryset, 'txn_user_type_date_idx')
+
+
+class DailyRollupTests(APITestMixin, TestCase):
+    def buckets(self):
+        return {
+            (r.account_id, r.category_id, r.transaction_type, r.date): (r.total, r.transaction_count)
+            for r in DailyRollup.objects.filter(user=self.user)
+            if r.transaction_count
+        }
+
+    def expected_buckets(self):
+        expected = {}
+        for txn in Transaction.objects.filter(user=self.user):
+            key = (txn.account_id, txn.category_id, txn.transaction_type, txn.date)
+            total, count = expected.get(key, (Decimal('0'), 0))
+            expected[key] = (total + txn.amount, count + 1)
+        return expected
+
+    def test_rollups_follow_every_write(self):
+        savings = Account.objects.create(user=self.user, name='Savings', account_type='savings')
+        first = self.add('10.00')
+        self.add('5.00')
+        moved = self.add('7.00', 'income', date=date(2025, 1, 16))
+        self.assertEqual(self.buckets(), self.expected_buckets())
+
+        moved.account = savings
+        moved.category = None
+        moved.date = date(2025, 1, 20)
+        moved.save()
+        first.amount = Decimal('12.00')
+        first.save()
+        self.assertEqual(self.buckets(), self.expected_buckets())
+
+        first.delete()
+        self.assertEqual(self.buckets(), self.expected_buckets())
+
+    def test_deleting_account_cascades_cleanly(self):
+        self.add('10.00')
+        self.account.delete()
+        self.assertFalse(DailyRollup.objects.exists())
+
+    def test_deleting_category_merges_into_uncategorized_bucket(self):
+        doomed = Category.objects.create(user=self.user, name='Doomed')
+        self.add('10.00', category=doomed)
+        self.add('5.00', category=None)
+        with self.captureOnCommitCallbacks(execute=True):
+            doomed.delete()
+        self.add('1.00', category=None)
+        self.assertEqual(self.buckets(), self.expected_buckets())
+        self.assertEqual(DailyRollup.objects.filter(user=self.user, category__isnull=True).count(), 1)
+        totals = rollup_totals(DailyRollup.objects.filter(user=self.user))
+        self.assertEqual(totals['transaction_count'], 3)
+        self.assertEqual(totals['expense_total'], Decimal('16.00'))
+
+    def test_deleting_category_invalidates_cached_analytics(self):
+        self.add('10.00')
+        version = caching.data_version(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.delete()
+        self.assertNotEqual(caching.data_version(self.user.pk), version)
+
+    def test_rebuild_command_matches_incremental_state(self):
+        self.add('10.00')
+        self.add('3.00', 'transfer')
+        incremental = self.buckets()
+        DailyRollup.objects.update(total=0)
+        call_command('rebuild_rollups', stdout=open(os.devnull, 'w'))
+        self.assertEqual(self.buckets(), incremental)
+
+    def test_summary_reads_rollups(self):
+        self.add('10.00')
+        self.add('10.00')
+        with CaptureQueriesContext(connection) as ctx:
+            body = self.client.get('/api/transactions/summary/', {'account': self.account.pk}).json()
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn('expenses_dailyrollup', ctx.captured_queries[0]['sql'])
+        self.assertEqual(body['total_expenses'], 20.0)
+        self.assertEqual(body['expense_count'], 2)
+
+
+class InsightsTestMixin(APITestMixin):
+    def get_insights(self, **params):
+        # ai_insights refuses to run without the Gemini SDK and key, neither of
+        # which the calculation itself needs.
+        google = types.ModuleType('google')
+        google.generativeai = types.ModuleType('google.generativeai')
+        modules = {'google': google, 'google.generativeai': google.generativeai}
+        with mock.patch.dict(sys.modules, modules), mock.patch('expenses.views.config', return_value='key'):
+            return self.client.get('/api/transactions/ai_insights/', params)
+
+
+class InsightQueryTests(InsightsTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        today = timezone.now().date()
+        rent = Category.objects.create(user=self.user, name='Rent')
+        self.add('3000.00', 'income', date=today)
+        self.add('1200.00', 'expense', category=rent, date=today - timedelta(days=3))
+        self.add('40.00', 'expense', date=today - timedelta(days=10))
+        self.add('15.00', 'expense', category=None, date=today - timedelta(days=12))
+        self.add('50.00', 'transfer', date=today - timedelta(days=2))
+        self.add('900.00', 'expense', date=today - timedelta(days=45))
+        self.add('2500.00', 'income', date=today - timedelta(days=45))
+
+    def test_metrics(self):
+        data = self.get_insights().json()['spending_data']
+        self.assertEqual(data['current_month'], {'income': 3000.0, 'expenses': 1305.0, 'balance': 1695.0})
+        self.assertEqual(data['previous_month'], {'income': 2500.0, 'expenses': 900.0, 'balance': 1600.0})
+        self.assertEqual(data['top_categories'], [
+            {'category': 'Rent', 'amount': 1200.0},
+            {'category': 'Food', 'amount': 40.0},
+            {'category': 'Uncategorized', 'amount': 15.0},
+        ])
+        self.assertEqual(data['analytics'], {
+            'weekly_burn_rate': 1250.0,
+            'avg_expense': 1255.0 / 3,
+            'expense_count': 3,
+            'income_count': 1,
+            'unique_categories': 3,
+            'largest_expense': 1200.0,
+            'large_expenses': 1200.0,
+            'small_expenses': 55.0,
+        })
+
+    @override_settings(INSIGHTS_ENGINE='sql')
+    def test_fixed_number_of_queries(self):
+        # Data version + metrics
+        with self.assertNumQueries(4):
+            response = self.get_insights()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['insights'])
+        self.assertNotIn('history', response.json()['spending_data'])
+
+
+@skipUnless(columnar.np, 'NumPy is not installed')
+@override_settings(INSIGHTS_ENGINE='columnar')
+class ColumnarInsightTests(InsightQueryTests):
+    """Runs test_metrics against the columnar engine, which must agree with SQL"""
+
+    def test_fixed_number_of_queries(self):
+        with self.assertNumQueries(3):
+            response = self.get_insights()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('history', response.json()['spending_data'])
+
+    def test_history_metrics(self):
+        today = timezone.now().date()
+        history = self.get_insights().json()['spending_data']['history']
+        self.assertEqual(history['first_date'], (today - timedelta(days=45)).isoformat())
+        self.assertEqual(history['burn_rates']['last_7_days'], 1250.0)
+        self.assertEqual(history['burn_rates']['last_90_days'], 2205.0)
+        self.assertEqual(len(history['monthly']), columnar.HISTORY_MONTHS)
+        self.assertEqual(history['monthly'][-1]['month'], today.strftime('%Y-%m'))
+        self.assertEqual(sum(month['expenses'] for month in history['monthly']), 2205.0)
+        self.assertEqual(history['expense_percentiles']['p50'], 470.0)
+        self.assertIsNone(history['outliers']['threshold'])
+
+    def test_weekend_pattern_and_outliers(self):
+        Transaction.objects.all().delete()
+        today = date(2025, 3, 31)  # a Monday
+        for offset in range(60):
+            day = today - timedelta(days=offset)
+            self.add('90.00' if day.weekday() >= 5 else '10.00', date=day)
+        self.add('5000.00', date=today - timedelta(days=1))
+        self.add('8000.00', 'income', date=today)
+        data = columnar.build_spending_data(Transaction.objects.filter(user=self.user), today)
+        pattern = data['history']['weekly_pattern']
+        days = [today - timedelta(days=offset) for offset in range(columnar.PATTERN_DAYS)]
+        weekend_days = sum(day.weekday() >= 5 for day in days)
+        spent_weekends = sum(day.weekday() >= 5 for day in days[:60])
+        self.assertEqual(pattern['weekend_per_day'], (spent_weekends * 90 + 5000) / weekend_days)
+        self.assertEqual(pattern['weekday_per_day'], (60 - spent_weekends) * 10 / (len(days) - weekend_days))
+        self.assertEqual(data['history']['outliers']['count'], 1)
+        self.assertEqual(data['history']['outliers']['total'], 5000.0)
+
+        titles = [insight['title'] for insight in build_insights(data)]
+        self.assertIn('🗓️ Weekend Spending Spike', titles)
+        self.assertIn('🚩 Unusual Expenses', titles)
+
+    def test_decade_of_history_matches_sql(self):
+        start = date(2016, 1, 1)
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=self.user, account=self.account, category=self.category if number % 4 else None,
+                transaction_type=('income', 'expense', 'expense', 'transfer')[number % 4],
+                amount=Decimal(number % 997) + Decimal('0.25'), description='', date=start + timedelta(days=number),
+            )
+            for number in range(3650)
+        ])
+        ledger.rebuild_rollups(self.user)
+        today = start + timedelta(days=3649)
+        transactions = Transaction.objects.filter(user=self.user)
+        columnar_data = columnar.build_spending_data(transactions, today)
+        sql_data = build_spending_data(transactions, DailyRollup.objects.filter(user=self.user), today)
+        self.assertEqual(columnar_data.pop('history')['first_date'], '2016-01-02')  # day 0 is income
+        self.assertEqual(columnar_data, sql_data)
+
+
+class InsightsCacheTests(InsightsTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.add('100.00', 'income', date=timezone.now().date())
+
+    def test_second_visit_is_served_from_cache(self):
+        first = self.get_insights()
+        self.assertEqual(first['X-Cache'], 'MISS')
+        # Only the data version is read
+        with self.assertNumQueries(1):
+            second = self.get_insights()
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_conditional_request_returns_304(self):
+        first = self.get_insights()
+        self.client.credentials(HTTP_IF_NONE_MATCH=first['ETag'])
+        response = self.get_insights()
+        self.assertEqual(response.status_code, 304)
+        self.client.credentials(HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(self.get_insights().status_code, 304)
+
+    def test_transaction_writes_invalidate(self):
+        first = self.get_insights()
+        with self.captureOnCommitCallbacks(execute=True):
+            txn = self.add('40.00', date=timezone.now().date())
+        second = self.get_insights()
+        self.assertEqual(second['X-Cache'], 'MISS')
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.json()['spending_data']['current_month']['expenses'], 40.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            txn.delete()
+        self.client.credentials(HTTP_IF_NONE_MATCH=second['ETag'])
+        self.assertEqual(self.get_insights().status_code, 200)
+
+    def test_writes_elsewhere_invalidate(self):
+        # Management commands (and other workers) share only the database
+        first = self.get_insights()
+        ledger.rebuild_rollups(self.user)
+        self.client.credentials(HTTP_IF_NONE_MATCH=first['ETag'])
+        response = self.get_insights()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_query_parameters_are_part_of_the_key(self):
+        self.get_insights()
+        self.assertEqual(self.get_insights(account=self.account.pk)['X-Cache'], 'MISS')
+
+    def test_stats_are_admin_only(self):
+        self.assertEqual(self.client.get('/api/transactions/cache_stats/').status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        self.get_insights()
+        self.get_insights()
+        stats = self.client.get('/api/transactions/cache_stats/').json()
+        self.assertGreaterEqual(stats['hits'], 1)
+        self.assertGreaterEqual(stats['misses'], 1)
+
+
+class TimeseriesTests(APITestMixin, TestCase):
+    def get(self, **params):
+        return self.client.get('/api/transactions/timeseries/', params)
+
+    def test_monthly_buckets_fill_gaps(self):
+        self.add('30.00', date=date(2025, 1, 5))
+        self.add('20.00', date=date(2025, 1, 20))
+        self.add('100.00', 'income', date=date(2025, 3, 2))
+        with self.assertNumQueries(2):
+            response = self.get(bucket='month')
+        self.assertEqual(response.json(), {
+            'bucket': 'month',
+            'group_by': 'type',
+            'start': '2025-01-01',
+            'end': '2025-03-01',
+            'buckets': ['2025-01-01', '2025-02-01', '2025-03-01'],
+            'series': [
+                {'key': 'expense', 'label': 'Expense', 'totals': [50.0, 0.0, 0.0], 'counts': [2, 0, 0]},
+                {'key': 'income', 'label': 'Income', 'totals': [0.0, 0.0, 100.0], 'counts': [0, 0, 1]},
+            ],
+        })
+
+    def test_weekly_buckets_by_category_within_range(self):
+        rent = Category.objects.create(user=self.user, name='Rent')
+        self.add('10.00', date=date(2025, 1, 8))  # Wednesday
+        self.add('15.00', date=date(2025, 1, 12))  # Sunday, same week
+        self.add('500.00', category=rent, date=date(2025, 1, 13))
+        self.add('99.00', date=date(2025, 2, 1))  # outside the range
+
+        body = self.get(bucket='week', group_by='category', start_date='2025-01-01', end_date='2025-01-20').json()
+        self.assertEqual(body['buckets'], ['2024-12-30', '2025-01-06', '2025-01-13', '2025-01-20'])
+        food, rent_series = body['series']
+        self.assertEqual(food['label'], 'Food')
+        self.assertEqual(food['totals'], [0.0, 25.0, 0.0, 0.0])
+        self.assertEqual(rent_series['totals'], [0.0, 0.0, 500.0, 0.0])
+
+    def test_group_by_account_honours_filters(self):
+        savings = Account.objects.create(user=self.user, name='Savings', account_type='savings')
+        self.add('10.00', date=date(2025, 1, 1))
+        self.add('70.00', account=savings, date=date(2025, 1, 2))
+        body = self.get(group_by='account', account=savings.pk).json()
+        self.assertEqual(body['buckets'], ['2025-01-02'])
+        self.assertEqual(body['series'], [
+            {'key': savings.pk, 'label': 'Savings', 'transaction_type': 'expense', 'totals': [70.0], 'counts': [1]},
+        ])
+
+    def test_group_by_account_splits_transaction_types(self):
+        self.add('1000.00', 'income', date=date(2025, 1, 1))
+        self.add('200.00', date=date(2025, 1, 1))
+        self.add('50.00', 'transfer', date=date(2025, 1, 1))
+        body = self.get(group_by='account').json()
+        self.assertEqual(
+            [(item['key'], item['transaction_type'], item['totals']) for item in body['series']],
+            [
+                (self.account.pk, 'expense', [200.0]),
+                (self.account.pk, 'income', [1000.0]),
+                (self.account.pk, 'transfer', [50.0]),
+            ],
+        )
+
+    def test_group_by_category_splits_transaction_types(self):
+        self.add('40.00', date=date(2025, 1, 1))
+        self.add('15.00', 'income', date=date(2025, 1, 1))
+        self.add('300.00', 'income', category=None, date=date(2025, 1, 1))
+        body = self.get(group_by='category').json()
+        self.assertEqual(
+            [(item['label'], item['transaction_type'], item['totals'], item['counts']) for item in body['series']],
+            [
+                ('Food', 'expense', [40.0], [1]),
+                ('Food', 'income', [15.0], [1]),
+                ('Uncategorized', 'income', [300.0], [1]),
+            ],
+        )
+
+    def test_empty_history(self):
+        body = self.get(bucket='month').json()
+        self.assertEqual(body['buckets'], [])
+        self.assertEqual(body['series'], [])
+
+    def test_invalid_parameters(self):
+        response = self.get(bucket='year', group_by='payee', start_date='January')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'bucket', 'group_by', 'start_date'})
+
+    @override_settings(TIMESERIES_MAX_BUCKETS=10)
+    def test_bucket_limit(self):
+        response = self.get(start_date='2025-01-01', end_date='2025-12-31')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.get(bucket='month', start_date='2025-01-01', end_date='2025-06-30').status_code, 200)
+
+    def test_cached_until_the_next_write(self):
+        self.add('30.00', date=date(2025, 1, 5))
+        first = self.get(bucket='month')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(bucket='month')['X-Cache'], 'HIT')
+        self.client.credentials(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(self.get(bucket='month').status_code, 304)
+        self.client.credentials()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add('5.00', date=date(2025, 1, 6))
+        second = self.get(bucket='month')
+        self.assertEqual(second['X-Cache'], 'MISS')
+        self.assertEqual(second.json()['series'][0]['totals'], [35.0])
+
+
+class BulkTransactionTests(APITestMixin, TestCase):
+    url = '/api/transactions/bulk/'
+
+    def item(self, amount, transaction_type='expense', **kwargs):
+        return {
+            'account': self.account.pk, 'category': self.category.pk, 'transaction_type': transaction_type,
+            'amount': amount, 'description': 'bulk', 'date': '2025-01-15', **kwargs,
+        }
+
+    def assertRollupsConsistent(self):
+        def snapshot():
+            return {
+                (r.account_id, r.category_id, r.transaction_type, r.date): (r.total, r.transaction_count)
+                for r in DailyRollup.objects.filter(user=self.user) if r.transaction_count
+            }
+        incremental = snapshot()
+        ledger.rebuild_rollups(user=self.user)
+        self.assertEqual(snapshot(), incremental)
+
+    def test_create_batch_updates_balance_once(self):
+        savings = Account.objects.create(user=self.user, name='Savings', account_type='savings')
+        items = [self.item('10.00') for _ in range(30)] + [self.item('500.00', 'income', account=savings.pk)]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()), 31)
+        balance_updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "expenses_account"')]
+        self.assertEqual(len(balance_updates), 2)
+        self.assertBalance(self.account, '-300.00')
+        self.assertBalance(savings, '500.00')
+        self.assertRollupsConsistent()
+
+    def test_query_count_does_not_grow_with_batch(self):
+        def queries(size):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post(self.url, [self.item('1.00') for _ in range(size)], format='json')
+            self.assertEqual(response.status_code, 201)
+            return len(ctx.captured_queries)
+        queries(1)  # create the rollup bucket
+        self.assertEqual(queries(3), queries(40))
+
+    def test_invalid_item_rejects_whole_batch(self):
+        other = User.objects.create_user(username='bob', email='bob@example.com', password='pass12345')
+        foreign = Account.objects.create(user=other, name='Bob', account_type='checking')
+        items = [self.item('10.00'), self.item('-1.00'), self.item('5.00', account=foreign.pk)]
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual([e['index'] for e in errors], [1, 2])
+        self.assertEqual(errors[0]['errors']['amount'], ['Amount must be greater than zero.'])
+        self.assertEqual(errors[1]['errors']['account'], ['You can only create transactions for your own accounts.'])
+        self.assertFalse(Transaction.objects.exists())
+        self.assertBalance(self.account, '0.00')
+
+    def test_rejects_empty_or_oversized_batch(self):
+        self.assertEqual(self.client.post(self.url, [], format='json').status_code, 400)
+        with override_settings(TRANSACTION_BULK_MAX_ITEMS=2):
+            response = self.client.post(self.url, [self.item('1.00')] * 3, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_update_batch(self):
+        first = self.add('10.00')
+        second = self.add('20.00')
+        response = self.client.patch(self.url, [
+            {'id': first.pk, 'amount': '15.00'},
+            {'id': second.pk, 'transaction_type': 'income', 'category': None},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertBalance(self.account, '5.00')
+        second.refresh_from_db()
+        self.assertIsNone(second.category)
+        self.assertRollupsConsistent()
+
+    def test_update_reports_unknown_ids(self):
+        txn = self.add('10.00')
+        response = self.client.patch(self.url, [{'id': txn.pk, 'amount': '1.00'}, {'id': 999999}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], [{'index': 1, 'errors': {'id': ['Transaction not found.']}}])
+        txn.refresh_from_db()
+        self.assertEqual(txn.amount, Decimal('10.00'))
+
+    def test_delete_batch(self):
+        keep = self.add('100.00', 'income')
+        gone = [self.add('10.00').pk for _ in range(3)]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(self.url, {'ids': gone}, format='json')
+        self.assertEqual(response.json(), {'deleted': 3})
+        self.assertEqual(list(Transaction.objects.values_list('pk', flat=True)), [keep.pk])
+        self.assertBalance(self.account, '100.00')
+        self.assertRollupsConsistent()
+
+    def test_cannot_delete_other_users_transactions(self):
+        other = User.objects.create_user(username='bob', email='bob@example.com', password='pass12345')
+        account = Account.objects.create(user=other, name='Bob', account_type='checking')
+        txn = Transaction.objects.create(
+            user=other, account=account, transaction_type='expense', amount=Decimal('5.00'),
+            description='x', date=date(2025, 1, 1),
+        )
+        response = self.client.delete(self.url, {'ids': [txn.pk]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(Transaction.objects.filter(pk=txn.pk).exists())
+
+    def test_many_buckets_use_bulk_rollup_path(self):
+        items = [self.item('2.00', date=f'2025-02-{day:02d}') for day in range(1, 29)]
+        self.client.post(self.url, items, format='json')
+        self.client.post(self.url, items, format='json')
+        self.assertEqual(DailyRollup.objects.filter(user=self.user).count(), 28)
+        self.assertRollupsConsistent()
+
+
+class BenchmarkSuiteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        call_command('seed_data', users=2, accounts=2, categories=4, transactions=120, years=1, stdout=open(os.devnull, 'w'))
+        self.user = User.objects.get(email='bench-1@example.com')
+
+    def test_seed_data_is_consistent_and_reproducible(self):
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 120)
+        for account in Account.objects.filter(user=self.user):
+            self.assertEqual(account.balance, Decimal(str(account.calculate_balance())).quantize(Decimal('0.01')))
+            self.assertEqual(account.transaction_count, account.transactions.count())
+            self.assertEqual(ledger.verify_running_balances(account.pk)[0], 0)
+        self.assertTrue(DailyRollup.objects.filter(user=self.user).exists())
+        amounts = list(Transaction.objects.filter(user=self.user).order_by('pk').values_list('amount', flat=True))
+        call_command('seed_data', users=2, accounts=2, categories=4, transactions=120, years=1, reset=True, stdout=open(os.devnull, 'w'))
+        self.user = User.objects.get(email='bench-1@example.com')
+        self.assertEqual(list(Transaction.objects.filter(user=self.user).order_by('pk').values_list('amount', flat=True)), amounts)
+
+    def benchmark(self, *args):
+        out = StringIO()
+        call_command('benchmark', '--iterations', '3', '--warmup', '1', *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_report_and_baseline(self):
+        account = Account.objects.filter(user=self.user).order_by('pk').first()
+        balance = account.balance
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            self.benchmark('--output', path)
+            with open(path) as f:
+                report = json.load(f)
+            self.assertLessEqual({'list', 'summary', 'balance', 'create', 'login'}, set(report['scenarios']))
+            # The account, and the user: users are only cached with a shared cache
+            self.assertEqual(report['scenarios']['balance']['queries'], 2)
+            self.assertIn('No regressions', self.benchmark('--scenario', 'balance', '--baseline', path, '--min-delta', '1000'))
+
+            report['scenarios']['balance']['queries'] = 0
+            with open(path, 'w') as f:
+                json.dump(report, f)
+            with self.assertRaisesMessage(CommandError, 'balance: 0.0 -> 2.0 queries per request'):
+                self.benchmark('--scenario', 'balance', '--baseline', path, '--min-delta', '1000')
+        # Transactions created by the benchmark are removed again
+        account.refresh_from_db()
+        self.assertEqual(account.balance, balance)
+
+
+class ImportTransactionsTests(LedgerTestMixin, TestCase):
+    def write(self, suffix, content):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w') as stream:
+            stream.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def run_import(self, path, *args):
+        call_command('import_transactions', path, '--user', self.user.email, *args,
+                     stdout=open(os.devnull, 'w'), stderr=open(os.devnull, 'w'))
+
+    def test_csv_with_column_map(self):
+        path = self.write('.csv', (
+            'Posted,Amount,Payee,Category,Account\n'
+            '15/01/2025,-12.50,Lunch,Food,Checking\n'
+            '16/01/2025,"1,000.00",Salary,Pay,Checking\n'
+            '17/01/2025,-3.00,Coffee,food,Wallet\n'
+        ))
+        self.run_import(path, '--columns', 'date=Posted,description=Payee,category=Category,account=Account',
+                        '--date-format', '%d/%m/%Y', '--chunk-size', '2')
+
+        wallet = Account.objects.get(user=self.user, name='Wallet')
+        self.assertBalance(self.account, '987.50')
+        self.assertBalance(wallet, '-3.00')
+        self.assertEqual(Category.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Transaction.objects.filter(category=self.category).count(), 2)
+        self.assertEqual(Transaction.objects.get(description='Salary').transaction_type, 'income')
+        self.assertEqual(ledger.verify_running_balances(self.account.pk), (0, Decimal('987.50')))
+        incremental = set(DailyRollup.objects.values_list('account', 'category', 'transaction_type', 'date', 'total'))
+        ledger.rebuild_rollups(user=self.user)
+        self.assertEqual(
+            set(DailyRollup.objects.values_list('account', 'category', 'transaction_type', 'date', 'total')),
+            incremental,
+        )
+
+    def test_invalid_row_aborts_whole_import(self):
+        path = self.write('.csv', 'date,amount,description\n2025-01-01,-5,ok\nnot-a-date,-5,bad\n2025-01-02,-1,ok\n')
+        with self.assertRaisesMessage(Exception, 'line 3'):
+            self.run_import(path, '--account', 'Checking')
+        self.assertFalse(Transaction.objects.exists())
+
+        self.run_import(path, '--account', 'Checking', '--skip-invalid')
+        self.assertEqual(Transaction.objects.count(), 2)
+        self.assertBalance(self.account, '-6.00')
+
+    def test_ofx(self):
+        path = self.write('.ofx', (
+            'OFXHEADER:100\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n'
+            '<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250115120000<TRNAMT>-42.10<NAME>Groceries<MEMO>Weekly\n</STMTTRN>\n'
+            '<STMTTRN>\n<TRNTYPE>CREDIT</TRNTYPE>\n<DTPOSTED>20250116</DTPOSTED>\n<TRNAMT>100.00</TRNAMT>\n'
+            '<NAME>Refund</NAME>\n</STMTTRN>\n</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n'
+        ))
+        self.run_import(path, '--account', 'Checking')
+        groceries = Transaction.objects.get(description='Groceries')
+        self.assertEqual((groceries.date, groceries.notes), (date(2025, 1, 15), 'Weekly'))
+        self.assertBalance(self.account, '57.90')
+
+    def test_qif(self):
+        path = self.write('.qif', (
+            '!Type:Bank\nD01/15/2025\nT-20.00\nPCinema\nLFun:Movies\n^\n'
+            "D1/16'25\nT5.00\nPInterest\n^\n"
+        ))
+        self.run_import(path, '--account', 'Checking')
+        cinema = Transaction.objects.get(description='Cinema')
+        self.assertEqual(cinema.category.name, 'Fun')
+        self.assertEqual(Transaction.objects.get(description='Interest').date, date(2025, 1, 16))
+        self.assertBalance(self.account, '-15.00')
+
+
+class ExportTests(APITestMixin, TestCase):
+    url = '/api/transactions/export/'
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_is_default(self):
+        self.add('12.50', description='Lunch')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        self.assertIn('attachment; filename="transactions-', response['Content-Disposition'])
+        lines = self.content(response).splitlines()
+        self.assertEqual(lines[0].split(',')[:4], ['id', 'date', 'transaction_type', 'amount'])
+        self.assertEqual(len(lines), 2)
+        self.assertIn('2025-01-15,expense,12.50,Lunch', lines[1])
+        self.assertIn('Checking', lines[1])
+
+    def test_ndjson_honors_filters(self):
+        self.add('5.00', date=date(2025, 1, 1))
+        self.add('7.00', 'income', date=date(2025, 2, 1))
+        response = self.client.get(self.url, {'format': 'ndjson', 'start_date': '2025-01-15'})
+        self.assertTrue(response['Content-Type'].startswith('application/x-ndjson'))
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['amount'], '7.00')
+        self.assertEqual(rows[0]['category_name'], 'Food')
+        self.assertEqual(rows[0]['account'], self.account.pk)
+
+    def test_csv_cells_cannot_be_formulas(self):
+        self.add('1.00', description='=HYPERLINK("http://evil")')
+        self.assertIn('\'=HYPERLINK', self.content(self.client.get(self.url)))
+
+    def test_only_own_transactions_in_one_query(self):
+        other = User.objects.create_user(username='bob', email='bob@example.com', password='pass12345')
+        account = Account.objects.create(user=other, name='Bob', account_type='checking')
+        Transaction.objects.create(user=other, account=account, transaction_type='expense',
+                                   amount=Decimal('1.00'), description='x', date=date(2025, 1, 1))
+        for _ in range(20):
+            self.add('1.00')
+        response = self.client.get(self.url, {'format': 'ndjson'})
+        with CaptureQueriesContext(connection) as ctx:
+            lines = self.content(response).splitlines()
+        self.assertEqual(len(lines), 20)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get(self.url, {'format': 'xml'}).status_code, 404)
+
+
+class RecalculateBalancesTests(LedgerTestMixin, TestCase):
+    def recalculate(self, *args):
+        out = open(os.devnull, 'w')
+        call_command('recalculate_balances', *args, stdout=out, stderr=out)
+
+    def corrupt(self, *accounts):
+        Account.objects.filter(pk__in=[a.pk for a in accounts]).update(balance=Decimal('999.99'))
+
+    def test_matches_calculate_balance(self):
+        savings = Account.objects.create(user=self.user, name='Savings', account_type='savings')
+        empty = Account.objects.create(user=self.user, name='Empty', account_type='cash')
+        self.add('100.10', 'income')
+        self.add('30.05', 'expense')
+        self.add('20.00', 'transfer')
+        self.add('0.33', 'income', account=savings)
+        self.corrupt(self.account, savings, empty)
+
+        self.recalculate('--batch-size', '2')
+        self.assertBalance(self.account, '50.05')
+        self.assertBalance(savings, '0.33')
+        self.assertBalance(empty, '0.00')
+
+    def test_query_count_does_not_grow_with_accounts(self):
+        def queries():
+            self.corrupt(*Account.objects.all())
+            with CaptureQueriesContext(connection) as ctx:
+                self.recalculate()
+            return len(ctx.captured_queries)
+        self.add('1.00')
+        few = queries()
+        for number in range(10):
+            account = Account.objects.create(user=self.user, name=f'Extra {number}', account_type='cash')
+            self.add('1.00', account=account)
+        self.assertEqual(queries(), few)
+        self.assertBalance(account, '-1.00')
+
+    def test_dry_run_writes_nothing(self):
+        self.add('10.00', 'income')
+        self.corrupt(self.account)
+        self.recalculate('--dry-run')
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('999.99'))
+
+    def test_user_and_since_filters(self):
+        other = User.objects.create_user(username='bob', email='bob@example.com', password='pass12345')
+        bobs = Account.objects.create(user=other, name='Bob', account_type='checking')
+        stale = Account.objects.create(user=self.user, name='Stale', account_type='cash')
+        self.add('10.00', 'income')
+        self.corrupt(self.account, bobs, stale)
+
+        self.recalculate('--user', self.user.email, '--since', timezone.now().date().isoformat())
+        self.assertBalance(self.account, '10.00')
+        for untouched in (bobs, stale):
+            untouched.refresh_from_db()
+            self.assertEqual(untouched.balance, Decimal('999.99'))
+
+    def test_workers_fall_back_to_one_process_off_postgresql(self):
+        self.add('10.00', 'income')
+        self.corrupt(self.account)
+        self.recalculate('--workers', '4')
+        self.assertBalance(self.account, '10.00')
+
+
+class StoredCounterTests(APITestMixin, TestCase):
+    def counters(self, owner):
+        owner.refresh_from_db()
+        return [owner.transaction_count, owner.total_income, owner.total_expense, owner.total_transfer]
+
+    def test_writes_keep_counters_current(self):
+        rent = Category.objects.create(user=self.user, name='Rent')
+        savings = Account.objects.create(user=self.user, name='Savings', account_type='savings')
+        pay = self.add('100.00', 'income')
+        food = self.add('30.00')
+        self.add('5.00', 'transfer', category=None)
+        self.assertEqual(self.counters(self.account), [3, 100, 30, 5])
+        self.assertEqual(self.counters(self.category), [2, 100, 30, 0])
+
+        food.category, food.account, food.amount = rent, savings, Decimal('40.00')
+        food.save()
+        pay.delete()
+        self.assertEqual(self.counters(self.account), [1, 0, 0, 5])
+        self.assertEqual(self.counters(savings), [1, 0, 40, 0])
+        self.assertEqual(self.counters(self.category), [0, 0, 0, 0])
+        self.assertEqual(self.counters(rent), [1, 0, 40, 0])
+
+        self.client.post('/api/transactions/bulk/', [
+            {'account': self.account.pk, 'category': rent.pk, 'transaction_type': 'expense',
+             'amount': '2.50', 'description': 'x', 'date': '2025-01-16'},
+        ] * 3, format='json')
+        self.assertEqual(self.counters(rent), [4, 0, Decimal('47.50'), 0])
+        savings.delete()
+        self.assertEqual(self.counters(rent), [3, 0, Decimal('7.50'), 0])
+
+    def test_reads_are_column_fetches(self):
+        self.add('12.00')
+        self.add('3.00', 'income')
+        with self.assertNumQueries(1):
+            categories = self.client.get('/api/categories/').json()
+        self.assertEqual((categories[0]['transaction_count'], categories[0]['total_spent']), (2, 12.0))
+        with self.assertNumQueries(1):
+            balance = self.client.get(f'/api/accounts/{self.account.pk}/balance/').json()
+        self.assertEqual(balance['transaction_count'], 2)
+        self.assertEqual((balance['total_income'], balance['total_expenses']), (3.0, 12.0))
+        self.assertEqual(self.client.get('/api/accounts/').json()[0]['transaction_count'], 2)
+
+    def test_stale_save_keeps_counters(self):
+        stale = Category.objects.get(pk=self.category.pk)
+        self.add('8.00')
+        stale.color = '#000000'
+        stale.save()
+        self.assertEqual(self.counters(self.category), [1, 0, 8, 0])
+
+    def test_rebuild_command_detects_and_repairs_drift(self):
+        self.add('8.00')
+        Category.objects.filter(pk=self.category.pk).update(transaction_count=5)
+        Account.objects.filter(pk=self.account.pk).update(total_expense=1)
+        with self.assertLogs('expenses.ledger', 'ERROR'), self.assertRaises(CommandError):
+            call_command('rebuild_counters', '--check', stdout=open(os.devnull, 'w'))
+        self.assertEqual(self.counters(self.category)[0], 5)
+
+        with self.assertLogs('expenses.ledger', 'ERROR'):
+            call_command('rebuild_counters', stdout=open(os.devnull, 'w'))
+        self.assertEqual(self.counters(self.category), [1, 0, 8, 0])
+        self.assertEqual(self.counters(self.account), [1, 0, 8, 0])
+        call_command('rebuild_counters', '--check', stdout=open(os.devnull, 'w'))
+
+
+class RunningBalanceTests(APITestMixin, TestCase):
+    def assertRunningBalances(self, account=None):
+        account = account or self.account
+        wrong, closing = ledger.verify_running_balances(account.pk)
+        self.assertEqual(wrong, 0)
+        account.refresh_from_db()
+        self.assertEqual(closing, account.balance)
+
+    def running(self, txn):
+        txn.refresh_from_db()
+        return txn.running_balance
+
+    def test_single_writes(self):
+        savings = Account.objects.create(user=self.user, name='Savings', account_type='savings')
+        first = self.add('100.00', 'income', date=date(2025, 1, 10))
+        later = self.add('30.00', date=date(2025, 1, 20))
+        backdated = self.add('5.00', date=date(2025, 1, 5))
+        self.assertEqual(self.running(backdated), Decimal('-5.00'))
+        self.assertEqual(self.running(first), Decimal('95.00'))
+        self.assertEqual(self.running(later), Decimal('65.00'))
+
+        first.amount = Decimal('50.00')
+        first.save()
+        self.assertEqual(self.running(later), Decimal('15.00'))
+
+        backdated.date = date(2025, 1, 25)
+        backdated.save()
+        self.assertEqual(self.running(backdated), Decimal('15.00'))
+        self.assertRunningBalances()
+
+        first.account = savings
+        first.save()
+        self.assertRunningBalances()
+        self.assertRunningBalances(savings)
+
+        later.delete()
+        self.assertRunningBalances()
+        self.assertEqual(self.running(backdated), Decimal('-5.00'))
+
+    def test_date_only_move_locks_the_account(self):
+        first = self.add('100.00', 'income', date=date(2025, 1, 10))
+        moved = self.add('30.00', date=date(2025, 1, 20))
+        self.add('5.00', date=date(2025, 1, 15))
+        moved.date = date(2025, 1, 5)
+        with CaptureQueriesContext(connection) as ctx:
+            moved.save()
+        # No balance or counter changes, so no UPDATE locked the account
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "expenses_account"')])
+        self.assertTrue([q for q in ctx.captured_queries if q['sql'].startswith('SELECT "expenses_account"."id"')])
+        self.assertEqual(self.running(moved), Decimal('-30.00'))
+        self.assertEqual(self.running(first), Decimal('70.00'))
+        self.assertRunningBalances()
+
+    def test_delete_reverses_the_stored_row(self):
+        self.add('100.00', 'income', date=date(2025, 1, 10))
+        txn = self.add('60.00', date=date(2025, 1, 20))
+        stale = Transaction.objects.get(pk=txn.pk)
+        # A concurrent update commits between get_object() and the delete
+        txn.amount = Decimal('80.00')
+        txn.save()
+        with mock.patch('expenses.views.TransactionViewSet.get_object', return_value=stale):
+            self.assertEqual(self.client.delete(f'/api/transactions/{txn.pk}/').status_code, 204)
+        self.assertBalance(self.account, '100.00')
+        self.assertRunningBalances()
+
+    def test_model_delete_reverses_the_stored_row(self):
+        self.add('100.00', 'income', date=date(2025, 1, 10))
+        txn = self.add('50.00', date=date(2025, 1, 20))
+        stale = Transaction.objects.get(pk=txn.pk)
+        txn.amount = Decimal('80.00')
+        txn.save()
+        stale.delete()
+        self.assertBalance(self.account, '100.00')
+        self.assertRunningBalances()
+
+    def test_deleting_a_deleted_row_changes_nothing(self):
+        self.add('100.00', 'income', date=date(2025, 1, 10))
+        txn = self.add('30.00', date=date(2025, 1, 20))
+        again = Transaction.objects.get(pk=txn.pk)
+        txn.delete()
+        again.delete()
+        self.assertBalance(self.account, '100.00')
+        self.assertRunningBalances()
+
+    def test_batches_walk_from_earliest_change(self):
+        self.add('10.00', 'income', date=date(2025, 3, 1))
+        items = [
+            {'account': self.account.pk, 'transaction_type': 'expense', 'amount': '1.00',
+             'description': 'bulk', 'date': f'2025-02-{day:02d}'}
+            for day in range(1, 6)
+        ]
+        created = self.client.post('/api/transactions/bulk/', items, format='json').json()
+        self.assertRunningBalances()
+        self.client.patch('/api/transactions/bulk/', [
+            {'id': row['id'], 'amount': '2.00'} for row in created[:3]
+        ], format='json')
+        self.assertRunningBalances()
+        self.client.delete('/api/transactions/bulk/', {'ids': [row['id'] for row in created[1:4]]}, format='json')
+        self.assertRunningBalances()
+
+    def test_statement_pages(self):
+        for day in range(1, 6):
+            self.add(f'{day}.00', 'income', date=date(2025, 1, day))
+        url = f'/api/accounts/{self.account.pk}/statement/'
+        first = self.client.get(url, {'page_size': 2}).json()
+        self.assertEqual([line['running_balance'] for line in first['results']], ['15.00', '10.00'])
+        self.assertEqual((first['opening_balance'], first['closing_balance']), ('6.00', '15.00'))
+
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get(first['next']).json()
+        self.assertEqual((second['opening_balance'], second['closing_balance']), ('1.00', '6.00'))
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertNotIn('COUNT', ctx.captured_queries[0]['sql'])
+
+    def test_statement_of_empty_account(self):
+        body = self.client.get(f'/api/accounts/{self.account.pk}/statement/').json()
+        self.assertEqual((body['results'], body['opening_balance'], body['closing_balance']), ([], '0.00', '0.00'))
+
+    def test_checker_finds_and_repairs(self):
+        self.add('10.00', 'income')
+        self.add('4.00')
+        Transaction.objects.update(running_balance=0)
+        out = open(os.devnull, 'w')
+        with self.assertRaisesMessage(Exception, '1 of 1 accounts are inconsistent'):
+            call_command('check_running_balances', stdout=out)
+        call_command('check_running_balances', '--repair', stdout=out)
+        call_command('check_running_balances', stdout=out)
+        self.assertRunningBalances()
+
+
+class FastRepresentationTests(APITestMixin, TestCase):
+    def test_list_matches_serializer_byte_for_byte(self):
+        from rest_framework.renderers import JSONRenderer
+        from .serializers import StatementLineSerializer, TransactionSerializer
+        from .views import statement_rows, transaction_rows
+
+        self.add('12.5', description='Caf\u00e9 \u2028 "quoted"', notes='line\nbreak')
+        self.add('3.00', 'income', category=None)
+        self.add('1000000.00', 'transfer', date=date(2024, 12, 31))
+        for serializer_class, mapper in ((TransactionSerializer, transaction_rows),
+                                         (StatementLineSerializer, statement_rows)):
+            queryset = Transaction.objects.order_by('pk')
+            expected = JSONRenderer().render(serializer_class(queryset.select_related('account', 'category'), many=True).data)
+            self.assertEqual(JSONRenderer().render(mapper.map(mapper.values(queryset))), expected)
+
+    def test_endpoint_output_unchanged(self):
+        from rest_framework.renderers import JSONRenderer
+        from .serializers import TransactionSerializer
+
+        self.add('7.25')
+        self.add('1.00', category=None)
+        response = self.client.get('/api/transactions/')
+        queryset = Transaction.objects.order_by('-date', '-created_at', '-id').select_related('account', 'category')
+        expected = JSONRenderer().render(TransactionSerializer(queryset, many=True).data)
+        self.assertEqual(JSONRenderer().render(response.json()['results']), expected)
+        self.assertNotIn('category_name', response.json()['results'][0])
+
+    def test_list_query_count_is_flat(self):
+        for _ in range(30):
+            self.add('1.00')
+        with self.assertNumQueries(1):
+            self.client.get('/api/transactions/')
+
+    def test_fast_renderer_matches_json_renderer(self):
+        from datetime import datetime
+        from rest_framework.renderers import JSONRenderer
+        from .renderers import FastJSONRenderer
+
+        payload = {
+            'text': 'na\u00efve \u2028 \u2029 "\\ \x00 \x1f \U0001f600',
+            'numbers': [0, -1, 2 ** 40, 1.5, 0.1 + 0.2, 1234567.89, True, None],
+            'decimal': Decimal('12.50'),
+            'when': datetime(2025, 1, 2, 3, 4, 5, 123456, tzinfo=timezone.utc),
+            'day': date(2025, 1, 2),
+            'nested': [{'a': [], 'b': {}}],
+        }
+        self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+        indented = 'application/json; indent=2'
+        self.assertEqual(FastJSONRenderer().render(payload, indented), JSONRenderer().render(payload, indented))
+
+
+class AsyncReadPathTests(InsightsTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        from rest_framework_simplejwt.tokens import AccessToken
+        self.headers = {'authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        today = timezone.now().date()
+        self.add('250.00', 'income', date=today)
+        self.add('40.00', date=today - timedelta(days=1))
+        self.add('15.00', 'transfer', category=None, date=today - timedelta(days=2))
+
+    async def get(self, path, **params):
+        return await self.async_client.get(path, params, headers=self.headers)
+
+    async def drf_get(self, path, params=None):
+        return await sync_to_async(self.client.get)(path, params)
+
+    async def test_list_pages_match_the_drf_endpoint(self):
+        first = await self.get('/api/async/transactions/', page_size=2)
+        self.assertEqual(first.status_code, 200)
+        expected = (await self.drf_get('/api/transactions/', {'page_size': 2})).json()
+        self.assertEqual(first.json()['results'], expected['results'])
+        self.assertTrue(first.json()['next'].startswith('http://testserver/api/async/transactions/?cursor='))
+
+        second = await self.async_client.get(first.json()['next'], headers=self.headers)
+        expected = (await self.drf_get(expected['next'])).json()
+        self.assertEqual(second.json()['results'], expected['results'])
+        self.assertIsNone(second.json()['next'])
+
+    async def test_summary_and_balance_match_the_drf_endpoints(self):
+        for path, drf_path in (
+            ('/api/async/transactions/summary/', '/api/transactions/summary/'),
+            (f'/api/async/accounts/{self.account.pk}/balance/', f'/api/accounts/{self.account.pk}/balance/'),
+        ):
+            response = await self.get(path, account=self.account.pk)
+            self.assertEqual(response.content, (await self.drf_get(drf_path, {'account': self.account.pk})).content)
+
+    async def test_insights_match_and_share_the_cache(self):
+        expected = (await sync_to_async(self.get_insights)()).json()
+        await sync_to_async(cache.clear)()
+        response = await self.get_async_insights()
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['insights'], expected['insights'])
+        self.assertEqual(response.json()['spending_data'], expected['spending_data'])
+        self.assertEqual((await sync_to_async(self.get_insights)())['X-Cache'], 'HIT')
+
+    async def get_async_insights(self):
+        google = types.ModuleType('google')
+        google.generativeai = types.ModuleType('google.generativeai')
+        modules = {'google': google, 'google.generativeai': google.generativeai}
+        with mock.patch.dict(sys.modules, modules), mock.patch('expenses.views.config', return_value='key'):
+            return await self.get('/api/async/transactions/ai_insights/')
+
+    async def test_errors_match_drf(self):
+        response = await self.async_client.get('/api/async/transactions/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+        bad_token = await self.async_client.get('/api/async/transactions/', headers={'authorization': 'Bearer nope'})
+        self.assertEqual(bad_token.json()['code'], 'token_not_valid')
+        other = await Account.objects.acreate(
+            user=await User.objects.acreate(username='bob', email='bob@example.com'), name='Other', account_type='cash',
+        )
+        self.assertEqual((await self.get(f'/api/async/accounts/{other.pk}/balance/')).status_code, 404)
+        response = await self.async_client.post('/api/async/transactions/', headers=self.headers)
+        self.assertEqual(response.status_code, 405)
+
+    @override_settings(ASYNC_READ_CONCURRENCY=1, ASYNC_READ_QUEUE_TIMEOUT=0.01)
+    async def test_requests_over_the_concurrency_limit_get_503(self):
+        from .async_views import read_slot
+
+        async with read_slot():
+            with self.assertLogs('expenses.async_views', 'WARNING'):
+                response = await self.get('/api/async/transactions/summary/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual((await self.get('/api/async/transactions/summary/')).status_code, 200)
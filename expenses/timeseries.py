@@ -0,0 +1,130 @@
+"""
+Bucketed totals behind /transactions/timeseries/.
+
+Totals are grouped in the database over the daily rollups, which take the
+same filters as transactions, so a response costs one query over at most one
+row per day and group, and its size depends on the number of buckets and
+groups, never on the number of transactions. Buckets without activity are
+filled in with zeros so every series lines up with ``buckets``.
+"""
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from rest_framework.exceptions import ValidationError
+
+from .models import TRANSACTION_TYPES
+
+BUCKETS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+# group_by: (key column, label column or None). Category and account series
+# are split by transaction type, so income and expenses never add up.
+GROUPS = {
+    'category': ('category', 'category__name'),
+    'account': ('account', 'account__name'),
+    'type': ('transaction_type', None),
+}
+
+TYPE_LABELS = dict(TRANSACTION_TYPES)
+
+
+def parse_params(params):
+    """``bucket``, ``group_by``, ``start`` and ``end`` from the query string, or a ValidationError"""
+    errors = {}
+    bucket = params.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        errors['bucket'] = [f'Must be one of: {", ".join(BUCKETS)}.']
+    group_by = params.get('group_by', 'type')
+    if group_by not in GROUPS:
+        errors['group_by'] = [f'Must be one of: {", ".join(GROUPS)}.']
+    bounds = {}
+    for name, param in (('start', 'start_date'), ('end', 'end_date')):
+        try:
+            bounds[name] = date.fromisoformat(params[param]) if params.get(param) else None
+        except ValueError:
+            errors[param] = ['Enter a date in YYYY-MM-DD format.']
+    if errors:
+        raise ValidationError(errors)
+    return {'bucket': bucket, 'group_by': group_by, **bounds}
+
+
+def bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(day, bucket):
+    if bucket == 'week':
+        return day + timedelta(weeks=1)
+    if bucket == 'month':
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+def bucket_range(first, last, bucket):
+    """Every bucket start from ``first``'s bucket through ``last``'s"""
+    current, last = bucket_start(first, bucket), bucket_start(last, bucket)
+    buckets = []
+    while current <= last:
+        buckets.append(current)
+        if len(buckets) > settings.TIMESERIES_MAX_BUCKETS:
+            raise ValidationError({'bucket': [
+                f'The range spans more than {settings.TIMESERIES_MAX_BUCKETS} buckets; '
+                'narrow start_date/end_date or use a larger bucket.'
+            ]})
+        current = next_bucket(current, bucket)
+    return buckets
+
+
+def build_timeseries(rollups, bucket, group_by, start=None, end=None):
+    """The /transactions/timeseries/ payload for a filtered ``DailyRollup`` queryset"""
+    key_column, label_column = GROUPS[group_by]
+    columns = [key_column] + ([label_column, 'transaction_type'] if label_column else [])
+    rows = list(
+        rollups.annotate(period=BUCKETS[bucket]('date'))
+        .values('period', *columns)
+        .annotate(period_total=Sum('total'), period_count=Sum('transaction_count'))
+        .order_by('period')
+    )
+
+    first = start or (rows[0]['period'] if rows else None)
+    last = end or (rows[-1]['period'] if rows else None)
+    buckets = bucket_range(first, last, bucket) if first and last else []
+    index = {day: position for position, day in enumerate(buckets)}
+
+    series = {}
+    for row in rows:
+        position = index.get(row['period'])
+        if position is None:
+            continue
+        key = row[key_column]
+        series_key = (key, row['transaction_type'])
+        if series_key not in series:
+            if group_by == 'type':
+                item = {'key': key, 'label': TYPE_LABELS.get(key, key)}
+            else:
+                item = {
+                    'key': key,
+                    'label': row[label_column] or 'Uncategorized',
+                    'transaction_type': row['transaction_type'],
+                }
+            series[series_key] = {**item, 'totals': [0.0] * len(buckets), 'counts': [0] * len(buckets)}
+        series[series_key]['totals'][position] += float(row['period_total'] or 0)
+        series[series_key]['counts'][position] += row['period_count'] or 0
+
+    return {
+        'bucket': bucket,
+        'group_by': group_by,
+        'start': buckets[0].isoformat() if buckets else None,
+        'end': buckets[-1].isoformat() if buckets else None,
+        'buckets': [day.isoformat() for day in buckets],
+        'series': [series[key] for key in sorted(series, key=lambda key: (series[key]['label'], str(key[0]), key[1]))],
+    }
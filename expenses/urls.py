@@ -1,6 +1,6 @@
 from django.urls import path,include
 from rest_framework.routers import DefaultRouter
-from .import views
+from .import views, async_views
 
 
 router =  DefaultRouter()
@@ -8,6 +8,15 @@ router =  DefaultRouter()
 router.register(r'categories',views.CategoryViewSet,basename='category')
 router.register(r'accounts',views.AccountViewSet,basename='account')
 router.register(r'transactions',views.TransactionViewSet,basename='transaction')
+# Async-native mirrors of the read-heavy endpoints, for ASGI deployments
+async_urlpatterns=[
+    path('transactions/',async_views.transaction_list,name='async-transaction-list'),
+    path('transactions/summary/',async_views.transaction_summary,name='async-transaction-summary'),
+    path('transactions/ai_insights/',async_views.ai_insights,name='async-transaction-ai-insights'),
+    path('accounts/<int:pk>/balance/',async_views.account_balance,name='async-account-balance'),
+]
+
 urlpatterns=[
     path('',include(router.urls)),
+    path('async/',include(async_urlpatterns)),
 ]
\ No newline at end of file
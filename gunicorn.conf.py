@@ -0,0 +1,68 @@
+"""
+Production entry point: ``gunicorn -c gunicorn.conf.py``.
+
+SERVER_INTERFACE picks how the app is served:
+
+* ``wsgi`` (default): threaded sync workers, 2 x cores + 1 processes with
+  GUNICORN_THREADS threads each. Threads overlap database waits without
+  another process's memory.
+* ``asgi``: one uvicorn worker per core running ``tracker.asgi``, for the
+  async read path under /api/async/. Django can't keep connections open
+  across async requests, so DB_CONN_MAX_AGE defaults to 0 here; put
+  pgbouncer in front of PostgreSQL instead (see DB_PGBOUNCER).
+
+SQLite databases are switched to WAL (SQLITE_JOURNAL_MODE) for the server.
+
+Every value is read like the Django settings: from the environment or .env.
+"""
+import multiprocessing
+import os
+
+from decouple import config
+
+interface = config('SERVER_INTERFACE', default='wsgi').lower()
+cores = multiprocessing.cpu_count()
+
+bind = config('GUNICORN_BIND', default='0.0.0.0:8000')
+
+if interface == 'asgi':
+    wsgi_app = 'tracker.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    workers = config('WEB_CONCURRENCY', default=cores, cast=int)
+    # Passed on to the settings, which the workers load after this file
+    os.environ['DB_CONN_MAX_AGE'] = config('DB_CONN_MAX_AGE', default='0')
+elif interface == 'wsgi':
+    wsgi_app = 'tracker.wsgi:application'
+    worker_class = 'gthread'
+    workers = config('WEB_CONCURRENCY', default=cores * 2 + 1, cast=int)
+    threads = config('GUNICORN_THREADS', default=4, cast=int)
+else:
+    raise RuntimeError(f'SERVER_INTERFACE must be wsgi or asgi, not {interface!r}')
+
+os.environ['SQLITE_JOURNAL_MODE'] = config('SQLITE_JOURNAL_MODE', default='wal')
+
+timeout = config('GUNICORN_TIMEOUT', default=30, cast=int)
+graceful_timeout = config('GUNICORN_GRACEFUL_TIMEOUT', default=30, cast=int)
+keepalive = config('GUNICORN_KEEPALIVE', default=5, cast=int)
+
+# Recycle workers now and then so slow leaks can't build up; the jitter
+# keeps them from all restarting at once
+max_requests = config('GUNICORN_MAX_REQUESTS', default=2000, cast=int)
+max_requests_jitter = config('GUNICORN_MAX_REQUESTS_JITTER', default=200, cast=int)
+
+# Heartbeat files on tmpfs; a disk-backed /tmp in containers can stall workers
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+accesslog = config('GUNICORN_ACCESS_LOG', default='-')
+errorlog = '-'
+loglevel = config('LOG_LEVEL', default='info').lower()
+
+
+def post_worker_init(worker):
+    """Warm the refresh token blacklist before the worker takes requests"""
+    from accounts.blacklist import blacklisted
+    try:
+        blacklisted.warm()
+    except Exception:
+        # Not fatal: the blacklist loads itself on first use
+        worker.log.exception('Could not warm the token blacklist')
@@ -1,36 +1,120 @@
 """
-Custom CORS middleware to handle preflight requests
+CORS and preflight handling.
+
+One middleware serves both plain and preflight CORS requests, configured with
+the usual ``CORS_*`` settings (the names django-cors-headers uses, whose app
+stays installed to validate them). Header values are computed once at
+startup, preflights are answered before the rest of the stack runs and can
+be cached by the browser for ``CORS_PREFLIGHT_MAX_AGE`` seconds, and the
+middleware runs natively under both WSGI and ASGI.
 """
+import logging
+import re
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from corsheaders.defaults import default_headers, default_methods
+from django.conf import settings
 from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+logger = logging.getLogger(__name__)
+
+ACCESS_CONTROL_ALLOW_ORIGIN = 'Access-Control-Allow-Origin'
+ACCESS_CONTROL_ALLOW_CREDENTIALS = 'Access-Control-Allow-Credentials'
+ACCESS_CONTROL_EXPOSE_HEADERS = 'Access-Control-Expose-Headers'
+ACCESS_CONTROL_REQUEST_METHOD = 'HTTP_ACCESS_CONTROL_REQUEST_METHOD'
+
+
+class CORSMiddleware:
+    sync_capable = True
+    async_capable = True
 
-class CustomCORSMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
-        print("CustomCORSMiddleware initialized!")
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+        self.allow_all = getattr(settings, 'CORS_ALLOW_ALL_ORIGINS', False)
+        self.allowed_origins = {
+            origin.rstrip('/').lower() for origin in getattr(settings, 'CORS_ALLOWED_ORIGINS', ())
+        }
+        self.origin_patterns = [
+            re.compile(pattern) for pattern in getattr(settings, 'CORS_ALLOWED_ORIGIN_REGEXES', ())
+        ]
+        self.allow_credentials = getattr(settings, 'CORS_ALLOW_CREDENTIALS', False)
+        self.urls = re.compile(getattr(settings, 'CORS_URLS_REGEX', r'^.*$'))
+
+        max_age = getattr(settings, 'CORS_PREFLIGHT_MAX_AGE', 86400)
+        preflight = [
+            ('Access-Control-Allow-Headers', ', '.join(getattr(settings, 'CORS_ALLOW_HEADERS', default_headers))),
+            ('Access-Control-Allow-Methods', ', '.join(getattr(settings, 'CORS_ALLOW_METHODS', default_methods))),
+        ]
+        if max_age:
+            preflight += [
+                ('Access-Control-Max-Age', str(max_age)),
+                ('Cache-Control', f'private, max-age={max_age}'),
+            ]
+        self.preflight_headers = tuple(preflight)
+        expose = getattr(settings, 'CORS_EXPOSE_HEADERS', ())
+        self.expose_headers = ', '.join(expose) if expose else None
 
     def __call__(self, request):
-        print(f"CustomCORSMiddleware called for {request.method} {request.path}")
-        
-        if request.method == 'OPTIONS':
-            print("Handling OPTIONS request")
-            response = HttpResponse()
-            response['Access-Control-Allow-Origin'] = '*'
-            response['Access-Control-Allow-Methods'] = 'GET, POST, PUT, PATCH, DELETE, OPTIONS'
-            response['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, X-Requested-With, Accept, Origin'
-            response['Access-Control-Allow-Credentials'] = 'true'
-            response['Access-Control-Max-Age'] = '86400'
-            response.status_code = 200
-            print("Returning OPTIONS response with CORS headers")
+        if self.async_mode:
+            return self.__acall__(request)
+        origin = self.cors_origin(request)
+        if origin is not None and self.is_preflight(request):
+            return self.preflight(origin, request)
+        return self.add_headers(self.get_response(request), origin)
+
+    async def __acall__(self, request):
+        origin = self.cors_origin(request)
+        if origin is not None and self.is_preflight(request):
+            return self.preflight(origin, request)
+        return self.add_headers(await self.get_response(request), origin)
+
+    def cors_origin(self, request):
+        """The request's Origin if this is a CORS request to a CORS-enabled URL"""
+        origin = request.META.get('HTTP_ORIGIN')
+        if not origin or not self.urls.match(request.path_info):
+            return None
+        return origin
+
+    def origin_allowed(self, origin):
+        if self.allow_all:
+            return True
+        if origin.rstrip('/').lower() in self.allowed_origins:
+            return True
+        if origin == 'null' or not urlsplit(origin).scheme:
+            return False
+        return any(pattern.match(origin) for pattern in self.origin_patterns)
+
+    def is_preflight(self, request):
+        return request.method == 'OPTIONS' and ACCESS_CONTROL_REQUEST_METHOD in request.META
+
+    def preflight(self, origin, request):
+        """Answer a preflight without running the rest of the stack"""
+        logger.debug('CORS preflight', extra={'path': request.path_info, 'origin': origin})
+        response = HttpResponse()
+        response['Content-Length'] = '0'
+        return self.add_headers(response, origin, preflight=True)
+
+    def add_headers(self, response, origin, preflight=False):
+        if origin is None:
             return response
-        
-        # Process normal requests
-        response = self.get_response(request)
-        
-        # Add CORS headers to all responses
-        print(f"Adding CORS headers to {response.status_code} response")
-        response['Access-Control-Allow-Origin'] = '*'
-        response['Access-Control-Allow-Methods'] = 'GET, POST, PUT, PATCH, DELETE, OPTIONS'
-        response['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, X-Requested-With, Accept, Origin'
-        response['Access-Control-Allow-Credentials'] = 'true'
-        
+        # Responses to CORS-enabled URLs depend on the Origin, allowed or not
+        patch_vary_headers(response, ('Origin',))
+        if not self.origin_allowed(origin):
+            logger.info('CORS origin rejected', extra={'origin': origin})
+            return response
+
+        response[ACCESS_CONTROL_ALLOW_ORIGIN] = '*' if self.allow_all and not self.allow_credentials else origin
+        if self.allow_credentials:
+            response[ACCESS_CONTROL_ALLOW_CREDENTIALS] = 'true'
+        if self.expose_headers:
+            response[ACCESS_CONTROL_EXPOSE_HEADERS] = self.expose_headers
+        if preflight:
+            for header, value in self.preflight_headers:
+                response[header] = value
         return response
@@ -0,0 +1,21 @@
+"""
+Database connection setup.
+
+Every new SQLite connection gets ``SQLITE_PRAGMAS`` before its first query:
+``mmap_size`` serves reads straight from the OS page cache, and
+``busy_timeout`` makes a writer wait for the lock instead of failing with
+"database is locked". Under gunicorn they also switch the database to WAL,
+which lets readers run while a write is in progress, with
+``synchronous=NORMAL``, still crash-safe in WAL mode but only syncing at
+checkpoints.
+"""
+from django.conf import settings
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """``connection_created`` receiver"""
+    if connection.vendor != 'sqlite':
+        return
+    # On the raw connection, so the pragmas don't show up as app queries
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,42 @@
+"""
+Logging helpers referenced from ``settings.LOGGING``.
+
+Hot-path loggers (CORS, authentication) log through ``SampleFilter`` so only
+a fraction of their routine records is written, and ``JSONFormatter`` keeps
+every line machine-readable, including any ``extra={...}`` fields.
+"""
+import json
+import logging
+import random
+
+# Attributes every LogRecord has; anything else came in through ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class SampleFilter(logging.Filter):
+    """Pass ``rate`` of the records below WARNING; warnings and errors always pass"""
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = float(rate)
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record with its extra fields"""
+
+    def format(self, record):
+        payload = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        payload.update(
+            (key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES
+        )
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
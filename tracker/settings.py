@@ -10,10 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 # important 
-from decouple import config
+from decouple import Csv, config
 from datetime import timedelta
+from django.core.exceptions import ImproperlyConfigured
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -40,7 +42,8 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "rest_framework",
-    "corsheaders",
+    "corsheaders",  # only validates the CORS_* settings; tracker.cors_middleware applies them
+    "tracker",
     "accounts",
     "expenses",
     'rest_framework_simplejwt',
@@ -48,8 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
-    "tracker.cors_middleware.CustomCORSMiddleware",  # Custom CORS middleware as backup
-    "corsheaders.middleware.CorsMiddleware",
+    "tracker.cors_middleware.CORSMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -82,13 +84,80 @@ WSGI_APPLICATION = "tracker.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# SQLite by default, tuned for a single node (see SQLITE_PRAGMAS). For
+# PostgreSQL set DB_ENGINE=django.db.backends.postgresql and the other DB_*
+# variables. Connections are kept for DB_CONN_MAX_AGE seconds and checked
+# before reuse. Behind pgbouncer in transaction pooling mode set
+# DB_PGBOUNCER=True: server-side cursors don't survive across pooled
+# transactions, so iterator() reads fall back to client-side chunks.
+
+DB_ENGINE = config('DB_ENGINE', default='django.db.backends.sqlite3')
+
+if DB_ENGINE == 'django.db.backends.sqlite3':
+    DATABASES = {
+        "default": {
+            "ENGINE": DB_ENGINE,
+            "NAME": config('DB_NAME', default=str(BASE_DIR / "db.sqlite3")),
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": DB_ENGINE,
+            "NAME": config('DB_NAME', default='expense_tracker'),
+            "USER": config('DB_USER', default=''),
+            "PASSWORD": config('DB_PASSWORD', default=''),
+            "HOST": config('DB_HOST', default='localhost'),
+            "PORT": config('DB_PORT', default='5432'),
+            "CONN_MAX_AGE": config('DB_CONN_MAX_AGE', default=60, cast=int),
+            "CONN_HEALTH_CHECKS": config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+            "DISABLE_SERVER_SIDE_CURSORS": config('DB_PGBOUNCER', default=False, cast=bool),
+            "OPTIONS": {
+                "connect_timeout": config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+            },
+        }
+    }
+
+# Applied to every new SQLite connection by tracker.db. The journal mode is
+# stored in the database file, so it is only changed when SQLITE_JOURNAL_MODE
+# is set; gunicorn.conf.py sets it to wal for the server, while management
+# commands leave the file as they found it.
+SQLITE_JOURNAL_MODE = config('SQLITE_JOURNAL_MODE', default='').lower()
+SQLITE_PRAGMAS = {
+    'mmap_size': config('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int),
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),
+}
+if SQLITE_JOURNAL_MODE:
+    SQLITE_PRAGMAS = {'journal_mode': SQLITE_JOURNAL_MODE, **SQLITE_PRAGMAS}
+if SQLITE_JOURNAL_MODE == 'wal':
+    # Only crash-safe in WAL mode, where it syncs at checkpoints
+    SQLITE_PRAGMAS['synchronous'] = 'normal'
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at Redis or
+# Memcached to share the cache between workers.
+
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        "LOCATION": config('CACHE_LOCATION', default='expense-tracker'),
     }
 }
 
+# Cached analytics responses (expenses.caching)
+ANALYTICS_CACHE_ALIAS = 'default'
+ANALYTICS_CACHE_TIMEOUT = config('ANALYTICS_CACHE_TIMEOUT', default=3600, cast=int)
+
+# How ai_insights computes its metrics: "columnar" loads the user's history
+# into NumPy arrays (falls back to "sql" when NumPy is missing), "sql"
+# aggregates the insight windows in the database
+INSIGHTS_ENGINE = config('INSIGHTS_ENGINE', default='columnar')
+
+# Largest number of buckets /transactions/timeseries/ fills in one response
+TIMESERIES_MAX_BUCKETS = config('TIMESERIES_MAX_BUCKETS', default=1000, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -108,6 +177,34 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing (accounts.hashers). New passwords use the profile's hasher;
+# the others stay listed so existing hashes verify and are upgraded on login.
+PASSWORD_HASHER_PROFILES = {
+    'argon2': 'accounts.hashers.Argon2PasswordHasher',
+    'scrypt': 'accounts.hashers.ScryptPasswordHasher',
+    'pbkdf2': 'accounts.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHER_PROFILE = config('PASSWORD_HASHER_PROFILE', default='argon2')
+if PASSWORD_HASHER_PROFILE not in PASSWORD_HASHER_PROFILES:
+    raise ImproperlyConfigured(
+        f'PASSWORD_HASHER_PROFILE must be one of {", ".join(PASSWORD_HASHER_PROFILES)}'
+    )
+PASSWORD_HASHERS = [PASSWORD_HASHER_PROFILES[PASSWORD_HASHER_PROFILE]] + [
+    hasher for profile, hasher in PASSWORD_HASHER_PROFILES.items() if profile != PASSWORD_HASHER_PROFILE
+]
+
+# Argon2id at the OWASP baseline (19 MiB, 2 passes, 1 lane)
+PASSWORD_ARGON2_TIME_COST = config('PASSWORD_ARGON2_TIME_COST', default=2, cast=int)
+PASSWORD_ARGON2_MEMORY_COST = config('PASSWORD_ARGON2_MEMORY_COST', default=19456, cast=int)  # KiB
+PASSWORD_ARGON2_PARALLELISM = config('PASSWORD_ARGON2_PARALLELISM', default=1, cast=int)
+PASSWORD_SCRYPT_WORK_FACTOR = config('PASSWORD_SCRYPT_WORK_FACTOR', default=2 ** 14, cast=int)
+PASSWORD_SCRYPT_BLOCK_SIZE = config('PASSWORD_SCRYPT_BLOCK_SIZE', default=8, cast=int)
+PASSWORD_SCRYPT_PARALLELISM = config('PASSWORD_SCRYPT_PARALLELISM', default=1, cast=int)
+PASSWORD_PBKDF2_ITERATIONS = config('PASSWORD_PBKDF2_ITERATIONS', default=600000, cast=int)
+
+# Threads per worker hashing passwords for the async login
+PASSWORD_HASH_THREADS = config('PASSWORD_HASH_THREADS', default=os.cpu_count() or 1, cast=int)
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -134,16 +231,33 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK={
     'DEFAULT_AUTHENTICATION_CLASSES':[
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES':[
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'expenses.renderers.FastJSONRenderer',
     ],
 }
 
+# Transaction lists use keyset pagination (expenses.pagination); clients may
+# ask for ?page_size= up to the cap.
+TRANSACTION_PAGE_SIZE = config('TRANSACTION_PAGE_SIZE', default=50, cast=int)
+TRANSACTION_MAX_PAGE_SIZE = config('TRANSACTION_MAX_PAGE_SIZE', default=500, cast=int)
+
+# Largest batch accepted by /api/transactions/bulk/
+TRANSACTION_BULK_MAX_ITEMS = config('TRANSACTION_BULK_MAX_ITEMS', default=1000, cast=int)
+
+# Rows fetched per round trip while streaming /api/transactions/export/
+TRANSACTION_EXPORT_CHUNK_SIZE = config('TRANSACTION_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Requests each worker's event loop serves at once on the async read path
+# (/api/async/); extra requests wait up to ASYNC_READ_QUEUE_TIMEOUT seconds
+# for a slot, then get a 503.
+ASYNC_READ_CONCURRENCY = config('ASYNC_READ_CONCURRENCY', default=20, cast=int)
+ASYNC_READ_QUEUE_TIMEOUT = config('ASYNC_READ_QUEUE_TIMEOUT', default=5.0, cast=float)
+
 SIMPLE_JWT={
     'ACCESS_TOKEN_LIFETIME': timedelta(days=5),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
@@ -161,18 +275,36 @@ SIMPLE_JWT={
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
     'USER_AUTHENTICATION_RULE': 'rest_framework_simplejwt.authentication.default_user_authentication_rule',
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.TokenRefreshSerializer',
 }
 
 
 AUTH_USER_MODEL = 'accounts.user'
 
+# Authenticated users are cached per worker (accounts.authentication) for up
+# to AUTH_USER_CACHE_TTL seconds; AUTH_USER_CACHE_SIZE=0 turns the cache off.
+# Changes to a user reach the other workers through the cache, so users are
+# only cached with a shared CACHE_BACKEND and loaded on every request otherwise.
+AUTH_USER_CACHE_ALIAS = 'default'
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', default=60, cast=int)
+AUTH_USER_CACHE_SIZE = config('AUTH_USER_CACHE_SIZE', default=10000, cast=int)
+
+# Longest a worker goes without syncing its in-process copy of the refresh
+# token blacklist (accounts.blacklist)
+TOKEN_BLACKLIST_SYNC_INTERVAL = config('TOKEN_BLACKLIST_SYNC_INTERVAL', default=30, cast=float)
+
 # Authentication backends
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
 ]
 
-CORS_ALLOW_ALL_ORIGINS = True  
+# Read by tracker.cors_middleware.CORSMiddleware. In production set
+# CORS_ALLOW_ALL_ORIGINS=False and list the frontend origins instead.
+CORS_ALLOW_ALL_ORIGINS = config('CORS_ALLOW_ALL_ORIGINS', default=True, cast=bool)
+CORS_ALLOWED_ORIGINS = config('CORS_ALLOWED_ORIGINS', default='', cast=Csv())
 CORS_ALLOW_CREDENTIALS = True
+# Browsers may cache a preflight answer this many seconds
+CORS_PREFLIGHT_MAX_AGE = config('CORS_PREFLIGHT_MAX_AGE', default=86400, cast=int)
 CORS_ALLOW_METHODS = [
     'DELETE',
     'GET',
@@ -193,11 +325,56 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
 ]
 
-# For production, use specific origins:
-# CORS_ALLOWED_ORIGINS = [
-#     "http://localhost:3000",
-#     "http://127.0.0.1:3000",
-# ]
+# Structured (JSON) logs on stdout. Routine records of the hot-path loggers
+# are sampled at LOG_SAMPLE_RATE; warnings and errors are always written.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'sampled': {
+            '()': 'tracker.log.SampleFilter',
+            'rate': config('LOG_SAMPLE_RATE', default=0.01, cast=float),
+        },
+    },
+    'formatters': {
+        'json': {
+            '()': 'tracker.log.JSONFormatter',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'json',
+        },
+        'sampled_console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'json',
+            'filters': ['sampled'],
+        },
+    },
+    'loggers': {
+        'tracker': {
+            'handlers': ['sampled_console'],
+            'level': config('LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+        'accounts': {
+            'handlers': ['sampled_console'],
+            'level': config('LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+        'expenses': {
+            'handlers': ['console'],
+            'level': config('LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
 
 CURRENCY_SYMBOL = '₹'
-CURRENCY_CODE = 'INR'
\ No newline at end of file
+CURRENCY_CODE = 'INR'
+
+# Account balances are maintained incrementally on every transaction write.
+# Turn this on to compare each touched balance against a full recompute
+# (and repair any drift) - useful in staging, too slow for production.
+VERIFY_INCREMENTAL_BALANCES = config('VERIFY_INCREMENTAL_BALANCES', default=False, cast=bool)
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from .cors_middleware import CORSMiddleware
+from .db import apply_sqlite_pragmas
+from .log import JSONFormatter, SampleFilter
+
+CORS_SETTINGS = {
+    'CORS_ALLOW_ALL_ORIGINS': False,
+    'CORS_ALLOWED_ORIGINS': ['http://localhost:3000'],
+    'CORS_ALLOW_CREDENTIALS': True,
+    'CORS_ALLOW_METHODS': ['GET', 'POST'],
+    'CORS_ALLOW_HEADERS': ['authorization', 'content-type'],
+    'CORS_PREFLIGHT_MAX_AGE': 600,
+}
+
+
+@override_settings(**CORS_SETTINGS)
+class CORSMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.view = mock.Mock(return_value=HttpResponse('ok'))
+
+    def test_preflight_short_circuits(self):
+        request = self.factory.options(
+            '/api/transactions/', HTTP_ORIGIN='http://localhost:3000', HTTP_ACCESS_CONTROL_REQUEST_METHOD='POST',
+        )
+        response = CORSMiddleware(self.view)(request)
+        self.view.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Access-Control-Allow-Origin'], 'http://localhost:3000')
+        self.assertEqual(response['Access-Control-Allow-Credentials'], 'true')
+        self.assertEqual(response['Access-Control-Allow-Methods'], 'GET, POST')
+        self.assertEqual(response['Access-Control-Allow-Headers'], 'authorization, content-type')
+        self.assertEqual(response['Access-Control-Max-Age'], '600')
+        self.assertEqual(response['Cache-Control'], 'private, max-age=600')
+
+    def test_allowed_origin_on_normal_request(self):
+        request = self.factory.get('/api/transactions/', HTTP_ORIGIN='http://localhost:3000')
+        response = CORSMiddleware(self.view)(request)
+        self.assertEqual(response['Access-Control-Allow-Origin'], 'http://localhost:3000')
+        self.assertEqual(response['Vary'], 'Origin')
+        self.assertNotIn('Access-Control-Max-Age', response)
+
+    def test_disallowed_origin_gets_no_cors_headers(self):
+        request = self.factory.get('/api/transactions/', HTTP_ORIGIN='http://evil.example')
+        response = CORSMiddleware(self.view)(request)
+        self.assertNotIn('Access-Control-Allow-Origin', response)
+        self.assertEqual(response['Vary'], 'Origin')
+
+    def test_same_origin_request_untouched(self):
+        response = CORSMiddleware(self.view)(self.factory.get('/api/transactions/'))
+        self.assertNotIn('Access-Control-Allow-Origin', response)
+        self.assertNotIn('Vary', response)
+
+    @override_settings(CORS_ALLOW_ALL_ORIGINS=True, CORS_ALLOW_CREDENTIALS=False)
+    def test_wildcard_without_credentials(self):
+        request = self.factory.get('/', HTTP_ORIGIN='http://anywhere.example')
+        self.assertEqual(CORSMiddleware(self.view)(request)['Access-Control-Allow-Origin'], '*')
+
+    def test_runs_natively_in_async_stacks(self):
+        async def view(request):
+            return HttpResponse('ok')
+
+        middleware = CORSMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        request = self.factory.get('/api/transactions/', HTTP_ORIGIN='http://localhost:3000')
+        response = asyncio.run(middleware(request))
+        self.assertEqual(response['Access-Control-Allow-Origin'], 'http://localhost:3000')
+
+
+class LoggingTests(SimpleTestCase):
+    def record(self, level, **extra):
+        record = logging.makeLogRecord({'name': 'tracker.test', 'levelno': level, 'levelname': logging.getLevelName(level),
+                                        'msg': 'hello %s', 'args': ('world',)})
+        record.__dict__.update(extra)
+        return record
+
+    def test_sampling_keeps_warnings(self):
+        sampled = SampleFilter(rate=0)
+        self.assertFalse(sampled.filter(self.record(logging.INFO)))
+        self.assertTrue(sampled.filter(self.record(logging.WARNING)))
+        self.assertTrue(SampleFilter(rate=1).filter(self.record(logging.DEBUG)))
+
+    def test_json_lines_carry_extra_fields(self):
+        line = json.loads(JSONFormatter().format(self.record(logging.INFO, user_id=7)))
+        self.assertEqual(line['message'], 'hello world')
+        self.assertEqual(line['level'], 'INFO')
+        self.assertEqual(line['user_id'], 7)
+
+
+class DatabaseSetupTests(TestCase):
+    def test_sqlite_connections_get_the_pragmas(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+
+    def journal_mode(self, pragmas):
+        with tempfile.TemporaryDirectory() as directory:
+            raw = sqlite3.connect(os.path.join(directory, 'db.sqlite3'))
+            try:
+                with override_settings(SQLITE_PRAGMAS=pragmas):
+                    apply_sqlite_pragmas(None, mock.Mock(vendor='sqlite', connection=raw))
+                return raw.execute('PRAGMA journal_mode').fetchone()[0], raw.execute('PRAGMA synchronous').fetchone()[0]
+            finally:
+                raw.close()
+
+    def test_journal_mode_is_left_alone_by_default(self):
+        self.assertNotIn('journal_mode', settings.SQLITE_PRAGMAS)
+        self.assertEqual(self.journal_mode(settings.SQLITE_PRAGMAS), ('delete', 2))  # FULL
+
+    def test_wal_for_the_server(self):
+        pragmas = {'journal_mode': 'wal', **settings.SQLITE_PRAGMAS, 'synchronous': 'normal'}
+        self.assertEqual(self.journal_mode(pragmas), ('wal', 1))  # NORMAL
+
+    def test_health_check(self):
+        response = self.client.get('/health/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'ok'})
+
+    def test_health_check_reports_database_outage(self):
+        with mock.patch('tracker.urls.connection.cursor', side_effect=OperationalError('down')), \
+                self.assertLogs('tracker.urls', 'ERROR'):
+            response = self.client.get('/health/')
+        self.assertEqual(response.status_code, 503)
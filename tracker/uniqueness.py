@@ -0,0 +1,77 @@
+"""
+Uniqueness enforced by the database, reported like a validator.
+
+Checking uniqueness with a query before every write costs a round trip per
+constraint and still races with a concurrent write of the same value.
+``UniqueViolationMixin`` lets the constraint decide instead: the write runs
+in a savepoint, and an ``IntegrityError`` from a unique constraint becomes a
+``ValidationError`` on the field it names, with the payload the field
+validator would have produced.
+"""
+import re
+from contextlib import contextmanager
+
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+from rest_framework.utils.field_mapping import get_unique_error_message
+
+# SQLite: UNIQUE constraint failed: expenses_category.user_id, expenses_category.name
+SQLITE_UNIQUE = re.compile(r'UNIQUE constraint failed: (?P<columns>[^\n]+)')
+# PostgreSQL: Key (user_id, name)=(1, Food) already exists.
+POSTGRES_UNIQUE = re.compile(r'Key \((?P<columns>[^)]+)\)=\(.*\) already exists')
+
+
+def violated_fields(model, exc):
+    """Names of ``model``'s fields in the unique constraint ``exc`` reports, empty for other errors"""
+    message = str(exc)
+    match = SQLITE_UNIQUE.search(message)
+    if match:
+        columns = [column.strip() for column in match['columns'].split(',')]
+        if any(not column.startswith(f'{model._meta.db_table}.') for column in columns):
+            return set()
+        columns = {column.rsplit('.', 1)[1] for column in columns}
+    else:
+        match = POSTGRES_UNIQUE.search(message)
+        if not match:
+            return set()
+        columns = {column.strip().strip('"') for column in match['columns'].split(',')}
+    return {field.name for field in model._meta.concrete_fields if field.column in columns}
+
+
+class UniqueViolationMixin:
+    """
+    ModelSerializer mixin turning unique constraint violations on save into
+    validation errors. ``unique_messages`` maps a field to the message for
+    the constraints that include it; a field that is unique on its own
+    defaults to its model message, like DRF's ``UniqueValidator``.
+    """
+    unique_messages = {}
+
+    def create(self, validated_data):
+        with self.unique_violations():
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        with self.unique_violations():
+            return super().update(instance, validated_data)
+
+    @contextmanager
+    def unique_violations(self):
+        try:
+            with transaction.atomic():
+                yield
+        except IntegrityError as exc:
+            error = self.unique_error(violated_fields(self.Meta.model, exc))
+            if error is None:
+                raise
+            raise serializers.ValidationError(error) from exc
+
+    def unique_error(self, fields):
+        for name in sorted(fields):
+            if name in self.unique_messages:
+                return {name: [self.unique_messages[name]]}
+        for name in sorted(fields):
+            field = self.Meta.model._meta.get_field(name)
+            if field.unique and name in self.fields:
+                return {name: [get_unique_error_message(field)]}
+        return None
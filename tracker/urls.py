@@ -15,10 +15,17 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+import logging
+
 from django.contrib import admin
+from django.db import DatabaseError, connection
 from django.urls import path,include
 from django.http import JsonResponse
 
+from accounts.urls import async_urlpatterns as async_auth_urlpatterns
+
+logger = logging.getLogger(__name__)
+
 def api_root(request):
     return JsonResponse({
         'message': 'Expense Tracker API',
@@ -30,9 +37,21 @@ def api_root(request):
         }
     })
 
+def health(request):
+    """Liveness/readiness probe: 200 while the database answers, 503 otherwise"""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except DatabaseError:
+        logger.exception('Health check failed')
+        return JsonResponse({'status': 'unavailable'}, status=503)
+    return JsonResponse({'status': 'ok'})
+
 urlpatterns = [
     path('', api_root, name='api-root'),
+    path('health/', health, name='health'),
     path("admin/", admin.site.urls),
     path('api/auth/',include('accounts.urls')),
+    path('api/async/auth/',include(async_auth_urlpatterns)),
     path('api/',include('expenses.urls')),
 ]